@@ -0,0 +1,174 @@
+"""
+Local stand-in for the parts of the GitHub REST API that pm uses
+
+Lets the GitHub features of pm be tried and timed without a token or network
+access. Point pm at it with:
+
+    pm config -o set --key github_api_url --value http://127.0.0.1:8765
+    pm config -o set --key token --value anything
+
+Endpoints: GET /user, POST /user/repos, GET /repos/<owner>/<repo> (with ETags),
+and GET /_stats (number of requests and of TCP connections, to check that
+connections are reused).
+
+Usage: python benchmarks/github_stand_in.py [--port 8765] [--latency-ms 50]
+                                            [--rate-limit 0] [--rate-window 5]
+"""
+
+import threading
+from json import dumps, loads
+from time import gmtime, sleep, strftime, time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOGIN = "stand-in"
+
+
+class StandIn(object):
+    """
+    State of the stand-in server (repositories, rate limit and statistics)
+    """
+
+    def __init__(self, latency: float, rate_limit: int, rate_window: float):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+        self.lock = threading.Lock()
+        self.repos = dict()
+        self.requests = 0
+        self.connections = 0
+        self.window_start = time()
+        self.window_requests = 0
+
+    def take_rate_limit(self) -> tuple:
+        """
+        (remaining, reset) after counting a request, remaining is -1 if it's over the limit
+        """
+
+        with self.lock:
+            self.requests += 1
+            if self.rate_limit == 0:
+                return 5000, int(time()) + 3600
+
+            if time() - self.window_start >= self.rate_window:
+                self.window_start = time()
+                self.window_requests = 0
+
+            reset = int(self.window_start + self.rate_window) + 1
+            if self.window_requests >= self.rate_limit:
+                return -1, reset
+
+            self.window_requests += 1
+            return self.rate_limit - self.window_requests, reset
+
+
+def make_handler(stand_in: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive
+
+        def setup(self):
+            super().setup()
+            with stand_in.lock:
+                stand_in.connections += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def respond(self, status: int, data=None, headers: dict = None):
+            body = dumps(data).encode() if data is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or dict()).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def web_url(self, full_name: str) -> str:
+            # The stand-in is also the web host of its repositories (like GitHubClient.web_host of it)
+            host, port = self.server.server_address[:2]
+            return f"http://{host}:{port}/{full_name}"
+
+        def handle_request(self, method: str):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = loads(self.rfile.read(length)) if length != 0 else None
+
+            if self.path == "/_stats":
+                return self.respond(200, dict(requests=stand_in.requests, connections=stand_in.connections))
+
+            sleep(stand_in.latency)
+
+            remaining, reset = stand_in.take_rate_limit()
+            rate_headers = {"X-RateLimit-Remaining": str(max(remaining, 0)), "X-RateLimit-Reset": str(reset)}
+            if remaining < 0:
+                return self.respond(403, dict(message="API rate limit exceeded"), rate_headers)
+
+            if not (self.headers.get("Authorization") or "").startswith("token "):
+                return self.respond(401, dict(message="Requires authentication"), rate_headers)
+
+            if method == "GET" and self.path == "/user":
+                return self.respond(200, dict(login=LOGIN), rate_headers)
+
+            if method == "POST" and self.path == "/user/repos":
+                name = (body or dict()).get("name")
+                if not name:
+                    return self.respond(422, dict(message="Validation Failed", errors=[dict(code="missing_field")]), rate_headers)
+
+                with stand_in.lock:
+                    if name in stand_in.repos:
+                        return self.respond(422, dict(message="Repository creation failed.",
+                                                      errors=[dict(message="name already exists on this account")]), rate_headers)
+                    repo = dict(name=name, full_name=f"{LOGIN}/{name}", private=bool(body.get("private")),
+                                visibility="private" if body.get("private") else "public",
+                                html_url=self.web_url(f"{LOGIN}/{name}"),
+                                clone_url=self.web_url(f"{LOGIN}/{name}.git"),
+                                default_branch="main", pushed_at=None,
+                                created_at=strftime("%Y-%m-%dT%H:%M:%SZ", gmtime()))
+                    stand_in.repos[name] = repo
+                return self.respond(201, repo, rate_headers)
+
+            parts = self.path.strip("/").split("/")
+            if method == "GET" and len(parts) == 3 and parts[0] == "repos":
+                repo = stand_in.repos.get(parts[2])
+                if repo is None:
+                    repo = dict(name=parts[2], full_name=f"{parts[1]}/{parts[2]}", private=False, visibility="public",
+                                html_url=self.web_url(f"{parts[1]}/{parts[2]}"),
+                                clone_url=self.web_url(f"{parts[1]}/{parts[2]}.git"),
+                                default_branch="main", pushed_at="2024-01-01T00:00:00Z")
+                etag = f'"{abs(hash(dumps(repo, sort_keys=True)))}"'
+                if self.headers.get("If-None-Match") == etag:
+                    return self.respond(304, None, dict(rate_headers, ETag=etag))
+                return self.respond(200, repo, dict(rate_headers, ETag=etag))
+
+            return self.respond(404, dict(message="Not Found"), rate_headers)
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+    return Handler
+
+
+def main():
+    parser = ArgumentParser(description="Local stand-in for the GitHub REST API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Delay of every response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests allowed per window (0: unlimited)")
+    parser.add_argument("--rate-window", type=float, default=5, help="Seconds of a rate limit window")
+    args = parser.parse_args()
+
+    stand_in = StandIn(args.latency_ms / 1000, args.rate_limit, args.rate_window)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(stand_in))
+    print(f"GitHub stand-in listening on http://127.0.0.1:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Startup-time regression check for the read-only actions of pm
+
+Runs `path`, `list` and `config get` against a synthetic pm-settings.json
+and fails (exit code 1) when one of them:
+
+* takes more than the startup budget on top of a bare interpreter start, or
+* imports one of the heavy modules that only `create`, `browser` or
+  `configure` need (the GitHub client's http.client and ssl, webbrowser, termcolor).
+
+Usage: python benchmarks/startup_budget.py [--budget-ms 40] [--runs 15] [--projects 1000]
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from time import perf_counter
+from statistics import median
+from argparse import ArgumentParser
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(REPO_ROOT, "projectmanager.py")
+
+# Modules that must not be loaded by the read-only actions
+FORBIDDEN_MODULES = ["http.client", "ssl", "webbrowser", "termcolor"]
+
+READ_ONLY_ACTIONS = {
+    "path": ["path", "-n", "project-0"],
+    "list": ["list", "-o", "p"],
+    "config get": ["config", "-o", "get", "--key", "projects_folder"],
+}
+
+# Runs the entry point in-process and reports which forbidden modules got imported
+IMPORT_PROBE = """
+import sys, json, runpy
+sys.argv = [sys.argv[1]] + sys.argv[2:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+sys.stderr.write(json.dumps([m for m in %r if m in sys.modules]))
+""" % (FORBIDDEN_MODULES,)
+
+
+def write_settings(pm_home: str, project_count: int):
+    """
+    Writes a synthetic pm-settings.json with project_count projects in groups of 100
+    """
+
+    projects = dict()
+    for i in range(project_count):
+        group = f"group-{i // 100}"
+        projects.setdefault(group, dict())[f"project-{i}"] = dict(dir=f"/projects/{group}/project-{i}")
+
+    settings = dict(projects_folder="/projects", editor_command="", token="", projects=projects)
+    with open(f"{pm_home}/pm-settings.json", "w") as file:
+        json.dump(settings, file, indent=4)
+
+
+def time_command(command: list, env: dict, runs: int) -> float:
+    """
+    Returns the median wall-clock time of command in milliseconds
+    """
+
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append((perf_counter() - start) * 1000)
+
+    return median(timings)
+
+
+def main() -> int:
+    parser = ArgumentParser("startup_budget", description="Checks the startup time of pm's read-only actions")
+    parser.add_argument("--budget-ms", help="Allowed time on top of a bare interpreter start", type=float, default=40.0)
+    parser.add_argument("--runs", help="Runs per action (the median is used)", type=int, default=15)
+    parser.add_argument("--projects", help="Number of projects in the synthetic registry", type=int, default=1000)
+    args = parser.parse_args()
+
+    failed = False
+
+    with tempfile.TemporaryDirectory() as pm_home:
+        write_settings(pm_home, args.projects)
+        env = dict(os.environ, PM_HOME=pm_home)
+
+        baseline = time_command([sys.executable, "-c", "pass"], env, args.runs)
+        print(f"Bare interpreter start: {baseline:.1f} ms (budget: +{args.budget_ms:.1f} ms)")
+
+        for action, action_args in READ_ONLY_ACTIONS.items():
+            elapsed = time_command([sys.executable, ENTRY_POINT] + action_args, env, args.runs)
+            overhead = elapsed - baseline
+
+            probe = subprocess.run([sys.executable, "-c", IMPORT_PROBE, ENTRY_POINT] + action_args,
+                                   env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            try:
+                loaded = json.loads(probe.stderr.strip().splitlines()[-1])
+            except (IndexError, ValueError):
+                loaded = [f"<probe failed: {probe.stderr.strip()}>"]
+
+            status = "ok"
+            if overhead > args.budget_ms:
+                status = "OVER BUDGET"
+                failed = True
+            if loaded:
+                status = f"imports {', '.join(loaded)}"
+                failed = True
+
+            print(f"{action:<12} {elapsed:7.1f} ms (+{overhead:.1f} ms)  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
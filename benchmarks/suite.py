@@ -0,0 +1,271 @@
+"""
+Benchmark suite for the hot paths of pm on synthetic registries
+
+For every size (10, 1000 and 100000 projects by default) it writes a
+pm-settings.json and the matching projects folder (group-N/project-N
+directories, 100 projects per group) to a temporary directory and measures:
+
+* startup: wall-clock time of a whole pm process per action (path with and
+  without a group, find, list, list --format ndjson, config get),
+* load: loading the settings in-process,
+* find_project: ProjectManager.find_project with and without a group,
+* list: the text and ndjson listings of all projects,
+* save: put_project followed by save (the settings write path),
+* scan: the setup scan of the projects folder (DirectoryScanner.scan).
+
+Every result is the median of --runs runs in milliseconds. The code of
+--repo is copied next to the registry and the in-process measurements run
+in a separate interpreter that imports it, so the suite of this checkout can
+measure an older checkout too (a metric whose action or API doesn't exist
+there is null).
+
+--backend selects the registry backend of the fixture (json, sqlite or
+sharded); the registry is moved to it by the first pm process.
+
+Results are written as JSON with --output; --compare reads such a file and
+prints the change of every metric, exiting with 1 if something got slower
+than --threshold percent.
+
+Usage: python benchmarks/suite.py [--sizes 10,1000,100000] [--runs 7] [--repo PATH] [--backend json]
+                                  [--output results.json] [--compare base.json] [--threshold 10]
+
+Comparing two commits:
+
+    git worktree add /tmp/pm-base <commit>
+    python benchmarks/suite.py --repo /tmp/pm-base --output base.json
+    python benchmarks/suite.py --output head.json --compare base.json
+"""
+
+import os
+import sys
+import json
+import shutil
+import platform
+import tempfile
+import subprocess
+from time import perf_counter, strftime
+from statistics import median
+from argparse import ArgumentParser
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GROUP_SIZE = 100
+MIN_REGRESSION_MS = 0.5  # Smaller differences are noise, whatever the percentage
+REFERENCE_METRICS = ["startup.bare_interpreter"]  # Measure the machine, not pm (never a regression)
+
+STARTUP_ACTIONS = {
+    "path": lambda size: ["path", "-n", f"project-{size // 2}"],
+    "path_group": lambda size: ["path", "-n", f"project-{size // 2}", "-g", f"group-{size // 2 // GROUP_SIZE}"],
+    "find": lambda size: ["find", f"project-{size // 2}"],
+    "list": lambda size: ["list", "-o", "p"],
+    "list_ndjson": lambda size: ["list", "-o", "p", "--format", "ndjson"],
+    "config_get": lambda size: ["config", "-o", "get", "--key", "projects_folder"],
+}
+
+# Runs in a separate interpreter: python -c IN_PROCESS <repo> <pm_home> <size> <runs>
+IN_PROCESS = r"""
+import os, sys, json
+from time import perf_counter
+from statistics import median
+
+repo, pm_home, size, runs = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+sys.path.insert(0, repo)
+results = dict()
+
+
+def measure(metric, function, setup=None):
+    try:
+        timings = []
+        for i in range(runs):
+            argument = setup(i) if setup is not None else None
+            start = perf_counter()
+            function(argument) if setup is not None else function()
+            timings.append((perf_counter() - start) * 1000)
+        results[metric] = median(timings)
+    except (ImportError, AttributeError, TypeError, NameError, SystemExit):
+        results[metric] = None  # Not in this version of pm
+
+
+def load():
+    store = SettingsStore(pm_home)
+    store.load()
+
+try:
+    from src.settings_store import SettingsStore
+    from src.project_manager import ProjectManager
+    from src.directory_scanner import DirectoryScanner
+except ImportError:
+    SettingsStore = ProjectManager = DirectoryScanner = None
+
+measure("load", load)
+
+store = pm = None
+try:
+    store = SettingsStore.get(pm_home)
+    store.load()
+    pm = ProjectManager(pm_home, store)
+except (AttributeError, TypeError):
+    pass
+
+name, group = f"project-{size // 2}", f"group-{size // 2 // 100}"
+measure("find_project", lambda: pm.find_project(name))
+measure("find_project_group", lambda: pm.find_project(name, group))
+
+def write_listing(format):
+    from src.project_listing import ProjectListing
+    ProjectListing(store).write(lambda chunk: None, "p", None, format)
+
+measure("list_text", lambda: write_listing("text"))
+measure("list_ndjson", lambda: write_listing("ndjson"))
+
+def save(i):
+    store.save()
+
+measure("save", save, lambda i: store.put_project(f"bench-{i}", "bench", dict(dir=f"/bench/bench-{i}")))
+measure("scan", lambda: DirectoryScanner(quiet=True).scan(store["projects_folder"]))
+
+sys.stdout.write("\nRESULTS " + json.dumps(results) + "\n")
+"""
+
+
+def create_fixture(repo: str, root: str, size: int, backend: str = "json") -> str:
+    """
+    Writes a registry of size projects and its projects folder, returns the home directory of pm
+
+    The code of pm (projectmanager.py and src) is copied to the home directory too, because
+    older versions keep the settings next to projectmanager.py instead of reading PM_HOME.
+    """
+
+    pm_home = f"{root}/home"
+    projects_folder = f"{root}/projects"
+    shutil.copytree(f"{repo}/src", f"{pm_home}/src", ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copy(f"{repo}/projectmanager.py", pm_home)
+
+    projects = dict()
+    for i in range(size):
+        group = f"group-{i // GROUP_SIZE}"
+        project_dir = f"{projects_folder}/{group}/project-{i}"
+        os.makedirs(project_dir)
+        projects.setdefault(group, dict())[f"project-{i}"] = dict(dir=project_dir)
+
+    settings = dict(projects_folder=projects_folder, editor_command="", token="", projects=projects)
+    if backend != "json":
+        settings["registry_backend"] = backend
+    with open(f"{pm_home}/pm-settings.json", "w") as file:
+        json.dump(settings, file, indent=4)
+
+    return pm_home
+
+
+def time_startup(entry_point: str, arguments: list, env: dict, runs: int) -> float:
+    """
+    Median wall-clock time of a pm process in milliseconds, None if the action fails
+    """
+
+    command = [sys.executable, entry_point] + arguments
+    if subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode != 0:
+        return None  # Not in this version of pm (also warms the caches up)
+
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((perf_counter() - start) * 1000)
+
+    return median(timings)
+
+
+def run_size(repo: str, size: int, runs: int, backend: str = "json") -> dict:
+    results = dict()
+
+    root = tempfile.mkdtemp(prefix=f"pm-bench-{size}-")
+    try:
+        pm_home = create_fixture(repo, root, size, backend)
+        env = dict(os.environ, PM_HOME=pm_home)
+
+        results["startup.bare_interpreter"] = time_startup("-c", ["pass"], env, runs)
+        for action, arguments in STARTUP_ACTIONS.items():
+            results[f"startup.{action}"] = time_startup(f"{pm_home}/projectmanager.py", arguments(size), env, runs)
+
+        probe = subprocess.run([sys.executable, "-c", IN_PROCESS, pm_home, pm_home, str(size), str(runs)],
+                               env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        lines = [line for line in probe.stdout.splitlines() if line.startswith("RESULTS ")]
+        if len(lines) == 0:
+            print(f"In-process benchmarks failed:\n{probe.stderr}", file=sys.stderr)
+        else:
+            results.update({f"in_process.{metric}": value for metric, value in json.loads(lines[-1][8:]).items()})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return results
+
+
+def compare(base: dict, current: dict, threshold: float) -> int:
+    """
+    Prints the change of every metric, returns the number of regressions
+    """
+
+    regressions = 0
+    print(f"\n{'size':>7}  {'metric':<32} {'base':>10} {'current':>10} {'change':>8}")
+
+    for size, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            base_value = base["results"].get(size, dict()).get(metric)
+            if value is None or base_value is None:
+                continue
+
+            change = (value - base_value) / base_value * 100 if base_value != 0 else 0.0
+            is_regression = change > threshold and value - base_value > MIN_REGRESSION_MS and \
+                metric not in REFERENCE_METRICS
+            regressions += is_regression
+
+            print(f"{size:>7}  {metric:<32} {base_value:10.2f} {value:10.2f} {change:+7.1f}%"
+                  f"{'  SLOWER' if is_regression else ''}")
+
+    return regressions
+
+
+def main() -> int:
+    parser = ArgumentParser("suite", description="Benchmarks pm on synthetic registries")
+    parser.add_argument("--sizes", help="Comma-separated numbers of projects", type=str, default="10,1000,100000")
+    parser.add_argument("--runs", help="Runs per measurement (the median is used)", type=int, default=7)
+    parser.add_argument("--repo", help="Checkout of pm to measure (this one by default)", type=str, default=REPO_ROOT)
+    parser.add_argument("--backend", help="Registry backend of the fixtures", type=str,
+                        choices=["json", "sqlite", "sharded"], default="json")
+    parser.add_argument("--output", help="Writes the results to this JSON file", type=str, default=None)
+    parser.add_argument("--compare", help="Results of an earlier run to compare with", type=str, default=None)
+    parser.add_argument("--threshold", help="Slowdown in percent that counts as a regression", type=float, default=10.0)
+    args = parser.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    commit = subprocess.run(["git", "-C", repo, "rev-parse", "HEAD"], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+
+    report = dict(commit=commit, repo=repo, date=strftime("%Y-%m-%dT%H:%M:%S"), python=platform.python_version(),
+                  platform=platform.platform(), runs=args.runs, backend=args.backend, results=dict())
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        print(f"Measuring {size} projects...", file=sys.stderr)
+        results = run_size(repo, size, args.runs, args.backend)
+        report["results"][str(size)] = results
+
+        for metric, value in results.items():
+            print(f"{size:>7}  {metric:<32} {f'{value:10.2f} ms' if value is not None else '         -'}")
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as file:
+            base = json.load(file)
+
+        regressions = compare(base, report, args.threshold)
+        if regressions != 0:
+            print(f"\n{regressions} metric(s) slower than {args.threshold:.0f}%.")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
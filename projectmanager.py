@@ -1,42 +1,85 @@
 import os
-from json import load
+import sys
 from sys import exit
-from termcolor import colored
-from argparse import ArgumentParser
-from src.settings_manager import SettingsManager
-from src.input_controller import InputController
-from src.project_manager import ProjectManager
+from src import tracing
+
+# ANCHOR: Time the phases of this process if it's requested (pm --profile or PM_TRACE)
+sys.argv[1:] = tracing.configure(sys.argv[1:])
+
+with tracing.phase("imports", "daemon client"):
+    from src.daemon_client import DaemonClient
 
 # TODO: Add test cases
 
-# Get Project Manager's home directory
-PM_HOME = str(os.path.dirname(os.path.abspath(__file__)))
+# Get Project Manager's home directory (PM_HOME environment variable overrides it)
+PM_HOME = os.environ.get("PM_HOME", str(os.path.dirname(os.path.abspath(__file__))))
 
 __version__ = "v0.2 Beta"
 
+options = ["open", "create", "list", "path", "find", "scan", "watch", "daemon", "shell-init", "sync-remotes", "status", "stats", "doctor", "browser", "configure", "config", "reset"]
+options_option = ["list", "get", "set", "open", "projects", "p", "groups", "g"] # Options of argument 'config'
+
+# ANCHOR: Let the resident daemon (pm daemon) answer if it's running
+daemon_client = DaemonClient(PM_HOME)
+daemon_request = DaemonClient.parse_arguments(sys.argv[1:], options_option) # None if the daemon can't answer it
+if daemon_request is not None and daemon_client.is_running():
+    with tracing.phase("daemon.request", daemon_request["action"]):
+        response = daemon_client.request(daemon_request)
+
+    if response is not None and daemon_request["action"] == "open" and not os.path.isdir(response["dir"]):
+        response = None # Executed here, which warns about the missing directory
+
+    if response is not None: # Otherwise the request is executed here as usual
+        sys.stdout.write(response["output"])
+        if daemon_request["action"] == "open":
+            os.chdir(response["dir"])
+            with tracing.phase("command", response["command"]):
+                os.system(response["command"])
+        exit()
+
+# The rest is needed only when the request is executed in this process
+with tracing.phase("imports"):
+    from argparse import ArgumentParser
+    from src.console import colored
+    from src.settings_manager import SettingsManager
+    from src.input_controller import InputController
+    from src.project_manager import ProjectManager
+    from src.settings_store import SettingsStore
+    from src.project_listing import ProjectListing
+
+# The settings are loaded once and shared by every manager
+settings_store = SettingsStore.get(PM_HOME)
+
+# Options of the setup script, which is also run before the other arguments can be parsed (first run)
+setup_parser = ArgumentParser(add_help=False)
+setup_parser.add_argument("--workers", help="Number of directories scanned or projects created at the same time", type=int, default=None)
+setup_parser.add_argument("--quiet", help="Don't print the scanned projects", action="store_true")
+setup_parser.add_argument("--progress", help="Print a progress bar instead of the scanned projects", action="store_true")
+
 # Check if the pm-settings.json not exists in the project's home folder
-if not os.path.exists(f"{PM_HOME}/pm-settings.json"):
+if not settings_store.exists():
     print(colored(f"Welcome to Project Manager {__version__}", "green"))
     print("Looks like this is first time you are running Project Manager.")
     print("Entering setup mode...")
 
-    settings_manager = SettingsManager(PM_HOME)
-    settings_manager.setup()
+    setup_args, _ = setup_parser.parse_known_args()
+
+    settings_manager = SettingsManager(PM_HOME, settings_store)
+    settings_manager.setup(setup_args.workers, setup_args.quiet, setup_args.progress)
     exit()
 else:
     try:
-        with open(f"{PM_HOME}/pm-settings.json", "r") as file:
-            settings = load(file)
+        with tracing.phase("settings.load"):
+            settings_store.load()
     except:
         print(colored("""The settings cannot be read. Please check pm-settings.json file.""", "red"))
         exit(1)
 
-parser = ArgumentParser("pm", description=f"Project Manager - Easily create, manage and categorize your projects")
-
-options = ["open", "create", "list", "path", "browser", "configure", "config", "reset"]
-options_option = ["list", "get", "set", "open", "projects", "p", "groups", "g"] # Options of argument 'config'
+parser = ArgumentParser("pm", description=f"Project Manager - Easily create, manage and categorize your projects",
+                        parents=[setup_parser], epilog="Add --profile (or --profile=FILE.json, --cprofile=FILE) to any action to time its phases.")
 
 parser.add_argument("action", help="The action you want Project Manager to make", type=str, choices=options)
+parser.add_argument("query", help="The project name to search in action 'find'", type=str, nargs="?", default=None)
 parser.add_argument("-v", "--version", action="version", version=__version__)
 
 parser.add_argument("-n", "--name", help="The project you want to specify (or group in action 'list [projects]')", type=str, default=None)
@@ -44,19 +87,57 @@ parser.add_argument("-g", "--group", help="The group you want to specify", type=
 parser.add_argument("--key", help="Key value of the setting", type=str, default=None)
 parser.add_argument("--value", help="Value of the setting", type=str, default=None)
 parser.add_argument("-o", "--option", help="The option that will be used in 'config' and 'list' action", type=str, choices=options_option)
+parser.add_argument("--from", dest="manifest", help="Manifest (.csv or .json) of the projects to create in action 'create'", type=str, default=None)
+parser.add_argument("--refresh", help="Check every project again in actions 'status' and 'stats' instead of using the cached results", action="store_true")
+parser.add_argument("--prune", help="Remove the projects whose directories are gone in action 'doctor'", action="store_true")
+parser.add_argument("--fix", help="Rewrite the repository URLs that can be fixed in action 'doctor'", action="store_true")
+parser.add_argument("--sort", help="Order of the projects in action 'stats'", type=str, choices=["size", "files", "modified", "name"], default="size")
+parser.add_argument("--limit", help="Maximum number of projects (or groups) to print", type=int, default=None)
+parser.add_argument("--offset", help="Number of projects (or groups) to skip in action 'list'", type=int, default=0)
+parser.add_argument("--format", help="Output format of action 'list'", type=str, choices=ProjectListing.FORMATS, default="text")
+parser.add_argument("--fields", help="Comma-separated fields of the projects in the json, ndjson and tsv formats of action 'list' (default: name,group,dir)", type=str, default=None)
 
-args = parser.parse_args()
+with tracing.phase("arguments"):
+    args = parser.parse_args()
 
 # ANCHOR: Open project
 if args.action == "open":
-    if args.name is False:
+    if args.name is None:
         print(colored("Please specify the project you want to open. (with --name)", "yellow"))
         exit(1)
     
-    project_manager = ProjectManager(PM_HOME)
+    project_manager = ProjectManager(PM_HOME, settings_store)
     project_manager.open_project(args.name, args.group)
 
 # ANCHOR: Create project or group
+elif args.action == "create" and args.manifest is not None:
+    from src.project_manifest import ProjectManifest
+
+    try:
+        manifest = ProjectManifest.read(args.manifest)
+    except OSError as e:
+        print(colored(f"The manifest cannot be read.\n\n{e}", "red"))
+        exit(1)
+    except ValueError as e:
+        print(colored(f"The manifest is not valid: {e}", "yellow"))
+        exit(1)
+
+    print(f"Creating {len(manifest.projects)} project(s) from {args.manifest}...")
+    project_manager = ProjectManager(PM_HOME, settings_store)
+    results = project_manager.create_projects(manifest.projects, args.workers)
+
+    failed = 0
+    for project, error in results:
+        if error is None:
+            print(f"{project['name']} (in group {project['group']}): {colored('created', 'green')}")
+        else:
+            print(f"{project['name']} (in group {project['group']}): {colored(error, 'red')}")
+            failed += 1
+
+    print(f"\n{len(results) - failed} project(s) created, {failed} failed.")
+    if failed != 0:
+        exit(1)
+
 elif args.action == "create":
     input_controller = InputController() # For controlling user input
     
@@ -72,7 +153,7 @@ elif args.action == "create":
     else:
         project_group = input_controller.get_str("Project group: ")
     
-    if settings["token"] != "": # Check if token is set
+    if settings_store["token"] != "": # Check if token is set
         create_new_repo = input_controller.get_bool("Do you want to create a new repo at GitHub? (y/n): ")
     else:
         create_new_repo = False
@@ -93,7 +174,7 @@ elif args.action == "create":
     
     is_confirmed = input_controller.get_bool("Is it OK? (y/n): ")
     if is_confirmed:
-        project_manager = ProjectManager(PM_HOME)
+        project_manager = ProjectManager(PM_HOME, settings_store)
         project_manager.create_project(project_name, project_group, create_new_repo, is_repo_private)
 
 # ANCHOR: List all of the projects, all of the groups or all of the projects in a specified group
@@ -102,65 +183,288 @@ elif args.action == "list":
         print(colored("Please specify which type of list you want with --option [projects(p) / groups(g)]", "yellow"))
         exit(1)
 
-    if args.option in ["projects", "p"]:
-        if len(settings["projects"]) == 0: # Check if there are any projects
-            print("You don't have any projects.")
-        
-        elif args.name or args.group: # Check if argument "name" or "group" is specified
-            """
-            User can specify group with --name or --group in this action.
-            So, we need a if-elif-else statement here for taking group from user.
-            """
-            if args.name and args.group: # If both name and group specified
-                print(colored("Ignoring --name. You don't have to specify both :)", "yellow"))
-                group = args.group
-            elif args.name is not None: group = args.name
-            else: group = args.group
-
-            if group not in settings["projects"]:
-                print(colored(f"You don't have a group called {args.group}.", "yellow"))
-                exit(1)
-            
-            print(f"All of the projects in group {group} (has {len(settings['projects'][group])} projects):")
-            for project in settings["projects"][group]:
-                print(project)
-        
-        else:
-            print("All of your projects:")
-            for group in settings["projects"]:
-                print(f"{group} (has {len(settings['projects'][group])} project(s))")
-                for project in settings["projects"][group]:
-                    print(f"\t{project}")
-    
-    elif args.option in ["groups", "g"]:
-        if len(settings["projects"]) == 0:
-            print("You don't have any groups.")
-        else:
-            print("All of the groups:")
-            for group in settings["projects"]:
-                print(f"{group} (Has {len(settings['projects'][group])} project(s))")
-    
-    else:
+    if args.option not in ["projects", "p", "groups", "g"]:
         print(colored(f"You can't use option {args.option} with this action.", "yellow"))
         exit(1)
 
+    if args.offset < 0 or (args.limit is not None and args.limit < 0):
+        print(colored("--offset and --limit cannot be negative.", "yellow"))
+        exit(1)
+
+    group = None
+    if args.option in ["projects", "p"] and (args.name or args.group) and len(settings_store.groups()) != 0:
+        """
+        User can specify group with --name or --group in this action.
+        So, we need a if-elif-else statement here for taking group from user.
+        """
+        if args.name and args.group: # If both name and group specified
+            print(colored("Ignoring --name. You don't have to specify both :)", "yellow"))
+            group = args.group
+        elif args.name is not None: group = args.name
+        else: group = args.group
+
+        if not settings_store.has_group(group):
+            print(colored(f"You don't have a group called {group}.", "yellow"))
+            exit(1)
+
+    fields = args.fields.split(",") if args.fields else None
+    project_listing = ProjectListing(settings_store)
+
+    try:
+        project_listing.write(sys.stdout.write, args.option, group, args.format, fields, args.offset, args.limit)
+        sys.stdout.flush()
+    except BrokenPipeError: # The reader (like head or fzf) has stopped reading
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno()) # Python flushes stdout again at exit
+        exit(1)
+
 # ANCHOR: Print the path of the specified project
 elif args.action == "path":
     if args.name is None:
         print(colored("Please specify your project with --name.", "yellow"))
         exit(1)
     
-    project_manager = ProjectManager(PM_HOME)
+    project_manager = ProjectManager(PM_HOME, settings_store)
     project = project_manager.find_project(args.name, args.group)
     print(project["dir"])
 
+# ANCHOR: Search projects by name (prefix and typo tolerant)
+elif args.action == "find":
+    query = args.query if args.query is not None else args.name
+    if query is None:
+        print(colored("Please specify what you are looking for. (pm find <query>)", "yellow"))
+        exit(1)
+    
+    project_manager = ProjectManager(PM_HOME, settings_store)
+    projects = project_manager.search_projects(query, args.group)
+
+    if len(projects) == 0:
+        print("No matching projects.")
+        exit(1)
+    
+    for project in projects:
+        print(f"{project['name']} (in group {project['group']}): {project['dir']}")
+
+# ANCHOR: Index the projects created outside of Project Manager
+elif args.action == "scan":
+    if settings_store["projects_folder"] == "":
+        print(colored("You must set your projects folder in order to scan it.", "yellow"))
+        exit(1)
+
+    settings_manager = SettingsManager(PM_HOME, settings_store)
+    settings_manager.scan_projects(args.workers, args.quiet, args.progress)
+
+# ANCHOR: Keep the projects up to date with the projects folder
+elif args.action == "watch":
+    if settings_store["projects_folder"] == "":
+        print(colored("You must set your projects folder in order to watch it.", "yellow"))
+        exit(1)
+
+    settings_manager = SettingsManager(PM_HOME, settings_store)
+    settings_manager.watch_projects(args.workers, args.quiet)
+
+# ANCHOR: Keep the settings in memory and answer the other pm processes
+elif args.action == "daemon":
+    from src.daemon import ProjectManagerDaemon
+
+    if daemon_client.request(dict(action="ping")) is not None:
+        print(colored("The daemon is already running.", "yellow"))
+        exit(1)
+
+    daemon = ProjectManagerDaemon(PM_HOME, settings_store)
+    if not args.quiet:
+        print(f"Listening on {daemon.socket_path}, press Ctrl+C to stop.")
+
+    try:
+        daemon.serve()
+    except OSError as e:
+        print(colored(f"The daemon cannot be started.\n\n{e}", "red"))
+        exit(1)
+
+# ANCHOR: Write the shell functions (pcd) and the completion table
+elif args.action == "shell-init":
+    from src.shell_integration import ShellIntegration
+
+    shell_integration = ShellIntegration(PM_HOME)
+    try:
+        shell_integration.write_script(options)
+        shell_integration.write_table(settings_store.all_projects())
+    except OSError as e:
+        print(colored(f"An I/O error occured while writing the shell integration.\n\n{e}", "red"))
+        exit(1)
+
+    print("The shell integration is ready. Add this line to your ~/.bashrc or ~/.zshrc:")
+    print(f"\n    source {shell_integration.script_path}\n")
+    print("Then use pcd <project> [group] to go to a project. The completion table is updated when your projects change.")
+
+# ANCHOR: Fill in the repository metadata of the projects from GitHub
+elif args.action == "sync-remotes":
+    if settings_store["token"] == "":
+        print(colored("You must set your GitHub token in order to sync the repositories.", "yellow"))
+        print(colored("To set: pm config -o set --key token --value \"your-token-here\"", "yellow"))
+        exit(1)
+
+    if args.group is not None and not settings_store.has_group(args.group):
+        print(colored(f"You don't have a group called {args.group}.", "yellow"))
+        exit(1)
+
+    project_manager = ProjectManager(PM_HOME, settings_store)
+    results = project_manager.sync_remotes(args.group, args.workers)
+
+    updated = skipped = failed = 0
+    for project, is_updated, error in results:
+        if error is None:
+            updated += is_updated
+            if not args.quiet and is_updated:
+                print(f"{project['name']} (in group {project['group']}): {colored('updated', 'green')} {project['repo_url']}")
+        elif error == ProjectManager.NO_GITHUB_ORIGIN:
+            skipped += 1
+        else:
+            failed += 1
+            print(f"{project['name']} (in group {project['group']}): {colored(error, 'red')}")
+
+    print(f"\n{updated} project(s) updated, {len(results) - updated - skipped - failed} unchanged, "
+          f"{skipped} without a GitHub origin, {failed} failed.")
+    if failed != 0:
+        exit(1)
+
+# ANCHOR: Print the git status of the projects
+elif args.action == "status":
+    from src.status_checker import StatusChecker
+
+    if args.group is not None and not settings_store.has_group(args.group):
+        print(colored(f"You don't have a group called {args.group}.", "yellow"))
+        exit(1)
+
+    groups = [args.group] if args.group is not None else settings_store.groups()
+    projects = [dict(record, name=name, group=group)
+                for group in groups for name, record in settings_store.group_projects(group).items()]
+
+    if len(projects) == 0:
+        print("You don't have any projects.")
+        exit()
+
+    name_width = max(len(f"{project['name']} ({project['group']})") for project in projects)
+    status_checker = StatusChecker(PM_HOME, args.workers)
+
+    dirty = failed = 0
+    for project, status in status_checker.check(projects, args.refresh, is_complete=args.group is None):
+        title = f"{project['name']} ({project['group']})".ljust(name_width)
+
+        if status["error"] is not None:
+            failed += 1
+            print(f"{title}  {colored(status['error'], 'red')}")
+            continue
+
+        dirty += status["is_dirty"]
+        branch = status["branch"] if status["branch"] is not None else "(detached)"
+        state = colored("dirty", "yellow") if status["is_dirty"] else colored("clean", "green")
+        sync = f"+{status['ahead']} -{status['behind']}" if status["ahead"] is not None else "no upstream"
+        last_commit = StatusChecker.format_age(status["last_commit"]) if status["last_commit"] is not None else "no commits"
+        print(f"{title}  {branch:<20}  {state}  {sync:<11}  {last_commit}", flush=True)
+
+    print(f"\n{len(projects)} project(s), {dirty} dirty, {failed} cannot be checked.")
+
+# ANCHOR: Print the disk usage of the projects
+elif args.action == "stats":
+    from time import localtime, strftime
+    from src.disk_usage import DiskUsage
+
+    if args.group is not None and not settings_store.has_group(args.group):
+        print(colored(f"You don't have a group called {args.group}.", "yellow"))
+        exit(1)
+
+    groups = [args.group] if args.group is not None else settings_store.groups()
+    projects = [dict(record, name=name, group=group)
+                for group in groups for name, record in settings_store.group_projects(group).items()]
+
+    if len(projects) == 0:
+        print("You don't have any projects.")
+        exit()
+
+    disk_usage = DiskUsage(PM_HOME, args.workers)
+    results = disk_usage.measure(projects, args.refresh, is_complete=args.group is None)
+
+    sort_keys = {
+        "size": lambda result: -result[1]["size"],
+        "files": lambda result: -result[1]["files"],
+        "modified": lambda result: -(result[1]["last_modified"] or 0),
+        "name": lambda result: (result[0]["name"], result[0]["group"]),
+    }
+    results.sort(key=sort_keys[args.sort])
+
+    shown = results[:args.limit] if args.limit is not None else results
+    name_width = max(len(f"{project['name']} ({project['group']})") for project, _ in shown) if len(shown) != 0 else 0
+
+    for project, usage in shown:
+        title = f"{project['name']} ({project['group']})".ljust(name_width)
+
+        if usage["error"] is not None:
+            print(f"{title}  {colored(usage['error'], 'red')}")
+            continue
+
+        last_modified = strftime("%Y-%m-%d %H:%M", localtime(usage["last_modified"])) if usage["last_modified"] else "-"
+        print(f"{title}  {DiskUsage.format_size(usage['size']):>10}  {usage['files']:>9} files  {last_modified}")
+
+    total_size = sum(usage["size"] for _, usage in results)
+    total_files = sum(usage["files"] for _, usage in results)
+    print(f"\n{len(results)} project(s), {DiskUsage.format_size(total_size)} in {total_files} files.")
+
+# ANCHOR: Check the projects against the file system, prune and fix them
+elif args.action == "doctor":
+    from src.registry_doctor import RegistryDoctor
+
+    if args.group is not None and not settings_store.has_group(args.group):
+        print(colored(f"You don't have a group called {args.group}.", "yellow"))
+        exit(1)
+
+    groups = [args.group] if args.group is not None else settings_store.groups()
+    projects = [dict(record, name=name, group=group)
+                for group in groups for name, record in settings_store.group_projects(group).items()]
+
+    if len(projects) == 0:
+        print("You don't have any projects.")
+        exit()
+
+    registry_doctor = RegistryDoctor(settings_store, args.workers)
+
+    results = []
+    for project, problems in registry_doctor.check(projects):
+        if len(problems) == 0:
+            continue
+
+        results.append((project, problems))
+        for problem in problems:
+            color = "red" if problem["fix"] == "prune" else "yellow"
+            print(f"{project['name']} (in group {project['group']}): {colored(problem['message'], color)}", flush=True)
+
+    pruned, fixed = registry_doctor.repair(results, args.prune, args.fix)
+    if not args.quiet:
+        for project in pruned:
+            print(f"{project['name']} (in group {project['group']}): {colored('pruned', 'green')}")
+        for project in fixed:
+            print(f"{project['name']} (in group {project['group']}): {colored('repository URL fixed', 'green')}")
+
+    resolved = {id(project) for project in pruned}
+    remaining = [problem for project, problems in results if id(project) not in resolved for problem in problems
+                 if problem["fix"] is None or problem["fix"] == "prune" or not args.fix]
+
+    print(f"\n{len(projects)} project(s) checked, {sum(len(problems) for _, problems in results)} problem(s), "
+          f"{len(pruned)} project(s) pruned, {len(fixed)} fixed.")
+    if any(problem["fix"] == "prune" for problem in remaining):
+        print(colored("Use --prune to remove the projects whose directories are gone.", "yellow"))
+    if any(problem["fix"] not in (None, "prune") for problem in remaining):
+        print(colored("Use --fix to rewrite the repository URLs that can be fixed.", "yellow"))
+    if len(remaining) != 0:
+        exit(1)
+
 # ANCHOR: Open the repository page in browser
 elif args.action == "browser":
     if args.name == None:
         print(colored("Please specify your project with --name", "yellow"))
         exit(1)
 
-    project_manager = ProjectManager(PM_HOME)
+    project_manager = ProjectManager(PM_HOME, settings_store)
     project_manager.open_repo_in_browser(args.name, args.group)
 
 # ANCHOR: Configure project settings
@@ -169,12 +473,12 @@ elif args.action == "configure":
         print(colored("The project's name is required. Please specify it with --name", "yellow"))
         exit(1)
     
-    settings_manager = SettingsManager(PM_HOME)
+    settings_manager = SettingsManager(PM_HOME, settings_store)
     settings_manager.configure_project(args.name, args.group, args.key, args.value)
 
 # ANCHOR: Manages settings file
 elif args.action == "config":
-    key_list = ["projects_folder", "editor_command", "token"]
+    key_list = ["projects_folder", "editor_command", "token", "settings_cache", "registry_backend", "github_api_url", "git_default_branch", "git_template_dir"]
 
     if args.option == "set":
         if args.key == None or args.value == None:
@@ -183,10 +487,14 @@ elif args.action == "config":
 
         if args.key not in key_list:
             print(colored("Your specified key is not valid.", "yellow"))
-            print(colored("Valid keys: projects_folder, editor_command, token"))
+            print(colored("Valid keys: projects_folder, editor_command, token, settings_cache, registry_backend, github_api_url, git_default_branch, git_template_dir"))
+            exit(1)
+
+        if args.key == "registry_backend" and args.value not in SettingsStore.REGISTRY_BACKENDS:
+            print(colored(f"Valid registry backends: {', '.join(SettingsStore.REGISTRY_BACKENDS)}", "yellow"))
             exit(1)
         
-        settings_manager = SettingsManager(PM_HOME)
+        settings_manager = SettingsManager(PM_HOME, settings_store)
         settings_manager.set_value(args.key, args.value)
     
     elif args.option == "get":
@@ -196,28 +504,30 @@ elif args.action == "config":
            print(*key_list, sep=", ")
            exit(1)
         
-        print(f"{args.key}: {settings[args.key] if settings[args.key] != '' else 'Not set'}")
+        print(f"{args.key}: {settings_store[args.key] if settings_store[args.key] != '' else 'Not set'}")
     
     elif args.option == "list":
         print("All of your settings:")
-        for key in settings:
-            if key != "projects": print(f"{key}: {settings[key] if settings[key] != '' else 'Not set'}")
+        for key in settings_store.keys():
+            print(f"{key}: {settings_store[key] if settings_store[key] != '' else 'Not set'}")
     
     elif args.option == "open":
-        if settings["editor_command"] == "":
+        if settings_store["editor_command"] == "":
             print(colored("You must set your editor command in settings in order to open the settings file.", "yellow"))
             print(colored("To set: pm --config set --key editor_command --value \"your-editor-command-here\"", "yellow"))
             exit(1)
         
         print("Opening the settings file (pm-settings.json) in your editor...")
+        settings_store.compact() # Apply the journal, so the file has every change before it's edited
         os.chdir(PM_HOME)
-        os.system(settings["editor_command"].replace(" .", " pm-settings.json"))
+        with tracing.phase("command", settings_store["editor_command"]):
+            os.system(settings_store["editor_command"].replace(" .", " pm-settings.json"))
     
     else:
         print(colored(f"You can't use option {args.option} in config action", "yellow"))
         exit(1)
 
-elif args.reset:
+elif args.action == "reset":
     print(colored("WARNING! YOU ARE GOING TO DELETE ALL OF YOUR SETTINGS!", "red", attrs=["bold"]))
     print(colored("Setup script will be executed after resetting.", "red"))
     
@@ -248,5 +558,5 @@ elif args.reset:
 
     print("Entering setup mode...")
 
-    settings_manager = SettingsManager(PM_HOME)
-    settings_manager.setup()
+    settings_manager = SettingsManager(PM_HOME, settings_store)
+    settings_manager.setup(args.workers, args.quiet, args.progress)
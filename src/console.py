@@ -0,0 +1,33 @@
+import sys
+
+
+def colored(text: str, color: str = None, on_color: str = None, attrs: list = None) -> str:
+    """
+    Colors the given text with termcolor
+
+    termcolor is imported on the first call, so the commands that never
+    print a colored message don't pay for the import. When stdout isn't a
+    terminal (a pipe or a file) the text is returned as it is, without
+    importing termcolor at all.
+
+    Parameters
+    ----------
+    text : str
+        The text that will be colored
+
+    color : str
+        Text color (optional)
+
+    on_color : str
+        Background color (optional)
+
+    attrs : list
+        Text attributes like "bold" (optional)
+    """
+
+    if not sys.stdout.isatty():
+        return text
+
+    from termcolor import colored as termcolor_colored
+
+    return termcolor_colored(text, color, on_color, attrs)
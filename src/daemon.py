@@ -0,0 +1,226 @@
+import os
+import signal
+import socket
+from json import dumps, loads
+from src.daemon_client import DaemonClient
+from src.settings_store import SettingsStore
+
+
+class ProjectManagerDaemon(object):
+    """
+    Resident process that answers read-only requests (path, list, find, open) over a Unix socket
+
+    The settings and their indexes stay in memory between requests, so a
+    client doesn't have to load anything. Before every request the signatures
+    of the settings file and the journal are checked, and the settings are
+    reloaded if another process has changed them.
+
+    The daemon only answers requests that it can answer completely. Anything
+    that needs a prompt or prints a warning (a missing or ambiguous project, an
+    unknown group, ...) is sent back as "fallback" and the client executes it
+    in-process, so the behaviour and the output are always the same as without
+    the daemon.
+
+    Attributes
+    ----------
+    project_manager_home : str
+        The home directory of Project Manager
+    settings_store : SettingsStore
+        The settings that are kept in memory
+    socket_path : str
+        Unix socket that the daemon listens on
+
+    Methods
+    -------
+    serve()
+        Answers requests until interrupted or terminated
+
+    handle(message : dict) -> dict
+        Answers one request
+    """
+
+    def __init__(self, project_manager_home: str, settings_store: SettingsStore = None):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        settings_store : SettingsStore
+            Loaded settings (the process-wide store of project_manager_home is used if not given)
+        """
+
+        self.project_manager_home = project_manager_home
+        self.settings_store = settings_store if settings_store is not None else SettingsStore.get(project_manager_home)
+        self.socket_path = DaemonClient.socket_path_of(project_manager_home)
+
+    def serve(self):
+        """
+        Answers requests until interrupted (KeyboardInterrupt) or terminated (SIGTERM)
+
+        Raises OSError if another daemon is already running for the same home directory.
+        """
+
+        if DaemonClient(self.project_manager_home).request(dict(action="ping")) is not None:
+            raise OSError(f"A daemon is already listening on {self.socket_path}")
+
+        try:
+            os.remove(self.socket_path)  # Left by a daemon that was killed
+        except OSError:
+            pass
+
+        # Everything that can be prepared is prepared before the first request
+        self.settings_store.search_index
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)  # Only the owner can connect
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        server.listen(64)
+
+        def terminate(signal_number, frame):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, terminate)
+
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection:
+                    self._answer(connection)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    def _answer(self, connection: socket.socket):
+        connection.settimeout(DaemonClient.TIMEOUT)
+
+        try:
+            chunks = []
+            while not chunks or not chunks[-1].endswith(b"\n"):
+                chunk = connection.recv(64 * 1024)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+
+            try:
+                response = self.handle(loads(b"".join(chunks)))
+            except Exception:  # A request must never stop the daemon
+                response = dict(status="fallback")
+
+            connection.sendall(dumps(response).encode())
+        except OSError:
+            pass  # The client has gone away
+
+    def handle(self, message: dict) -> dict:
+        """
+        Answers one request
+
+        Parameters
+        ----------
+        message : dict
+            The parsed arguments of the client (action, name, group, option, query)
+
+        Returns
+        -------
+        dict
+            {"status": "ok", "output": str} (with "dir" and "command" for action open),
+            or {"status": "fallback"} if the client must execute the request itself
+        """
+
+        fallback = dict(status="fallback")
+        action = message.get("action")
+
+        if action == "ping":
+            return dict(status="ok", output="")
+
+        try:
+            self.settings_store.refresh()  # Notices the changes made by other processes
+        except (OSError, ValueError):
+            return fallback  # Settings are being reset or are broken, let the client report it
+
+        store = self.settings_store
+        name = message.get("name")
+        group = message.get("group")
+
+        if action == "path" or action == "open":
+            if name is None or (action == "open" and store["editor_command"] == ""):
+                return fallback
+
+            project = self._find_project(name, group)
+            if project is None:
+                return fallback
+
+            if action == "path":
+                return dict(status="ok", output=f"{project['dir']}\n")
+            if not os.path.isdir(project["dir"]):
+                return fallback  # The client warns about the missing directory
+            return dict(status="ok", output="", dir=project["dir"], command=store["editor_command"])
+
+        elif action == "find":
+            query = message.get("query") if message.get("query") is not None else name
+            if query is None:
+                return fallback
+
+            projects = store.search_projects(query, group)
+            if len(projects) == 0:
+                return fallback
+
+            return dict(status="ok", output="".join(
+                f"{project['name']} (in group {project['group']}): {project['dir']}\n" for project in projects))
+
+        elif action == "list":
+            return self._list(message)
+
+        return fallback
+
+    def _find_project(self, name: str, group: str = None) -> dict:
+        """
+        The project if it's found without asking the user, otherwise None
+        """
+
+        if group is not None:
+            return self.settings_store.get_project(name, group)
+
+        projects = self.settings_store.find_projects(name)
+        return projects[0] if len(projects) == 1 else None
+
+    def _list(self, message: dict) -> dict:
+        from src.project_listing import ProjectListing
+
+        fallback = dict(status="fallback")
+        store = self.settings_store
+        name, group = message.get("name"), message.get("group")
+
+        option = message.get("option")
+        format = message.get("format") or "text"
+        fields = message["fields"].split(",") if message.get("fields") else None
+        try:
+            offset = int(message.get("offset") or 0)
+            limit = int(message["limit"]) if message.get("limit") is not None else None
+        except ValueError:
+            return fallback  # argparse prints the error
+
+        if option not in ["projects", "p", "groups", "g"] or format not in ProjectListing.FORMATS or \
+                offset < 0 or (limit is not None and limit < 0):
+            return fallback
+
+        if option in ["projects", "p"] and (name or group) and len(store.groups()) != 0:
+            if name and group:
+                return fallback  # Prints a warning
+            group = group if group is not None else name
+            if not store.has_group(group):
+                return fallback
+        else:
+            group = None
+
+        chunks = []
+        ProjectListing(store).write(chunks.append, option, group, format, fields, offset, limit)
+        return dict(status="ok", output="".join(chunks))
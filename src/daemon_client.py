@@ -0,0 +1,135 @@
+import os
+from json import dumps, loads
+
+
+class DaemonClient(object):
+    """
+    Client of the resident Project Manager daemon (pm daemon)
+
+    Kept small on purpose: it's imported on every start-up, before the settings
+    are loaded, and when the daemon answers a request nothing else is needed.
+
+    Attributes
+    ----------
+    socket_path : str
+        Unix socket of the daemon
+
+    Methods
+    -------
+    parse_arguments(arguments : list, list_options : list) -> dict
+        Parses the command line of a request that the daemon can answer
+
+    is_running() -> bool
+        Checks if the socket of the daemon exists
+
+    request(message : dict) -> dict
+        Sends a request, returns None if the daemon cannot answer it
+    """
+
+    SOCKET_FILE = "pm-daemon.sock"
+    ACTIONS = ["open", "list", "path", "find"]  # Actions that the daemon can answer
+    TIMEOUT = 2.0
+
+    def __init__(self, project_manager_home: str):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+        """
+
+        self.socket_path = self.socket_path_of(project_manager_home)
+
+    @classmethod
+    def socket_path_of(cls, project_manager_home: str) -> str:
+        return f"{project_manager_home}/{cls.SOCKET_FILE}"
+
+    @classmethod
+    def parse_arguments(cls, arguments: list, list_options: list) -> dict:
+        """
+        Parses the command line arguments of a request that the daemon can answer
+
+        Only the arguments of the actions in ACTIONS are understood (argparse is too slow
+        to import before every request). Returns None for anything else, which is then
+        parsed by argparse as usual.
+
+        Parameters
+        ----------
+        arguments : list
+            Command line arguments (without the program name)
+
+        list_options : list
+            Valid values of --option
+        """
+
+        if len(arguments) == 0 or arguments[0] not in cls.ACTIONS:
+            return None
+
+        flags = {"-n": "name", "--name": "name", "-g": "group", "--group": "group", "-o": "option", "--option": "option",
+                 "--format": "format", "--fields": "fields", "--limit": "limit", "--offset": "offset"}
+        message = dict(action=arguments[0], name=None, group=None, option=None, query=None,
+                       format=None, fields=None, limit=None, offset=None)
+
+        i = 1
+        while i < len(arguments):
+            argument = arguments[i]
+
+            if argument.startswith("--") and "=" in argument:
+                flag, value = argument.split("=", 1)
+            elif argument in flags and i + 1 < len(arguments) and not arguments[i + 1].startswith("-"):
+                flag, value = argument, arguments[i + 1]
+                i += 1
+            elif not argument.startswith("-") and message["query"] is None:
+                flag, value = None, argument
+            else:
+                return None  # Help, version, other flags or a mistake
+
+            if flag is None:
+                message["query"] = value
+            elif flag in flags:
+                message[flags[flag]] = value
+            else:
+                return None
+
+            i += 1
+
+        if message["option"] is not None and message["option"] not in list_options:
+            return None  # argparse prints the error
+
+        return message
+
+    def is_running(self) -> bool:
+        return os.path.exists(self.socket_path)
+
+    def request(self, message: dict) -> dict:
+        """
+        Sends a request to the daemon
+
+        Returns the response, or None if the daemon isn't running, doesn't respond or
+        cannot answer the request by itself (then it must be executed in-process).
+        """
+
+        import socket
+
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(self.TIMEOUT)
+                connection.connect(self.socket_path)
+                connection.sendall(dumps(message).encode() + b"\n")
+                connection.shutdown(socket.SHUT_WR)
+
+                chunks = []
+                while True:
+                    chunk = connection.recv(64 * 1024)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+        except OSError:
+            return None  # Not running (a stale socket) or too slow
+
+        try:
+            response = loads(b"".join(chunks))
+        except ValueError:
+            return None
+
+        return response if response.get("status") == "ok" else None
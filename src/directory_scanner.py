@@ -0,0 +1,164 @@
+import os
+import sys
+from src.tracing import traced
+
+
+class DirectoryScanner(object):
+    """
+    Scans a projects folder that has a Group -> Project hierarchy
+
+    Directories are listed with os.scandir, so the type of an entry comes from
+    the directory listing itself instead of a stat call per entry (only symbolic
+    links are followed with a stat). The groups are listed in parallel on a
+    thread pool, which matters most on network filesystems where every listing
+    waits for a round trip.
+
+    Attributes
+    ----------
+    max_workers : int
+        Number of groups listed at the same time
+    quiet : bool
+        Prints nothing if True
+    progress : bool
+        Prints a progress bar (to stderr) instead of every scanned project
+
+    Methods
+    -------
+    list_directories(path : str) -> list
+        Names of the visible directories in path
+
+    scan_groups(projects_folder : str, groups : list) -> dict
+        Lists the projects of given groups
+
+    scan(projects_folder : str) -> dict
+        Scans the whole projects folder
+    """
+
+    DEFAULT_WORKERS = 16  # Listing is I/O bound, so more threads than cores still helps
+    PROGRESS_WIDTH = 30
+
+    def __init__(self, max_workers: int = None, quiet: bool = False, progress: bool = False):
+        """
+        Parameters
+        ----------
+        max_workers : int
+            Number of groups listed at the same time (DEFAULT_WORKERS if not given)
+
+        quiet : bool
+            Prints nothing if True
+
+        progress : bool
+            Prints a progress bar (to stderr) instead of every scanned project
+        """
+
+        self.max_workers = max_workers if max_workers is not None else self.DEFAULT_WORKERS
+        self.quiet = quiet
+        self.progress = progress
+
+    @staticmethod
+    def list_directories(path: str) -> list:
+        """
+        Names of the directories in path, except the hidden ones (starting with a dot)
+        """
+
+        with os.scandir(path) as entries:
+            return [entry.name for entry in entries if entry.name[0] != "." and entry.is_dir()]
+
+    @traced("scan")
+    def scan_groups(self, projects_folder: str, groups: list) -> dict:
+        """
+        Lists the projects of given groups in parallel
+
+        A group that cannot be listed is reported and left out of the result.
+
+        Parameters
+        ----------
+        projects_folder : str
+            The folder that contains the groups
+
+        groups : list
+            Names of the groups that will be listed
+
+        Returns
+        -------
+        dict
+            Group -> list of project names (in the order of groups)
+        """
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from src.console import colored
+
+        result = dict()
+        if len(groups) == 0:
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(groups)))) as executor:
+            futures = {executor.submit(self.list_directories, f"{projects_folder}/{group}"): group for group in groups}
+            listed = dict()
+
+            for done, future in enumerate(as_completed(futures), 1):
+                group = futures[future]
+                try:
+                    listed[group] = future.result()
+                except OSError as e:
+                    self._clear_progress()
+                    print(colored(f"Cannot scan group {group}: {e.strerror}", "yellow"), file=sys.stderr)
+
+                self._print_progress(done, len(groups))
+
+        self._clear_progress()
+        for group in groups:
+            if group in listed:
+                result[group] = listed[group]
+
+        return result
+
+    def scan(self, projects_folder: str) -> dict:
+        """
+        Scans the whole projects folder
+
+        Parameters
+        ----------
+        projects_folder : str
+            The folder that contains the groups
+
+        Returns
+        -------
+        dict
+            Group -> {project name: record}, as in settings["projects"]
+        """
+
+        groups = self.scan_groups(projects_folder, self.list_directories(projects_folder))
+        projects = dict()
+
+        for group, names in groups.items():
+            projects[group] = {name: dict(dir=f"{projects_folder}/{group}/{name}") for name in names}
+
+        if not self.quiet and not self.progress:
+            lines = []
+            for group, names in groups.items():
+                lines.append(f"\n* {group}")
+                lines.extend(f"|-> {name}" for name in names)
+            if len(lines) != 0:
+                print("\n".join(lines))
+
+        return projects
+
+    def _print_progress(self, done: int, total: int):
+        if self.quiet or not self.progress:
+            return
+
+        filled = self.PROGRESS_WIDTH * done // total
+        if filled == self.PROGRESS_WIDTH * (done - 1) // total and done != total:
+            return  # Redrawn only when the bar changes
+
+        bar = "#" * filled + "." * (self.PROGRESS_WIDTH - filled)
+        sys.stderr.write(f"\r[{bar}] {done}/{total} groups")
+        sys.stderr.flush()
+
+    def _clear_progress(self):
+        if self.quiet or not self.progress:
+            return
+
+        sys.stderr.write("\r" + " " * (self.PROGRESS_WIDTH + 32) + "\r")
+        sys.stderr.flush()
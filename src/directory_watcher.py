@@ -0,0 +1,288 @@
+import os
+from time import monotonic
+
+
+class DirectoryWatcher(object):
+    """
+    Watches a projects folder (Group -> Project hierarchy) for added, renamed and removed directories
+
+    On Linux the folder and every group directory are watched with inotify
+    (through ctypes, nothing has to be installed). Elsewhere, or if inotify
+    cannot be used, the mtimes of the directories are polled instead; a
+    directory's mtime changes whenever an entry is added to, renamed in or
+    removed from it, so polling never has to list anything.
+
+    Changes are collected until nothing has happened for DEBOUNCE seconds (or
+    for at most MAX_DELAY seconds), then on_change is called once with the
+    changed groups.
+
+    Attributes
+    ----------
+    projects_folder : str
+        The watched folder
+    on_change : callable
+        Called with a list of changed group names, or None if every group must be checked
+    backend : str
+        "inotify" or "polling"
+
+    Methods
+    -------
+    start()
+        Starts watching (the changes are collected from this moment)
+
+    run()
+        Calls on_change for the changes until interrupted
+
+    close()
+        Stops watching
+    """
+
+    DEBOUNCE = 1.0
+    MAX_DELAY = 10.0
+    POLL_INTERVAL = 2.0
+
+    # inotify(7) constants
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    def __init__(self, projects_folder: str, on_change):
+        """
+        Parameters
+        ----------
+        projects_folder : str
+            The folder that will be watched
+
+        on_change : callable
+            Called with a list of changed group names, or None if every group must be checked
+        """
+
+        self.projects_folder = projects_folder
+        self.on_change = on_change
+        self.backend = None
+
+        self._libc = None
+        self._fd = None
+        self._watches = dict()  # inotify watch descriptor -> group name ("" for the projects folder)
+        self._signatures = dict()  # Polled directory -> (mtime_ns, inode)
+
+        self._changed = set()
+        self._check_all = False
+        self._first_change = None
+        self._last_change = None
+
+    def start(self):
+        """
+        Starts watching (with inotify if possible)
+        """
+
+        try:
+            self._start_inotify()
+            self.backend = "inotify"
+        except OSError:
+            self._close_inotify()
+            self._start_polling()
+            self.backend = "polling"
+
+    def run(self):
+        """
+        Calls on_change for the changes until interrupted (KeyboardInterrupt)
+        """
+
+        while True:
+            if self.backend == "inotify":
+                self._wait_inotify(self._timeout())
+            else:
+                self._wait_polling(self._timeout())
+
+            if self._is_due():
+                groups = None if self._check_all else sorted(self._changed)
+                self._changed = set()
+                self._check_all = False
+                self._first_change = None
+                self._last_change = None
+                self.on_change(groups)
+
+    def close(self):
+        self._close_inotify()
+
+    def _mark_changed(self, group: str = None):
+        """
+        Records a change of a group (or of the whole folder if group is None)
+        """
+
+        if group is None:
+            self._check_all = True
+        elif group[0] != ".":
+            self._changed.add(group)
+        else:
+            return
+
+        now = monotonic()
+        if self._first_change is None:
+            self._first_change = now
+        self._last_change = now
+
+    def _timeout(self) -> float:
+        if self._first_change is None:
+            return self.POLL_INTERVAL if self.backend == "polling" else None
+
+        now = monotonic()
+        timeout = min(self._last_change + self.DEBOUNCE, self._first_change + self.MAX_DELAY) - now
+        if self.backend == "polling":
+            timeout = min(timeout, self.POLL_INTERVAL)
+        return max(0.0, timeout)
+
+    def _is_due(self) -> bool:
+        if self._first_change is None:
+            return False
+
+        now = monotonic()
+        return now - self._last_change >= self.DEBOUNCE or now - self._first_change >= self.MAX_DELAY
+
+    # inotify backend
+
+    def _start_inotify(self):
+        import ctypes
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1
+        except (OSError, AttributeError):
+            raise OSError("inotify is not available")
+
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc = libc
+
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            self._fd = None
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self._add_watch("")
+        with os.scandir(self.projects_folder) as entries:
+            for entry in entries:
+                if entry.name[0] != "." and entry.is_dir():
+                    self._add_watch(entry.name)
+
+    def _add_watch(self, group: str):
+        import ctypes
+
+        path = f"{self.projects_folder}/{group}" if group != "" else self.projects_folder
+        descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.WATCH_MASK)
+        if descriptor < 0:
+            errno = ctypes.get_errno()
+            if group != "" and errno in (2, 20):  # ENOENT, ENOTDIR: removed or replaced meanwhile
+                self._mark_changed(group)
+                return
+            raise OSError(errno, os.strerror(errno), path)  # ENOSPC (watch limit) etc.
+
+        self._watches[descriptor] = group
+
+    def _wait_inotify(self, timeout: float):
+        import select
+        from struct import Struct
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if len(readable) == 0:
+            return
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        event = Struct("iIII")  # Watch descriptor, mask, cookie, name length
+        offset = 0
+
+        while offset < len(data):
+            descriptor, mask, _, length = event.unpack_from(data, offset)
+            name = data[offset + event.size:offset + event.size + length].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += event.size + length
+
+            if mask & self.IN_Q_OVERFLOW:
+                self._mark_changed(None)  # Some events were lost
+                continue
+
+            group = self._watches.get(descriptor)
+            if group is None:
+                continue
+
+            if mask & self.IN_IGNORED:
+                del self._watches[descriptor]  # The directory is gone
+            elif group == "":
+                if mask & self.IN_ISDIR and name[0] != ".":
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        try:
+                            self._add_watch(name)
+                        except OSError:
+                            self._mark_changed(None)
+                    self._mark_changed(name)
+                elif mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    self._mark_changed(None)
+            elif mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                self._mark_changed(group)
+            elif mask & self.IN_ISDIR:
+                self._mark_changed(group)
+
+    def _close_inotify(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._watches = dict()
+
+    # Polling backend
+
+    def _start_polling(self):
+        self._signatures = self._poll()
+
+    def _poll(self) -> dict:
+        signatures = dict()
+
+        try:
+            stat = os.stat(self.projects_folder)
+            signatures[""] = (stat.st_mtime_ns, stat.st_ino)
+        except OSError:
+            return signatures
+
+        # The group list is taken again only when the projects folder itself has changed
+        groups = [group for group in self._signatures if group != ""]
+        if signatures[""] != self._signatures.get(""):
+            try:
+                groups = [entry.name for entry in os.scandir(self.projects_folder)
+                          if entry.name[0] != "." and entry.is_dir()]
+            except OSError:
+                pass
+
+        for group in groups:
+            try:
+                stat = os.stat(f"{self.projects_folder}/{group}")
+            except OSError:
+                continue
+            signatures[group] = (stat.st_mtime_ns, stat.st_ino)
+
+        return signatures
+
+    def _wait_polling(self, timeout: float):
+        from time import sleep
+
+        sleep(timeout)
+        signatures = self._poll()
+
+        for group in self._signatures.keys() | signatures.keys():
+            if group != "" and self._signatures.get(group) != signatures.get(group):
+                self._mark_changed(group)
+        self._signatures = signatures
@@ -0,0 +1,201 @@
+import os
+import marshal
+from time import time
+
+
+class DiskUsage(object):
+    """
+    Measures the disk usage, file count and last modification of projects (pm stats)
+
+    The projects are walked with os.scandir on a thread pool. What every
+    directory holds by itself (the size and count of its files, its newest
+    modification and its subdirectories) is cached in pm-stats.cache, keyed on
+    the directory's mtime. A directory's mtime changes when an entry is added,
+    removed or renamed in it, so a rerun only lists the directories whose mtime
+    has changed; the others cost one stat call.
+
+    A file that is rewritten in place doesn't change the mtime of its directory,
+    so its new size isn't noticed until the directory changes; measure(refresh=True)
+    walks everything again.
+
+    Sizes are the space used on disk (like du), symbolic links aren't followed.
+
+    Attributes
+    ----------
+    project_manager_home : str
+        The home directory of Project Manager
+    max_workers : int
+        Number of projects walked at the same time
+
+    Methods
+    -------
+    measure(projects : list, refresh : bool = False, is_complete : bool = True) -> list
+        Measures the projects
+
+    format_size(size : int) -> str
+        Human readable size, like "1.5 GB"
+    """
+
+    CACHE_FILE = "pm-stats.cache"
+    CACHE_VERSION = 1
+    DEFAULT_WORKERS = 16
+    RACY_SECONDS = 1  # Directories changed this recently aren't cached (their mtime may not change again)
+
+    def __init__(self, project_manager_home: str, max_workers: int = None):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        max_workers : int
+            Number of projects walked at the same time (DEFAULT_WORKERS if not given)
+        """
+
+        self.project_manager_home = project_manager_home
+        self.max_workers = max_workers if max_workers is not None else self.DEFAULT_WORKERS
+
+    @property
+    def cache_path(self) -> str:
+        return f"{self.project_manager_home}/{self.CACHE_FILE}"
+
+    def measure(self, projects: list, refresh: bool = False, is_complete: bool = True) -> list:
+        """
+        Measures the projects
+
+        Parameters
+        ----------
+        projects : list
+            Projects as dicts with at least dir
+
+        refresh : bool
+            Lists every directory, even if its cached contents are still valid
+
+        is_complete : bool
+            True if projects are all of the projects (the cached directories of the others are removed)
+
+        Returns
+        -------
+        list
+            (project, usage) for each project in the same order; usage is a dict with size
+            (bytes), files, last_modified (Unix time, None for an empty project) and error
+            (None if it was measured)
+        """
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        cache = self._read_cache() if not refresh else dict()
+        new_cache = dict(cache) if not is_complete else dict()
+        racy_before = (time() - self.RACY_SECONDS) * 1e9
+
+        def measure_project(project: dict) -> dict:
+            usage = dict(size=0, files=0, last_modified=None, error=None)
+            try:
+                os.stat(project["dir"])
+            except OSError as e:
+                usage["error"] = f"The directory cannot be read: {e.strerror}"
+                return usage
+
+            latest = 0
+            stack = [project["dir"]]
+            while len(stack) != 0:
+                path = stack.pop()
+                try:
+                    stat = os.stat(path, follow_symlinks=path == project["dir"])  # The project itself may be a link
+                except OSError:
+                    continue  # Removed while walking
+
+                entry = cache.get(path)
+                if entry is None or entry[0] != stat.st_mtime_ns:
+                    entry = self._list_directory(path, stat)
+                    if entry is None:
+                        continue
+                    if stat.st_mtime_ns >= racy_before:
+                        entry = (None, *entry[1:])  # Listed again the next time
+
+                new_cache[path] = entry
+                _, size, files, newest, subdirectories = entry
+
+                usage["size"] += size
+                usage["files"] += files
+                latest = max(latest, newest)
+                stack.extend(f"{path}/{name}" for name in subdirectories)
+
+            usage["last_modified"] = latest // 10 ** 9 if latest != 0 else None
+            return usage
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            usages = list(executor.map(measure_project, projects))
+
+        self._write_cache(new_cache)
+        return list(zip(projects, usages))
+
+    @staticmethod
+    def _list_directory(path: str, stat) -> tuple:
+        """
+        (mtime, size, file count, newest mtime, subdirectories) of what the directory holds by itself
+        """
+
+        size = DiskUsage._disk_size(stat)
+        newest = stat.st_mtime_ns
+        files = 0
+        subdirectories = []
+
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.name)
+                            continue
+
+                        entry_stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+
+                    files += 1
+                    size += DiskUsage._disk_size(entry_stat)
+                    newest = max(newest, entry_stat.st_mtime_ns)
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, size, files, newest, tuple(subdirectories)
+
+    @staticmethod
+    def _disk_size(stat) -> int:
+        blocks = getattr(stat, "st_blocks", None)
+        return blocks * 512 if blocks is not None else stat.st_size
+
+    @staticmethod
+    def format_size(size: int) -> str:
+        """
+        Human readable size, like "1.5 GB"
+        """
+
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024:
+                return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            size /= 1024
+
+        return f"{size:.1f} TB"
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.cache_path, "rb") as file:
+                cache = marshal.load(file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return dict()
+
+        if not isinstance(cache, dict) or cache.get("version") != self.CACHE_VERSION:
+            return dict()
+        return cache["directories"]
+
+    def _write_cache(self, directories: dict):
+        temporary_path = f"{self.cache_path}.{os.getpid()}.tmp"  # Another process may be writing it too
+
+        try:
+            with open(temporary_path, "wb") as file:
+                marshal.dump(dict(version=self.CACHE_VERSION, directories=directories), file)
+            os.replace(temporary_path, self.cache_path)
+        except OSError:
+            pass  # The cache is only an optimization
@@ -0,0 +1,42 @@
+class FileLock(object):
+    """
+    Exclusive, reentrant lock on a file (fcntl.flock), used as a context manager
+
+    On platforms without fcntl the lock does nothing.
+
+    Attributes
+    ----------
+    path : str
+        The lock file (created if it doesn't exist)
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            The lock file (created if it doesn't exist)
+        """
+
+        self.path = path
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self) -> "FileLock":
+        if self._depth == 0:
+            self._file = open(self.path, "a")
+            try:
+                import fcntl
+            except ImportError:
+                pass
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            self._file.close()  # Closing the file releases the lock
+            self._file = None
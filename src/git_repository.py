@@ -0,0 +1,481 @@
+import os
+
+
+class GitRepository(object):
+    """
+    Reads and writes the git metadata of a project directly in its .git directory
+
+    Starting git for every project is what makes bulk operations on thousands
+    of projects slow, so the few things Project Manager needs are read from the
+    files themselves, and new repositories are laid out without running git.
+
+    Attributes
+    ----------
+    path : str
+        Working directory of the repository
+
+    Methods
+    -------
+    git_dir -> str
+        The .git directory (None if path isn't a repository)
+
+    config_value(section : str, key : str) -> str
+        A value of .git/config
+
+    origin_url -> str
+        URL of the origin remote
+
+    head_ref -> str
+        The branch that HEAD points to
+
+    upstream_ref(branch_ref : str) -> str
+        The remote-tracking branch of a branch
+
+    commit_time(oid : str) -> int
+        Commit time of a loose commit object
+
+    tracked_files() -> list
+        Paths of the files in the index
+
+    init(default_branch : str, template_dir : str = None)
+        Creates an empty repository
+
+    add_remote(name : str, url : str)
+        Adds a remote
+
+    global_config_value(section : str, key : str) -> str
+        A value of the global git configuration
+
+    parse_github_url(url : str, host : str) -> str
+        owner/repo of a GitHub URL
+
+    parse_repository_url(url : str, host : str, is_nested : bool = False) -> str
+        Path of the repository in a URL
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Working directory of the repository
+        """
+
+        self.path = path
+
+    @property
+    def git_dir(self) -> str:
+        """
+        The .git directory, None if path isn't a git repository
+
+        A .git file (worktrees and submodules) points to the real directory.
+        """
+
+        dot_git = f"{self.path}/.git"
+        if os.path.isdir(dot_git):
+            return dot_git
+
+        try:
+            with open(dot_git, "r") as file:
+                line = file.readline().strip()
+        except OSError:
+            return None
+
+        if not line.startswith("gitdir:"):
+            return None
+        git_dir = line[len("gitdir:"):].strip()
+        return git_dir if os.path.isabs(git_dir) else os.path.normpath(f"{self.path}/{git_dir}")
+
+    def config_value(self, section: str, key: str) -> str:
+        """
+        The last value of a key in .git/config, None if it isn't set
+
+        Parameters
+        ----------
+        section : str
+            Section with its subsection as written in the file (like remote "origin")
+
+        key : str
+            Name of the key (case-insensitive, like git)
+        """
+
+        git_dir = self.git_dir
+        if git_dir is None:
+            return None
+
+        return self.config_file_value(f"{git_dir}/config", section, key)
+
+    @classmethod
+    def global_config_value(cls, section: str, key: str) -> str:
+        """
+        The value of a key in the global git configuration of the user, None if it isn't set
+        """
+
+        paths = [os.path.expanduser("~/.gitconfig")]
+        if os.environ.get("GIT_CONFIG_GLOBAL"):
+            paths = [os.environ["GIT_CONFIG_GLOBAL"]]
+        else:
+            config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+            paths.insert(0, f"{config_home}/git/config")  # ~/.gitconfig overrides it
+
+        value = None
+        for path in paths:
+            path_value = cls.config_file_value(path, section, key)
+            if path_value is not None:
+                value = path_value
+
+        return value
+
+    @classmethod
+    def config_file_value(cls, path: str, section: str, key: str) -> str:
+        """
+        The last value of a key in a git config file, None if it isn't set (include directives are ignored)
+        """
+
+        try:
+            with open(path, "r") as file:
+                lines = file.readlines()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        wanted_section = cls._section_name(section)
+        current_section = None
+        value = None
+
+        for line in lines:
+            line = line.strip()
+            if line == "" or line[0] in "#;":
+                continue
+
+            if line[0] == "[":
+                end = line.find("]")
+                current_section = cls._section_name(line[1:end]) if end != -1 else None
+                continue
+
+            if current_section != wanted_section or "=" not in line:
+                continue
+
+            name, line_value = line.split("=", 1)
+            if name.strip().lower() == key.lower():
+                value = cls._unquote(line_value.strip())
+
+        return value
+
+    @property
+    def origin_url(self) -> str:
+        """
+        URL of the origin remote, None if there isn't one
+        """
+
+        return self.config_value('remote "origin"', "url")
+
+    @property
+    def head_ref(self) -> str:
+        """
+        The ref that HEAD points to (like refs/heads/main), None if it's detached or unreadable
+        """
+
+        git_dir = self.git_dir
+        if git_dir is None:
+            return None
+
+        try:
+            with open(f"{git_dir}/HEAD", "r") as file:
+                head = file.readline().strip()
+        except OSError:
+            return None
+
+        return head[len("ref:"):].strip() if head.startswith("ref:") else None
+
+    def upstream_ref(self, branch_ref: str) -> str:
+        """
+        The remote-tracking ref of a branch (like refs/remotes/origin/main), None if it has no upstream
+        """
+
+        if branch_ref is None or not branch_ref.startswith("refs/heads/"):
+            return None
+
+        branch = branch_ref[len("refs/heads/"):]
+        remote = self.config_value(f'branch "{branch}"', "remote")
+        merge = self.config_value(f'branch "{branch}"', "merge")
+        if remote is None or merge is None or not merge.startswith("refs/heads/"):
+            return None
+
+        if remote == ".":  # Tracks a local branch
+            return merge
+        return f"refs/remotes/{remote}/{merge[len('refs/heads/'):]}"
+
+    def commit_time(self, oid: str) -> int:
+        """
+        Commit time (Unix time) of a commit, None if it isn't stored as a loose object
+
+        Recent commits usually are; packed ones have to be asked from git.
+        """
+
+        git_dir = self.git_dir
+        if git_dir is None or oid is None or len(oid) < 3:
+            return None
+
+        import zlib
+
+        try:
+            with open(f"{git_dir}/objects/{oid[:2]}/{oid[2:]}", "rb") as file:
+                data = zlib.decompressobj().decompress(file.read(), 4096)  # The header is at the beginning
+        except (OSError, zlib.error):
+            return None
+
+        for line in data.split(b"\n"):
+            if line == b"":
+                break  # End of the header, the message follows
+            if line.startswith(b"committer "):
+                try:
+                    return int(line.rsplit(b" ", 2)[1])
+                except (IndexError, ValueError):
+                    return None
+
+        return None
+
+    def tracked_files(self) -> list:
+        """
+        Paths (relative to path) of the files in .git/index, None if it cannot be read
+
+        Versions 2 to 4 of the index are understood. A split index (core.splitIndex)
+        has only some of the files in .git/index, so None is returned for it too.
+        """
+
+        git_dir = self.git_dir
+        if git_dir is None:
+            return None
+
+        from struct import error as StructError, unpack_from
+
+        try:
+            with open(f"{git_dir}/index", "rb") as file:
+                data = file.read()
+            signature, version, count = unpack_from(">4sII", data)
+        except (OSError, StructError):
+            return None
+
+        if signature != b"DIRC" or version not in (2, 3, 4):
+            return None
+
+        object_format = self.config_value("extensions", "objectformat")
+        hash_size = 32 if object_format is not None and object_format.lower() == "sha256" else 20
+
+        paths = []
+        offset = 12
+        path = b""
+        try:
+            for _ in range(count):
+                start = offset
+                offset += 40 + hash_size  # Stat data and object name
+                flags, = unpack_from(">H", data, offset)
+                offset += 2
+                if flags & 0x4000 and version >= 3:  # Extended flags
+                    offset += 2
+
+                if version == 4:  # The path is the end of the previous one replaced by a suffix
+                    byte = data[offset]
+                    offset += 1
+                    strip = byte & 0x7F
+                    while byte & 0x80:
+                        byte = data[offset]
+                        offset += 1
+                        strip = ((strip + 1) << 7) | (byte & 0x7F)
+                    end = data.index(b"\0", offset)
+                    path = path[:len(path) - strip] + data[offset:end]
+                    offset = end + 1
+                else:  # NUL-terminated and padded to a multiple of 8 bytes
+                    end = data.index(b"\0", offset)
+                    path = data[offset:end]
+                    offset = start + ((end - start) // 8 + 1) * 8
+
+                paths.append(path.decode("utf-8", "surrogateescape"))
+
+            while offset + 8 <= len(data) - hash_size:  # Extensions, followed by the checksum
+                extension, size = unpack_from(">4sI", data, offset)
+                if extension == b"link":
+                    return None
+                offset += 8 + size
+        except (IndexError, ValueError, StructError):
+            return None
+
+        return paths
+
+    def init(self, default_branch: str, template_dir: str = None):
+        """
+        Creates an empty repository, like git init but without starting git
+
+        Writes the same minimal layout as git init: HEAD, config, description,
+        info/exclude and the objects and refs directories. The files of a template
+        directory are copied into .git first (except HEAD and config).
+
+        Raises FileExistsError if path is already a repository, ValueError if
+        default_branch isn't a valid branch name and OSError if writing fails.
+
+        Parameters
+        ----------
+        default_branch : str
+            Name of the initial branch
+
+        template_dir : str
+            Directory whose files are copied into .git (optional)
+        """
+
+        if not self.is_valid_branch_name(default_branch):
+            raise ValueError(f"Invalid branch name: {default_branch}")
+
+        git_dir = f"{self.path}/.git"
+        if os.path.exists(git_dir):
+            raise FileExistsError(f"{self.path} is already a git repository")
+
+        if template_dir:
+            if not os.path.isdir(template_dir):
+                raise FileNotFoundError(f"The template directory doesn't exist: {template_dir}")
+
+            import shutil
+
+            shutil.copytree(template_dir, git_dir, ignore=lambda directory, names: [
+                name for name in names if directory == template_dir and name in ("HEAD", "config")])
+
+        for directory in ("objects/info", "objects/pack", "refs/heads", "refs/tags", "info"):
+            os.makedirs(f"{git_dir}/{directory}", exist_ok=True)
+
+        self._write_file(f"{git_dir}/HEAD", f"ref: refs/heads/{default_branch}\n")
+        self._write_file(f"{git_dir}/config", "[core]\n"
+                                              "\trepositoryformatversion = 0\n"
+                                              f"\tfilemode = {'true' if os.name != 'nt' else 'false'}\n"
+                                              "\tbare = false\n"
+                                              "\tlogallrefupdates = true\n")
+        self._write_file(f"{git_dir}/description",
+                         "Unnamed repository; edit this file 'description' to name the repository.\n", keep=True)
+        self._write_file(f"{git_dir}/info/exclude",
+                         "# git ls-files --others --exclude-from=.git/info/exclude\n"
+                         "# Lines that start with '#' are comments.\n", keep=True)
+
+    def add_remote(self, name: str, url: str):
+        """
+        Adds a remote with the default fetch refspec, like git remote add
+
+        Raises FileExistsError if the remote exists, ValueError if the name or the URL
+        cannot be written without escaping (use git for those) and OSError if writing fails.
+        """
+
+        git_dir = self.git_dir
+        if git_dir is None:
+            raise FileNotFoundError(f"{self.path} is not a git repository")
+        if not name or any(character in name for character in ' "\\\n/') or \
+                any(character in url for character in '"\\\n') or url != url.strip():
+            raise ValueError("The remote cannot be written without escaping")
+        if self.config_value(f'remote "{name}"', "url") is not None:
+            raise FileExistsError(f"The remote {name} already exists")
+
+        if any(character in url for character in "#;"):
+            url = f'"{url}"'  # Otherwise it's read as a comment
+
+        with open(f"{git_dir}/config", "a") as file:
+            file.write(f'[remote "{name}"]\n'
+                       f"\turl = {url}\n"
+                       f"\tfetch = +refs/heads/*:refs/remotes/{name}/*\n")
+
+    @staticmethod
+    def is_valid_branch_name(name: str) -> bool:
+        """
+        Checks a branch name against the rules of git check-ref-format (the common ones)
+        """
+
+        if not name or name.startswith(("-", "/", ".")) or name.endswith(("/", ".", ".lock")) or name == "@":
+            return False
+        if any(part in name for part in ("..", "//", "@{", "/.")):
+            return False
+
+        return not any(ord(character) < 32 or character in ' ~^:?*[\\\x7f' for character in name)
+
+    @staticmethod
+    def _write_file(path: str, content: str, keep: bool = False):
+        if keep and os.path.exists(path):
+            return  # Given by the template
+
+        with open(path, "w") as file:
+            file.write(content)
+
+    @staticmethod
+    def parse_github_url(url: str, host: str = "github.com") -> str:
+        """
+        owner/repo of a repository URL on given host, None if it isn't one
+
+        Understands https://host/owner/repo(.git), git@host:owner/repo(.git)
+        and ssh://git@host/owner/repo(.git). host is the web host of GitHub
+        (with the port if it isn't the default one).
+        """
+
+        return GitRepository.parse_repository_url(url, host)
+
+    @staticmethod
+    def parse_repository_url(url: str, host: str, is_nested: bool = False) -> str:
+        """
+        Path of the repository (owner/repo) in a URL on given host, None if it isn't one
+
+        Understands the same URLs as parse_github_url. With is_nested, the owner may
+        be a path of its own (GitLab's group/subgroup/repo).
+        """
+
+        if url is None:
+            return None
+
+        url = url.strip()
+        if "://" in url:
+            from urllib.parse import urlsplit
+
+            parts = urlsplit(url)
+            url_host = (parts.hostname or "").lower()
+            if parts.port is not None and parts.scheme in ("http", "https"):
+                url_host = f"{url_host}:{parts.port}"  # The port of SSH isn't a part of the web host
+            path = parts.path
+        elif ":" in url and "@" in url.split(":", 1)[0]:  # scp-like syntax
+            address, path = url.split(":", 1)
+            url_host = address.split("@", 1)[1].lower()
+        else:
+            return None
+
+        if url_host != host.lower():
+            return None
+
+        path = path.strip("/")
+        if path.endswith(".git"):
+            path = path[:-len(".git")]
+
+        parts = path.split("/")
+        if len(parts) < 2 or (len(parts) != 2 and not is_nested) or "" in parts:
+            return None
+
+        return "/".join(parts)
+
+    @staticmethod
+    def _section_name(section: str) -> tuple:
+        """
+        (section, subsection) as git compares them: the section name is case-insensitive
+        """
+
+        section = section.strip()
+        if " " not in section:
+            name, subsection = section, None
+        else:
+            name, subsection = section.split(" ", 1)
+            subsection = subsection.strip().strip('"')
+
+        if subsection is None and "." in name:  # Deprecated [section.subsection] syntax
+            name, subsection = name.split(".", 1)
+
+        return name.lower(), subsection
+
+    @staticmethod
+    def _unquote(value: str) -> str:
+        for comment in (" #", " ;", "\t#", "\t;"):
+            if comment in value and not value.startswith('"'):
+                value = value.split(comment, 1)[0].strip()
+
+        if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+            value = value[1:-1]
+
+        return value
@@ -0,0 +1,456 @@
+import threading
+from json import dumps, loads
+from time import sleep, time
+from src import tracing
+
+
+class GitHubError(Exception):
+    """
+    A GitHub request that failed
+
+    Attributes
+    ----------
+    status : int
+        HTTP status of the response (None if there wasn't a response)
+    message : str
+        Reason of the failure, as explained by GitHub if it did
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{message} (HTTP {status})" if status is not None else message)
+        self.status = status
+        self.message = message
+
+
+class GitHubResponse(object):
+    """
+    Response of a GitHub request
+
+    Attributes
+    ----------
+    status : int
+        HTTP status
+    headers : dict
+        Response headers (lowercase names)
+    data : object
+        Decoded JSON body (None if it's empty or not JSON)
+    """
+
+    def __init__(self, status: int, headers: dict, data):
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+
+class GitHubClient(object):
+    """
+    Small GitHub REST API client built on http.client
+
+    * Connections are kept alive and reused from a pool, so a batch of
+      requests pays for the TCP/TLS handshake once per connection instead of
+      once per request.
+    * At most max_connections requests run at the same time; the batch
+      methods (create_repos, get_repos) run on that many threads.
+    * Rate limits are respected: when GitHub says the limit is used up
+      (X-RateLimit-Remaining: 0, Retry-After, 429), every thread waits until
+      it's reset instead of failing. Connection errors and 5xx responses are
+      retried with exponential backoff, but a request that isn't idempotent
+      (POST) is retried only if it couldn't be sent: after that, GitHub may
+      have applied it even if the response was lost. create_repo looks the
+      repository up when that happens instead of reporting a failure.
+    * base_url can point to any server that speaks the same API (GitHub
+      Enterprise, or a local stand-in server for testing).
+
+    Attributes
+    ----------
+    token : str
+        GitHub access token
+    base_url : str
+        URL of the API (https://api.github.com by default)
+    max_connections : int
+        Maximum number of concurrent requests
+    max_retries : int
+        Retries of a request after a transient failure
+
+    Methods
+    -------
+    request(method : str, path : str, body : dict = None, headers : dict = None) -> GitHubResponse
+        Sends a request, raises GitHubError if it fails
+
+    get_user() -> dict
+        The authenticated user
+
+    create_repo(name : str, private : bool, owner : str = None) -> dict
+        Creates a repository of the authenticated user
+
+    create_repos(repos : list) -> list
+        Creates repositories concurrently
+
+    get_repo(full_name : str, etag : str = None) -> GitHubResponse
+        Gets a repository, conditionally if its ETag is given
+
+    get_repos(repos : list) -> list
+        Gets repositories concurrently
+
+    web_host -> str
+        Host of the web pages of the repositories
+
+    close()
+        Closes the pooled connections
+    """
+
+    DEFAULT_BASE_URL = "https://api.github.com"
+    USER_AGENT = "project-manager"
+    TIMEOUT = 30
+    BACKOFF = 1.0  # Seconds before the first retry, doubled after every retry
+    MAX_RATE_LIMIT_WAIT = 15 * 60  # Longer waits fail instead
+    IDEMPOTENT_METHODS = ["GET", "HEAD", "PUT", "DELETE", "OPTIONS"]  # Can be sent again after a lost response
+    CLOCK_SKEW = 60  # Seconds that GitHub's clock may be behind this one
+
+    def __init__(self, token: str, base_url: str = DEFAULT_BASE_URL, max_connections: int = 8, max_retries: int = 4):
+        """
+        Parameters
+        ----------
+        token : str
+            GitHub access token
+
+        base_url : str
+            URL of the API (https://api.github.com by default)
+
+        max_connections : int
+            Maximum number of concurrent requests
+
+        max_retries : int
+            Retries of a request after a transient failure
+        """
+
+        from urllib.parse import urlsplit
+
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+
+        url = urlsplit(self.base_url)
+        self._scheme = url.scheme
+        self._host = url.hostname
+        self._port = url.port
+        self._path_prefix = url.path  # GitHub Enterprise serves the API under /api/v3
+
+        self._idle_connections = []
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._blocked_until = 0  # Every request waits until this time (rate limit)
+
+    def _new_connection(self):
+        import http.client
+
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(self._host, self._port, timeout=self.TIMEOUT)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.TIMEOUT)
+
+    def _acquire_connection(self):
+        with self._pool_lock:
+            if len(self._idle_connections) != 0:
+                return self._idle_connections.pop()
+        return self._new_connection()
+
+    def _release_connection(self, connection):
+        with self._pool_lock:
+            self._idle_connections.append(connection)
+
+    def close(self):
+        """
+        Closes the pooled connections
+        """
+
+        with self._pool_lock:
+            for connection in self._idle_connections:
+                connection.close()
+            self._idle_connections = []
+
+    def request(self, method: str, path: str, body: dict = None, headers: dict = None) -> GitHubResponse:
+        """
+        Sends a request and returns the response, retrying transient failures
+
+        Raises GitHubError for the responses with an error status (except 304) and
+        when the request still fails after max_retries retries. Requests that aren't
+        idempotent aren't retried once they have been sent.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method
+
+        path : str
+            Path of the endpoint (like /user/repos)
+
+        body : dict
+            JSON body (optional)
+
+        headers : dict
+            Extra request headers (optional)
+        """
+
+        request_headers = {
+            "Accept": "application/vnd.github+json",
+            "User-Agent": self.USER_AGENT,
+        }
+        if self.token:
+            request_headers["Authorization"] = f"token {self.token}"
+        if body is not None:
+            request_headers["Content-Type"] = "application/json"
+        request_headers.update(headers or dict())
+
+        data = dumps(body).encode() if body is not None else None
+        is_idempotent = method.upper() in self.IDEMPOTENT_METHODS
+        backoff = self.BACKOFF
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+
+            with self._slots:
+                connection = self._acquire_connection()
+                is_sent = False
+                try:
+                    with tracing.phase("github.request", f"{method} {path}"):
+                        connection.request(method, self._path_prefix + path, body=data, headers=request_headers)
+                        is_sent = True
+                        raw_response = connection.getresponse()
+                        response_body = raw_response.read()
+                except Exception as e:  # OSError or http.client.HTTPException
+                    connection.close()  # A broken keep-alive connection isn't reused
+                    raw_response = None
+                    error = GitHubError(None, f"Request to {self._host} failed: {str(e) or type(e).__name__}")
+                else:
+                    if raw_response.will_close:
+                        connection.close()
+                    else:
+                        self._release_connection(connection)
+
+            if raw_response is None:
+                if attempt == self.max_retries or (is_sent and not is_idempotent):
+                    raise error
+                sleep(backoff)
+                backoff *= 2
+                continue
+
+            response_headers = {name.lower(): value for name, value in raw_response.getheaders()}
+            try:
+                response_data = loads(response_body) if len(response_body) != 0 else None
+            except ValueError:
+                response_data = None
+            response = GitHubResponse(raw_response.status, response_headers, response_data)
+
+            if response.status < 400 or response.status == 304:
+                return response
+
+            error = GitHubError(response.status, self._error_message(response))
+            if attempt == self.max_retries:
+                raise error
+
+            wait = self._rate_limit_wait(response)
+            if wait is not None:
+                if wait > self.MAX_RATE_LIMIT_WAIT:
+                    raise GitHubError(response.status, f"Rate limit exceeded, it's reset in {int(wait)} seconds")
+                with self._pool_lock:
+                    self._blocked_until = max(self._blocked_until, time() + wait)
+            elif response.status >= 500 and is_idempotent:
+                sleep(backoff)
+                backoff *= 2
+            else:
+                raise error  # Won't succeed (or may be applied twice) if it's sent again
+
+        raise error
+
+    def _wait_for_rate_limit(self):
+        wait = self._blocked_until - time()
+        if wait > 0:
+            sleep(wait)
+
+    def _rate_limit_wait(self, response: GitHubResponse) -> float:
+        """
+        Seconds to wait before the request can be sent again, None if it isn't rate limited
+        """
+
+        if response.status not in (403, 429):
+            return None
+
+        if "retry-after" in response.headers:  # Secondary rate limits
+            try:
+                return max(1.0, float(response.headers["retry-after"]))
+            except ValueError:
+                return 60.0
+
+        if response.headers.get("x-ratelimit-remaining") == "0":
+            try:
+                return max(1.0, float(response.headers["x-ratelimit-reset"]) - time() + 1)
+            except (KeyError, ValueError):
+                return 60.0
+
+        if response.status == 429:
+            return 60.0
+
+        return None  # A 403 for another reason (permissions)
+
+    def _error_message(self, response: GitHubResponse) -> str:
+        if not isinstance(response.data, dict):
+            return "Request failed"
+
+        message = response.data.get("message", "Request failed")
+        details = [error.get("message") or error.get("code") for error in response.data.get("errors", [])
+                   if isinstance(error, dict)]
+        details = [detail for detail in details if detail]
+        return f"{message}: {', '.join(details)}" if len(details) != 0 else message
+
+    def get_user(self) -> dict:
+        """
+        The authenticated user (raises GitHubError if the token isn't valid)
+        """
+
+        return self.request("GET", "/user").data
+
+    def create_repo(self, name: str, private: bool = False, owner: str = None) -> dict:
+        """
+        Creates a repository of the authenticated user
+
+        Returns the repository as GitHub describes it (html_url, clone_url, ...).
+        If the request fails without a clear answer (no response, a 5xx, or a 422
+        that may be about a repository created by an earlier attempt), the
+        repository is looked up and returned if it was created by this call.
+
+        Parameters
+        ----------
+        name : str
+            Repository name
+
+        private : bool
+            Creates a private repository if True
+
+        owner : str
+            Login of the authenticated user (requested from GitHub if it's needed and not given)
+        """
+
+        started = time()
+        try:
+            return self.request("POST", "/user/repos", dict(name=name, private=bool(private))).data
+        except GitHubError as e:
+            if e.status is not None and e.status < 500 and e.status != 422:
+                raise
+
+            repo = self._find_created_repo(owner, name, started)
+            if repo is None:
+                raise
+            return repo
+
+    def _find_created_repo(self, owner: str, name: str, since: float) -> dict:
+        """
+        The repository if it exists and was created since given time, otherwise None
+        """
+
+        from datetime import datetime, timezone
+
+        try:
+            if owner is None:
+                owner = self.get_user()["login"]
+            repo = self.get_repo(f"{owner}/{name}").data
+            created_at = datetime.strptime(repo["created_at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        except (GitHubError, TypeError, KeyError, ValueError):
+            return None
+
+        if created_at.timestamp() < since - self.CLOCK_SKEW:
+            return None  # Already existed, the error is real
+        return repo
+
+    def create_repos(self, repos: list) -> list:
+        """
+        Creates repositories concurrently (at most max_connections at a time)
+
+        Parameters
+        ----------
+        repos : list
+            (name, private) of each repository
+
+        Returns
+        -------
+        list
+            (repository, error) for each repository in the same order; repository is
+            None and error is the GitHubError if it failed
+        """
+
+        def create(repo: tuple) -> tuple:
+            try:
+                return self.create_repo(*repo), None
+            except GitHubError as e:
+                return None, e
+
+        return self._map(create, repos)
+
+    def get_repo(self, full_name: str, etag: str = None) -> GitHubResponse:
+        """
+        Gets a repository
+
+        With the ETag of an earlier response, the request is conditional: GitHub
+        answers 304 (with no data) if the repository hasn't changed, and such a
+        response doesn't count against the rate limit. A renamed or transferred
+        repository is followed to its new location.
+
+        Parameters
+        ----------
+        full_name : str
+            owner/repo
+
+        etag : str
+            ETag of the last response for this repository (optional)
+        """
+
+        headers = {"If-None-Match": etag} if etag else None
+        response = self.request("GET", f"/repos/{full_name}", headers=headers)
+
+        location = response.headers.get("location", "")
+        if response.status in (301, 302, 307) and location.startswith(self.base_url + "/"):
+            response = self.request("GET", location[len(self.base_url):], headers=headers)
+
+        return response
+
+    def get_repos(self, repos: list) -> list:
+        """
+        Gets repositories concurrently (at most max_connections at a time)
+
+        Parameters
+        ----------
+        repos : list
+            (full_name, etag) of each repository, etag may be None
+
+        Returns
+        -------
+        list
+            (response, error) for each repository in the same order; response is
+            None and error is the GitHubError if it failed
+        """
+
+        def get(repo: tuple) -> tuple:
+            try:
+                return self.get_repo(*repo), None
+            except GitHubError as e:
+                return None, e
+
+        return self._map(get, repos)
+
+    @property
+    def web_host(self) -> str:
+        """
+        Host of the web pages of the repositories (github.com for api.github.com)
+        """
+
+        host = self._host if self._port is None else f"{self._host}:{self._port}"
+        return host[len("api."):] if host.startswith("api.") else host
+
+    def _map(self, function, items: list) -> list:
+        if len(items) <= 1:
+            return [function(item) for item in items]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(self.max_connections, len(items))) as executor:
+            return list(executor.map(function, items))
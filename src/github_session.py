@@ -0,0 +1,269 @@
+import os
+from json import dump, load
+from time import time
+from src.tracing import traced
+
+
+class GitHubSession(object):
+    """
+    Lazily authenticated GitHub session
+
+    Nothing is imported or requested until GitHub is needed for the first time.
+    The authenticated identity is cached in pm-github-cache.json, so the token is
+    only verified against GitHub once per TTL.
+
+    Attributes
+    ----------
+    project_manager_home : str
+        The home directory of Project Manager
+    token : str
+        GitHub access token
+    api_url : str
+        URL of the GitHub API
+    ttl : int
+        Seconds that a verified identity stays valid in the cache
+
+    Methods
+    -------
+    client -> GitHubClient
+        Client of the API (created on first access)
+
+    login -> str
+        Login name of the authenticated user
+
+    create_repo(name : str, private : bool) -> dict
+        Creates a repository, raises GitHubError if it fails
+
+    create_repos(repos : list) -> list
+        Creates repositories concurrently
+
+    get_repos(full_names : list) -> list
+        Metadata of repositories, fetched concurrently with conditional requests
+
+    clear_cache()
+        Removes the cached identity
+    """
+
+    CACHE_FILE = "pm-github-cache.json"
+    ETAG_FILE = "pm-github-etags.json"
+    REPO_FIELDS = ["full_name", "html_url", "visibility", "default_branch", "pushed_at"]  # Kept in the ETag cache
+    DEFAULT_TTL = 24 * 60 * 60
+
+    def __init__(self, project_manager_home: str, token: str, api_url: str = None, ttl: int = DEFAULT_TTL):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        token : str
+            GitHub access token
+
+        api_url : str
+            URL of the GitHub API (https://api.github.com if not given)
+
+        ttl : int
+            Seconds that a verified identity stays valid in the cache
+        """
+
+        self.project_manager_home = project_manager_home
+        self.token = token
+        self.api_url = api_url or "https://api.github.com"
+        self.ttl = ttl
+
+        self._client = None
+        self._login = None
+
+    @property
+    def cache_path(self) -> str:
+        return f"{self.project_manager_home}/{self.CACHE_FILE}"
+
+    @property
+    def etag_path(self) -> str:
+        return f"{self.project_manager_home}/{self.ETAG_FILE}"
+
+    @property
+    def token_hash(self) -> str:
+        from hashlib import sha256
+
+        # The token itself is never written to the cache; the identity belongs to the API it was verified at
+        return sha256(f"{self.api_url}\n{self.token}".encode()).hexdigest()
+
+    @property
+    def client(self):
+        """
+        Client of the GitHub API
+        """
+
+        if self._client is None:
+            from src.github_client import GitHubClient  # http.client and ssl are slow to import
+
+            self._client = GitHubClient(self.token, self.api_url)
+
+        return self._client
+
+    @property
+    @traced("github.login")
+    def login(self) -> str:
+        """
+        Login name of the authenticated user
+
+        The token is verified with a request to GitHub only when there isn't a
+        fresh cached identity for it. Raises GitHubError if it fails.
+        """
+
+        if self._login is None:
+            self._login = self._read_cached_login()
+
+        if self._login is None:
+            self._login = self.client.get_user()["login"]  # Verifies the token
+            self._write_cached_login(self._login)
+
+        return self._login
+
+    def create_repo(self, name: str, private: bool = False) -> dict:
+        """
+        Creates a repository of the authenticated user
+
+        Returns the repository as GitHub describes it (html_url, clone_url, ...).
+        Raises GitHubError if it fails; the cached identity is removed if the
+        token was refused.
+        """
+
+        from src.github_client import GitHubError
+
+        try:
+            return self.client.create_repo(name, private, self._login)
+        except GitHubError as e:
+            if e.status == 401:
+                self.clear_cache()
+            raise
+
+    def create_repos(self, repos: list) -> list:
+        """
+        Creates repositories concurrently
+
+        Parameters
+        ----------
+        repos : list
+            (name, private) of each repository
+
+        Returns
+        -------
+        list
+            (repository, error) for each repository in the same order, see GitHubClient.create_repos
+        """
+
+        results = self.client.create_repos(repos)
+        if any(error is not None and error.status == 401 for _, error in results):
+            self.clear_cache()
+
+        return results
+
+    def get_repos(self, full_names: list) -> list:
+        """
+        Metadata of repositories, fetched concurrently
+
+        The ETag and the metadata of every response are kept in pm-github-etags.json,
+        so a repository that hasn't changed since the last time costs only a
+        conditional request (answered with 304, which doesn't count against the
+        rate limit).
+
+        Parameters
+        ----------
+        full_names : list
+            owner/repo of each repository
+
+        Returns
+        -------
+        list
+            (repository, error) for each repository in the same order; repository is a
+            dict with the keys in REPO_FIELDS, or None and error is the GitHubError
+        """
+
+        cache = self._read_etags()
+        cached = [cache.get(full_name.lower()) for full_name in full_names]
+
+        responses = self.client.get_repos([(full_name, entry["etag"] if entry is not None else None)
+                                           for full_name, entry in zip(full_names, cached)])
+
+        results = []
+        for full_name, entry, (response, error) in zip(full_names, cached, responses):
+            if error is not None:
+                if error.status == 404:
+                    cache.pop(full_name.lower(), None)
+                results.append((None, error))
+                continue
+
+            if response.status == 304 and entry is not None:
+                results.append((entry["repo"], None))
+                continue
+
+            data = response.data if isinstance(response.data, dict) else dict()
+            repo = {field: data.get(field) for field in self.REPO_FIELDS}
+            if repo["visibility"] is None and "private" in data:
+                repo["visibility"] = "private" if data["private"] else "public"
+
+            if response.headers.get("etag"):
+                cache[full_name.lower()] = dict(etag=response.headers["etag"], repo=repo)
+            results.append((repo, None))
+
+        if any(error is not None and error.status == 401 for _, error in responses):
+            self.clear_cache()
+        self._write_etags(cache)
+
+        return results
+
+    def clear_cache(self):
+        """
+        Removes the cached identity
+        """
+
+        if os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+
+    def _read_cached_login(self) -> str:
+        try:
+            with open(self.cache_path, "r") as file:
+                cache = load(file)
+        except (OSError, ValueError):
+            return None
+
+        if cache.get("token_hash") != self.token_hash:
+            return None
+        if time() - cache.get("verified_at", 0) > self.ttl:
+            return None
+
+        return cache.get("login")
+
+    def _write_cached_login(self, login: str):
+        cache = dict(token_hash=self.token_hash, login=login, verified_at=time())
+
+        try:
+            with open(self.cache_path, "w") as file:
+                dump(cache, file, indent=4)
+        except OSError:
+            pass  # The cache is only an optimization
+
+    def _read_etags(self) -> dict:
+        try:
+            with open(self.etag_path, "r") as file:
+                cache = load(file)
+        except (OSError, ValueError):
+            return dict()
+
+        # ETags depend on the token (GitHub varies the responses by it)
+        if not isinstance(cache, dict) or cache.get("token_hash") != self.token_hash:
+            return dict()
+
+        return cache.get("repos", dict())
+
+    def _write_etags(self, repos: dict):
+        temporary_path = f"{self.etag_path}.{os.getpid()}.tmp"  # Another process may be writing it too
+
+        try:
+            with open(temporary_path, "w") as file:
+                dump(dict(token_hash=self.token_hash, repos=repos), file)
+            os.replace(temporary_path, self.etag_path)
+        except OSError:
+            pass  # The cache is only an optimization
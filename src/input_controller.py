@@ -1,5 +1,5 @@
 from os.path import exists
-from termcolor import colored
+from src.console import colored
 
 
 class InputController(object):
@@ -0,0 +1,218 @@
+from json import dumps
+
+
+class ProjectListing(object):
+    """
+    Output of pm list, shared by the command line and the daemon
+
+    The records are streamed from the registry, and the output is written in
+    large chunks instead of a print call per line. Paging (offset and limit)
+    uses the project counts of the groups, so the groups before the page
+    aren't decoded.
+
+    Formats:
+
+    * text: the listing for people (--fields doesn't apply)
+    * json: an array of objects
+    * ndjson: one object per line
+    * tsv: one record per line with the fields separated by tabs, no header
+      (tabs, newlines and backslashes in values are escaped as \\t, \\n and \\\\)
+
+    Attributes
+    ----------
+    settings_store : SettingsStore
+        Loaded settings
+
+    Methods
+    -------
+    write(write, option : str, group : str = None, format : str = "text", fields : list = None,
+          offset : int = 0, limit : int = None)
+        Writes the listing with given write function
+    """
+
+    FORMATS = ["text", "json", "ndjson", "tsv"]
+    PROJECT_FIELDS = ["name", "group", "dir"]  # Default fields of projects
+    GROUP_FIELDS = ["group", "projects"]  # Fields of groups (projects is the number of projects)
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, settings_store):
+        """
+        Parameters
+        ----------
+        settings_store : SettingsStore
+            Loaded settings
+        """
+
+        self.settings_store = settings_store
+
+    def write(self, write, option: str, group: str = None, format: str = "text", fields: list = None,
+              offset: int = 0, limit: int = None):
+        """
+        Writes the listing
+
+        Parameters
+        ----------
+        write : function
+            Called with every chunk of the output (like sys.stdout.write)
+
+        option : str
+            projects (p) or groups (g)
+
+        group : str
+            Only the projects of this group are listed (optional, must exist)
+
+        format : str
+            One of FORMATS
+
+        fields : list
+            Fields of the records in the machine-readable formats (optional). Projects
+            have name, group and the keys of their records (dir, repo_url, ...); missing
+            ones are null (empty in tsv).
+
+        offset : int
+            Number of projects (or groups) skipped
+
+        limit : int
+            Maximum number of projects (or groups), all of them if None
+        """
+
+        is_projects = option in ["projects", "p"]
+
+        if format == "text":
+            lines = self._text_lines(is_projects, group, offset, limit)
+        else:
+            if fields is None:
+                fields = self.PROJECT_FIELDS if is_projects else self.GROUP_FIELDS
+            records = self._project_records(group, offset, limit) if is_projects else self._group_records(offset, limit)
+            lines = self._format_records(records, format, fields)
+
+        chunk = []
+        size = 0
+        for line in lines:
+            chunk.append(line)
+            size += len(line)
+            if size >= self.CHUNK_SIZE:
+                write("".join(chunk))
+                chunk = []
+                size = 0
+
+        if len(chunk) != 0:
+            write("".join(chunk))
+
+    def _pages(self, groups: list, offset: int, limit: int):
+        """
+        Yields (group, first, last) for the groups that have projects on the page, first and last are
+        indices in the group (the projects of the groups before the page aren't decoded)
+        """
+
+        end = offset + limit if limit is not None else None
+        start = 0
+
+        for group in groups:
+            count = self.settings_store.project_count(group)
+            first = max(offset - start, 0)
+            last = count if end is None else min(end - start, count)
+            start += count
+
+            if first < last:
+                yield group, first, last
+            if end is not None and start >= end:
+                break
+
+    def _group_items(self, group: str, first: int, last: int):
+        items = self.settings_store.group_projects(group).items()
+        if first == 0 and last >= len(items):
+            return items
+
+        from itertools import islice
+
+        return islice(items, first, last)
+
+    def _project_records(self, group: str, offset: int, limit: int):
+        groups = [group] if group is not None else self.settings_store.groups()
+
+        for group, first, last in self._pages(groups, offset, limit):
+            for name, record in self._group_items(group, first, last):
+                yield dict(record, name=name, group=group)
+
+    def _group_records(self, offset: int, limit: int):
+        groups = self.settings_store.groups()
+        end = offset + limit if limit is not None else None
+
+        for group in groups[offset:end]:
+            yield dict(group=group, projects=self.settings_store.project_count(group))
+
+    def _format_records(self, records, format: str, fields: list):
+        if format == "tsv":
+            for record in records:
+                yield "\t".join(self._tsv_value(record.get(field)) for field in fields) + "\n"
+            return
+
+        from json.encoder import encode_basestring_ascii
+
+        # Same output as json.dumps, but the keys are encoded once and the string values (almost all of
+        # them) directly by the C encoder instead of through a new JSONEncoder per record
+        keys = [encode_basestring_ascii(field) + ": " for field in fields]
+
+        def encode(record: dict) -> str:
+            values = [record.get(field) for field in fields]
+            return "{" + ", ".join(key + (encode_basestring_ascii(value) if value.__class__ is str else dumps(value))
+                                   for key, value in zip(keys, values)) + "}"
+
+        if format == "ndjson":
+            for record in records:
+                yield encode(record) + "\n"
+            return
+
+        separator = "[\n"
+        for record in records:
+            yield separator + "  " + encode(record)
+            separator = ",\n"
+        yield "[]\n" if separator == "[\n" else "\n]\n"
+
+    @staticmethod
+    def _tsv_value(value) -> str:
+        if value is None:
+            return ""
+        if not isinstance(value, str):
+            value = dumps(value)
+
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+    def _text_lines(self, is_projects: bool, group: str, offset: int, limit: int):
+        store = self.settings_store
+        is_paged = offset != 0 or limit is not None
+
+        if not is_projects:
+            if len(store.groups()) == 0:
+                yield "You don't have any groups.\n"
+                return
+
+            yield "All of the groups:\n"
+            for record in self._group_records(offset, limit):
+                yield f"{record['group']} (Has {record['projects']} project(s))\n"
+            return
+
+        if len(store.groups()) == 0:
+            yield "You don't have any projects.\n"
+            return
+
+        if group is not None:
+            yield f"All of the projects in group {group} (has {store.project_count(group)} projects):\n"
+            for _, first, last in self._pages([group], offset, limit):
+                for name, _ in self._group_items(group, first, last):
+                    yield f"{name}\n"
+            return
+
+        yield "All of your projects:\n"
+        groups = store.groups()
+        pages = self._pages(groups, offset, limit) if is_paged else ((group, 0, None) for group in groups)
+
+        for group, first, last in pages:
+            yield f"{group} (has {store.project_count(group)} project(s))\n"
+            if last is None:
+                items = store.group_projects(group).items()
+            else:
+                items = self._group_items(group, first, last)
+            for name, _ in items:
+                yield f"\t{name}\n"
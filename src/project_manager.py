@@ -1,10 +1,11 @@
 import os
-from json import dump, load
-from github import Github
-from termcolor import colored
+import sys
 from sys import exit
-import webbrowser
+from src.console import colored
 from src.input_controller import InputController
+from src.github_session import GitHubSession
+from src.settings_store import SettingsStore
+from src import tracing
 
 class ProjectManager(object):
     """
@@ -14,6 +15,18 @@ class ProjectManager(object):
     -------
     create_project(name : str, group : str, is_new_repo_requested : bool, is_new_repo_private : bool)
         Creates new project
+
+    create_projects(projects : list, max_workers : int = None) -> list
+        Creates many projects concurrently and saves them with one write
+
+    sync_remotes(group : str = None, max_workers : int = None) -> list
+        Updates the repository metadata of the projects from GitHub
+
+    init_repository(project_dir : str) -> str
+        Initializes an empty git repository
+
+    add_remote(project_dir : str, name : str, url : str) -> str
+        Adds a remote to a git repository
     
     open_project(project : str)
         Open an existing project with editor
@@ -23,32 +36,59 @@ class ProjectManager(object):
     
     find_project(self, name:str, group:str = None) -> dict
         Finds a project
+
+    search_projects(self, query:str, group:str = None, limit:int = 10) -> list
+        Finds the projects whose names are similar to the query
     """
 
+    NO_GITHUB_ORIGIN = "No origin on GitHub"  # Error of sync_remotes for the projects that are skipped
 
-    def __init__(self, project_manager_home: str):
+    def __init__(self, project_manager_home: str, settings_store: SettingsStore = None):
         """
         Parameters
         ----------
         project_manager_home : str
             Home folder of Project Manager
+
+        settings_store : SettingsStore
+            Loaded settings (the process-wide store of project_manager_home is used if not given)
         """
 
         self.project_manager_home = project_manager_home
-
-        with open(f"{project_manager_home}/pm-settings.json", "r") as file:
-            self.settings = load(file)
-            # TODO: Take settings directly from params
+        self.settings_store = settings_store if settings_store is not None else SettingsStore.get(project_manager_home)
         
-        if self.settings["token"] != "":
-            self.is_access_token_specified = True
-            try:
-                self.user = Github(self.settings["token"]).get_user()
-            except:
-                print(colored("User cannot get. Please check your token and your internet connection."))
-                exit(1)
-        else:
-            self.is_access_token_specified = False
+        self.is_access_token_specified = self.settings_store["token"] != ""
+        self._github_session = None
+        self._git_init_options = None # (default branch, template directory), read on first use
+
+    @property
+    def github_session(self) -> GitHubSession:
+        """
+        GitHub session of the token in settings, created on first access
+        """
+
+        if self._github_session is None:
+            self._github_session = GitHubSession(self.project_manager_home, self.settings_store["token"],
+                                                 self.settings_store["github_api_url"])
+
+        return self._github_session
+
+    @property
+    def login(self) -> str:
+        """
+        Login name of the authenticated GitHub user
+
+        GitHub is contacted only when a GitHub operation needs the user for the first time.
+        """
+
+        from src.github_client import GitHubError
+
+        try:
+            return self.github_session.login
+        except GitHubError as e:
+            print(colored(f"User cannot get: {e}", "red"))
+            print(colored("Please check your token and your internet connection."))
+            exit(1)
 
     
     def create_project(self, name:str, group:str, is_new_repo_requested:bool, is_new_repo_private:bool):
@@ -72,7 +112,10 @@ class ProjectManager(object):
 
         # TODO: Make repo checks inside this function
 
-        os.chdir(self.settings["projects_folder"])
+        if self.is_access_token_specified and is_new_repo_requested:
+            self.login # Authenticate before touching the file system
+
+        os.chdir(self.settings_store["projects_folder"])
         if not os.path.exists(group):
             print(f"Creating group directory: {group}")
             os.mkdir(group)
@@ -83,38 +126,284 @@ class ProjectManager(object):
         os.chdir(name)
 
         print("Initializing git in the project directory")
-        os.system("git init")
+        error = self.init_repository(os.getcwd())
+        if error is not None:
+            print(colored(f"WARNING: {error}", "yellow"))
 
-        if group not in self.settings["projects"]:
+        if not self.settings_store.has_group(group):
             print(f"Group named {group} not found in settings file. Creating...")
-            self.settings["projects"][group] = dict()
         
-        self.settings["projects"][group][name] = dict(dir=os.getcwd())
+        project = dict(dir=os.getcwd())
         
         if self.is_access_token_specified and is_new_repo_requested:
             repo_name = input(f"New repository name (if blank, {name.lower()} will be used): ")
             if repo_name == "": repo_name = name
 
+            from src.github_client import GitHubError
+
             try:
                 print(f"Creating a new repo on GitHub named {name}")
-                new_repo = self.user.create_repo(repo_name, private=is_new_repo_private)
-                os.system(f"git remote add origin {new_repo.clone_url}")
-                self.settings["projects"][group][name]["repo_url"] = new_repo.html_url
-            except:
-                print(colored("WARNING: An error occured while creating a new repo on Github.", "yellow"))
+                new_repo = self.github_session.create_repo(repo_name, is_new_repo_private)
+                project["repo_url"] = new_repo["html_url"]
+
+                error = self.add_remote(os.getcwd(), "origin", new_repo["clone_url"])
+                if error is not None:
+                    print(colored(f"WARNING: The repo is created, but {error}", "yellow"))
+            except GitHubError as e:
+                print(colored(f"WARNING: An error occured while creating a new repo on Github: {e}", "yellow"))
                 print(colored("Please check your token and your internet connection.", "yellow"))
         
-        self.settings["projects"][group][name]["dir"] = os.getcwd()
-        with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-            dump(self.settings, file, indent=4)
+        with self.settings_store.transaction():
+            self.settings_store.put_project(name, group, project)
+        self.settings_store.save()
         print("Added new project to the settings file.")
 
-        if self.settings["editor_command"] != "":
-            print(f"Opening your project folder with command: {self.settings['editor_command']}")
-            os.system(self.settings["editor_command"])
+        if self.settings_store["editor_command"] != "":
+            print(f"Opening your project folder with command: {self.settings_store['editor_command']}")
+            with tracing.phase("command", self.settings_store["editor_command"]):
+                os.system(self.settings_store["editor_command"])
         
         print("Operation completed.")
     
+    def create_projects(self, projects:list, max_workers:int = None) -> list:
+        """
+        Creates many projects concurrently and saves them with one write
+
+        The directories are created and their repositories are initialized on a thread pool,
+        without changing the working directory or starting git. The settings are only used on
+        this thread (the registry backends aren't thread-safe): the projects are checked against
+        them first, and the projects that were created are added at the end, all at once.
+
+        Parameters
+        ----------
+        projects : list
+            Projects as dicts with name and group, optionally with repo_url, and with
+            create_repo and private to create a GitHub repository for the project
+
+        max_workers : int
+            Number of projects created at the same time (optional)
+
+        Returns
+        -------
+        list
+            (project, error) for each project in the same order, error is None if it was created.
+            A project whose repository couldn't be created is still saved, with the error.
+        """
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        projects_folder = self.settings_store["projects_folder"]
+
+        def create(project: dict) -> str:
+            project_dir = f"{projects_folder}/{project['group']}/{project['name']}"
+            try:
+                os.makedirs(f"{projects_folder}/{project['group']}", exist_ok=True)
+                os.mkdir(project_dir)
+            except FileExistsError:
+                return "The folder already exists"
+            except OSError as e:
+                return f"The folder cannot be created: {e.strerror}"
+
+            error = self.init_repository(project_dir)
+            if error is not None:
+                import shutil
+
+                shutil.rmtree(project_dir, ignore_errors=True)  # Don't leave half-created projects behind
+            return error
+
+        errors = ["Already in the settings" if self.settings_store.get_project(project["name"], project["group"]) is not None
+                  else None for project in projects]
+        new = [i for i, error in enumerate(errors) if error is None]
+
+        with ThreadPoolExecutor(max_workers=max_workers or 8) as executor:
+            for i, error in zip(new, executor.map(create, [projects[i] for i in new])):
+                errors[i] = error
+
+        records = dict()  # Index of the project -> record, for the projects that were created
+        for i, (project, error) in enumerate(zip(projects, errors)):
+            if error is None:
+                record = {key: value for key, value in project.items() if key not in ["name", "group", "create_repo", "private"]}
+                record["dir"] = f"{projects_folder}/{project['group']}/{project['name']}"
+                records[i] = record
+
+        # The repositories are created after the folders, concurrently on the pooled connections of the client
+        with_repo = [i for i in records if projects[i].get("create_repo")]
+        if len(with_repo) != 0 and not self.is_access_token_specified:
+            for i in with_repo:
+                errors[i] = "Created without a repo, the token is not set"
+        elif len(with_repo) != 0:
+            repos = self.github_session.create_repos([(projects[i]["name"], projects[i].get("private", False)) for i in with_repo])
+            for i, (repo, error) in zip(with_repo, repos):
+                if error is not None:
+                    errors[i] = f"Created without a repo: {error}"
+                    continue
+
+                records[i]["repo_url"] = repo["html_url"]
+                error = self.add_remote(records[i]["dir"], "origin", repo["clone_url"])
+                if error is not None:
+                    errors[i] = f"The repo is created, but {error}"
+
+        with self.settings_store.transaction():
+            for i, record in records.items():
+                self.settings_store.put_project(projects[i]["name"], projects[i]["group"], record)
+        self.settings_store.save()
+
+        return list(zip(projects, errors))
+
+    def sync_remotes(self, group:str = None, max_workers:int = None) -> list:
+        """
+        Updates the repository metadata of the projects from GitHub
+
+        The origin remote of every project is read from its .git/config, and the
+        repositories on GitHub are fetched concurrently (conditionally, with the
+        ETags of the last sync). The changed projects are saved with one write.
+        Projects without an origin on GitHub keep their repo_url if they have one.
+
+        Parameters
+        ----------
+        group : str
+            Only the projects of this group are synced (optional)
+
+        max_workers : int
+            Number of projects whose origins are read at the same time (optional)
+
+        Returns
+        -------
+        list
+            (project, is_updated, error) for each project; error is None if it was synced
+        """
+
+        from concurrent.futures import ThreadPoolExecutor
+        from src.git_repository import GitRepository
+
+        groups = [group] if group is not None else self.settings_store.groups()
+        projects = [dict(record, name=name, group=project_group)
+                    for project_group in groups
+                    for name, record in self.settings_store.group_projects(project_group).items()]
+
+        web_host = self.github_session.client.web_host
+
+        def find_repo(project: dict) -> str:
+            full_name = GitRepository.parse_github_url(GitRepository(project["dir"]).origin_url, web_host)
+            if full_name is None:  # Projects created by hand may only have a URL
+                full_name = GitRepository.parse_github_url(project.get("repo_url"), web_host)
+            return full_name
+
+        with ThreadPoolExecutor(max_workers=max_workers or 16) as executor:
+            full_names = list(executor.map(find_repo, projects))
+
+        with_repo = [i for i, full_name in enumerate(full_names) if full_name is not None]
+        repos = self.github_session.get_repos([full_names[i] for i in with_repo])
+
+        results = [(project, False, self.NO_GITHUB_ORIGIN) for project in projects]
+        updated = []
+        for i, (repo, error) in zip(with_repo, repos):
+            if error is not None:
+                results[i] = (projects[i], False, str(error))
+                continue
+
+            project = dict(projects[i], repo_url=repo["html_url"], repo_visibility=repo["visibility"],
+                           repo_default_branch=repo["default_branch"], repo_pushed_at=repo["pushed_at"])
+            is_updated = project != projects[i]
+            if is_updated:
+                updated.append(project)
+            results[i] = (project, is_updated, None)
+
+        with self.settings_store.transaction():
+            for project in updated:
+                self.settings_store.put_project(project["name"], project["group"], project)
+        self.settings_store.save()
+
+        return results
+
+    def init_repository(self, project_dir:str) -> str:
+        """
+        Initializes an empty git repository in a project directory, returns the error message if it fails
+
+        The repository is laid out in-process (GitRepository.init). The initial branch is the
+        git_default_branch setting, or init.defaultBranch of the user's git configuration, or
+        master; the template directory is the git_template_dir setting, or GIT_TEMPLATE_DIR, or
+        init.templateDir. If the repository cannot be written that way, git init is run instead.
+
+        Parameters
+        ----------
+        project_dir : str
+            Directory of the project
+        """
+
+        from src.git_repository import GitRepository
+
+        if self._git_init_options is None:
+            default_branch = self.settings_store["git_default_branch"] or \
+                GitRepository.global_config_value("init", "defaultBranch") or "master"
+            template_dir = self.settings_store["git_template_dir"] or os.environ.get("GIT_TEMPLATE_DIR") or \
+                GitRepository.global_config_value("init", "templateDir")
+            self._git_init_options = (default_branch, os.path.expanduser(template_dir) if template_dir else None)
+
+        default_branch, template_dir = self._git_init_options
+
+        try:
+            with tracing.phase("git.init", project_dir):
+                GitRepository(project_dir).init(default_branch, template_dir)
+            return None
+        except FileExistsError as e:
+            return str(e)
+        except (OSError, ValueError):
+            import shutil
+
+            shutil.rmtree(f"{project_dir}/.git", ignore_errors=True)  # git decides what's wrong
+
+        arguments = ["init", "--quiet", f"--initial-branch={default_branch}"]
+        if template_dir is not None:
+            arguments.append(f"--template={template_dir}")
+        return self._run_git([*arguments, project_dir])
+
+    def add_remote(self, project_dir:str, name:str, url:str) -> str:
+        """
+        Adds a remote to the git repository of a project, returns the error message if it fails
+
+        The remote is written to .git/config in-process; git remote add is run instead
+        if the URL needs escaping.
+
+        Parameters
+        ----------
+        project_dir : str
+            Directory of the project
+
+        name : str
+            Name of the remote
+
+        url : str
+            URL of the remote
+        """
+
+        from src.git_repository import GitRepository
+
+        try:
+            GitRepository(project_dir).add_remote(name, url)
+            return None
+        except FileExistsError as e:
+            return str(e)
+        except (OSError, ValueError):
+            return self._run_git(["-C", project_dir, "remote", "add", name, url])
+
+    def _run_git(self, arguments:list) -> str:
+        """
+        Runs git with given arguments (without a shell), returns the error message if it fails
+        """
+
+        import subprocess
+
+        try:
+            with tracing.phase("command", " ".join(["git", *arguments])):
+                result = subprocess.run(["git", *arguments], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            return f"git cannot be run: {e.strerror}"
+
+        if result.returncode != 0:
+            return f"git {arguments[0] if arguments[0] != '-C' else arguments[2]} failed: {result.stderr.strip()}"
+        return None
+
     def open_project(self, name:str, group:str):
         """
         Open an existing project with editor
@@ -128,14 +417,20 @@ class ProjectManager(object):
             Project group
         """
 
-        if self.settings["editor_command"] == "":
+        if self.settings_store["editor_command"] == "":
             print(colored("You didn't specified editor_command option.", "yellow"))
             print(colored("To set: pm --config --key 'editor_command' --value 'command'", "yellow"))
             exit(1)
         
         project = self.find_project(name, group)
+        if not os.path.isdir(project["dir"]):
+            print(colored(f"The directory of the project doesn't exist: {project['dir']}", "yellow"))
+            print(colored("Run pm doctor to find the projects whose directories are gone (pm doctor --prune removes them).", "yellow"))
+            exit(1)
+
         os.chdir(project["dir"])
-        os.system(self.settings["editor_command"])
+        with tracing.phase("command", self.settings_store["editor_command"]):
+            os.system(self.settings_store["editor_command"])
     
     def open_repo_in_browser(self, name:str, group:str = None):
         """
@@ -156,8 +451,11 @@ class ProjectManager(object):
             print(colored("The project doesn't have a repository URL.", "yellow"))
             exit(1)
         
+        import webbrowser
+
         webbrowser.open(project["repo_url"], new=2)
     
+    @tracing.traced("project.lookup")
     def find_project(self, name:str, group:str = None) -> dict:
         """
         Finds a project
@@ -171,36 +469,30 @@ class ProjectManager(object):
             Project group
         """
 
-        found_projects = dict() # All found projects goes here with a key which is increment number
-        choices = [] # In case we found many results, it will be used in input_controller.get_option
-        project_key = 0 # The increment number key of projects in found_projects
-        
         if group != None: # If group is given at param
-            if group not in self.settings["projects"]:
+            if not self.settings_store.has_group(group):
                 print(colored(f"Project Manager couldn't find your specified group: {group}", "yellow"))
                 exit(1)
             
-            if name not in self.settings["projects"][group]:
+            project = self.settings_store.get_project(name, group) if name is not None else None
+            if project is None:
                 print(colored(f"Project Manager couldn't find your specified project in group: {group}", "yellow"))
-                exit(1)
+                return self._suggest_project(name, group)
             
-            project = self.settings["projects"][group][name]
-            project["name"] = name
-            project["group"] = group
             return project
         
-        # If group isn't given at param, search in projects
-        for s_group in self.settings["projects"]: # s_group: selected group
-            if name in self.settings["projects"][s_group]:
-                project_key += 1
-                found_projects[project_key] = self.settings["projects"][s_group][name]
-                found_projects[project_key]["name"] = name
-                found_projects[project_key]["group"] = s_group
-                choices.append(project_key)
+        # If group isn't given at param, look the name up in the name index
+        found_projects = dict() # All found projects goes here with a key which is increment number
+        projects = self.settings_store.find_projects(name) if name is not None else []
+        for project_key, project in enumerate(projects, start=1):
+            found_projects[project_key] = project
+        
+        choices = list(found_projects) # In case we found many results, it will be used in input_controller.get_option
+        project_key = len(found_projects)
         
         if project_key == 0:
             print(colored("Project Manager couldn't find your project.", "yellow"))
-            exit(1)
+            return self._suggest_project(name, group)
         elif project_key == 1:
             return found_projects[1]
         else:
@@ -213,3 +505,49 @@ class ProjectManager(object):
             selected_option = input_controller.get_option("Select a project by it's number (type 'q' to quit): ", choices)
 
             return found_projects[selected_option]        
+
+    @tracing.traced("project.search")
+    def search_projects(self, query:str, group:str = None, limit:int = 10) -> list:
+        """
+        Finds the projects whose names are similar to the query (best matches first)
+
+        Parameters
+        ----------
+        query : str
+            Project name, beginning of it or a misspelled name
+        
+        group : str
+            Project group (optional)
+        
+        limit : int
+            Maximum number of projects
+        """
+
+        return self.settings_store.search_projects(query, group, limit)
+    
+    def _suggest_project(self, name:str, group:str = None) -> dict:
+        """
+        Lets the user select one of the similar projects, exits if there aren't any
+
+        The suggestions are only listed (on stderr) if the output isn't a terminal, so
+        cd "$(pm path -n typo)" doesn't wait for an answer to a prompt it captures.
+        """
+
+        suggestions = self.search_projects(name, group, limit=5) if name is not None else []
+        if len(suggestions) == 0:
+            exit(1)
+        
+        if not (sys.stdin.isatty() and sys.stdout.isatty()):
+            names = ", ".join(f"{project['name']} (in group {project['group']})" for project in suggestions)
+            print(colored(f"Did you mean: {names}", "yellow"), file=sys.stderr)
+            exit(1)
+
+        input_controller = InputController()
+
+        print("Did you mean:")
+        for i, project in enumerate(suggestions, start=1):
+            print(f"[{i}] {project['name']} (in group {project['group']})")
+        
+        selected_option = input_controller.get_option("Select a project by it's number (type 'q' to quit): ", list(range(1, len(suggestions) + 1)))
+
+        return suggestions[selected_option - 1]
@@ -0,0 +1,101 @@
+import os
+
+
+class ProjectManifest(object):
+    """
+    List of projects that will be created at once (pm create --from manifest.csv|json)
+
+    A CSV manifest has a header row with the columns name and group; a JSON
+    manifest is a list of objects with the keys name and group. Other columns
+    or keys that are project keys (like repo_url) are stored with the project.
+    The optional repo and private columns (yes/no, true/false or 1/0) request a
+    GitHub repository for the project. The rest are ignored.
+
+    Attributes
+    ----------
+    path : str
+        Path of the manifest
+    projects : list
+        Projects as dicts with at least name and group
+
+    Methods
+    -------
+    read(path : str) -> ProjectManifest
+        Reads a manifest, raises ValueError if it isn't valid
+    """
+
+    PROJECT_KEYS = ["repo_url"]  # Keys that are stored with the projects
+    TRUE_VALUES = ["yes", "y", "true", "1"]
+
+    def __init__(self, path: str, projects: list):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the manifest
+
+        projects : list
+            Projects as dicts with at least name and group
+        """
+
+        self.path = path
+        self.projects = projects
+
+    @classmethod
+    def read(cls, path: str) -> "ProjectManifest":
+        """
+        Reads a manifest (the format is taken from the extension)
+
+        Raises OSError if it cannot be read and ValueError if it isn't valid.
+        """
+
+        extension = os.path.splitext(path)[1].lower()
+
+        if extension == ".csv":
+            import csv
+
+            with open(path, "r", newline="") as file:
+                rows = list(csv.DictReader(file))
+        elif extension == ".json":
+            from json import load
+
+            with open(path, "r") as file:
+                rows = load(file)
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("A JSON manifest must be a list of objects")
+        else:
+            raise ValueError("The manifest must be a .csv or a .json file")
+
+        projects = []
+        seen = set()
+
+        for number, row in enumerate(rows, start=1):
+            name = str(row.get("name") or "").strip()
+            group = str(row.get("group") or "").strip()
+
+            if name == "" or group == "":
+                raise ValueError(f"Project {number} doesn't have a name and a group")
+            for value in (name, group):
+                if "/" in value or value[0] == "." or " " in value:
+                    raise ValueError(f"Project {number} has an invalid name or group: {value}")
+            if (name, group) in seen:
+                raise ValueError(f"Project {name} is in group {group} more than once")
+            seen.add((name, group))
+
+            project = dict(name=name, group=group)
+            for key in cls.PROJECT_KEYS:
+                if row.get(key):
+                    project[key] = str(row[key])
+
+            if cls._is_true(row.get("repo")):
+                project["create_repo"] = True
+                project["private"] = cls._is_true(row.get("private"))
+            projects.append(project)
+
+        return cls(path, projects)
+
+    @classmethod
+    def _is_true(cls, value) -> bool:
+        if isinstance(value, bool):
+            return value
+        return str(value or "").strip().lower() in cls.TRUE_VALUES
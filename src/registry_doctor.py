@@ -0,0 +1,214 @@
+import os
+from stat import S_ISDIR
+from src.git_repository import GitRepository
+
+
+class RegistryDoctor(object):
+    """
+    Checks the records of the registry against the file system (pm doctor)
+
+    The directories are checked on a thread pool, so a large registry on network
+    storage takes about as long as its slowest directories instead of the sum of
+    all of them. Every project is checked for:
+
+    * a directory (dir) that is an absolute path, exists and is a directory,
+    * a git repository in it (.git),
+    * a repository URL (repo_url, optional) like https://host/owner/repo
+      (hosts other than github.com may have nested groups, like GitLab's
+      https://host/group/subgroup/repo).
+
+    A problem is fixed by pruning when the directory is gone (the record is
+    removed), or by fixing when the repository URL can be rewritten to the web
+    address of the same repository (git@host:owner/repo.git, .../repo.git and
+    such). repair() applies them with one write.
+
+    Attributes
+    ----------
+    settings_store : SettingsStore
+        Loaded settings
+    max_workers : int
+        Number of projects checked at the same time
+
+    Methods
+    -------
+    check(projects : list) -> iterator
+        Yields (project, problems) of each project as soon as it's checked
+
+    repair(results : list, prune : bool = False, fix : bool = False) -> tuple
+        Prunes and fixes the problems with one write, returns the pruned and fixed projects
+
+    normalize_repo_url(url : str) -> str
+        The web address of a repository URL, None if it isn't one
+    """
+
+    DEFAULT_WORKERS = 32  # The threads only wait for the file system
+
+    # Problem kinds
+    NO_DIRECTORY = "no_directory"
+    RELATIVE_DIRECTORY = "relative_directory"
+    MISSING_DIRECTORY = "missing_directory"
+    NOT_A_DIRECTORY = "not_a_directory"
+    UNREADABLE_DIRECTORY = "unreadable_directory"
+    NOT_A_REPOSITORY = "not_a_repository"
+    INVALID_REPO_URL = "invalid_repo_url"
+
+    def __init__(self, settings_store, max_workers: int = None):
+        """
+        Parameters
+        ----------
+        settings_store : SettingsStore
+            Loaded settings
+
+        max_workers : int
+            Number of projects checked at the same time (DEFAULT_WORKERS if not given)
+        """
+
+        self.settings_store = settings_store
+        self.max_workers = max_workers if max_workers is not None else self.DEFAULT_WORKERS
+
+    def check(self, projects: list):
+        """
+        Yields (project, problems) for each project, in the order they finish
+
+        problems is a list of dicts with kind (one of the problem kinds), message
+        and fix: "prune", the fixed repository URL, or None if it cannot be fixed.
+
+        Parameters
+        ----------
+        projects : list
+            Projects as dicts with at least name and group
+        """
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._check_project, project): project for project in projects}
+
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def _check_project(self, project: dict) -> list:
+        problems = []
+
+        def problem(kind: str, message: str, fix: str = None):
+            problems.append(dict(kind=kind, message=message, fix=fix))
+
+        directory = project.get("dir")
+        if not isinstance(directory, str) or directory == "":
+            problem(self.NO_DIRECTORY, "The project has no directory", "prune")
+        elif not os.path.isabs(directory):
+            problem(self.RELATIVE_DIRECTORY, f"The directory isn't an absolute path: {directory}")
+        else:
+            try:
+                mode = os.stat(directory).st_mode
+            except (FileNotFoundError, NotADirectoryError):
+                problem(self.MISSING_DIRECTORY, f"The directory doesn't exist: {directory}", "prune")
+            except OSError as e:
+                problem(self.UNREADABLE_DIRECTORY, f"The directory cannot be read: {e.strerror}")
+            else:
+                if not S_ISDIR(mode):
+                    problem(self.NOT_A_DIRECTORY, f"The path isn't a directory: {directory}", "prune")
+                elif not os.path.lexists(f"{directory}/.git"):  # A file in worktrees and submodules
+                    problem(self.NOT_A_REPOSITORY, "The directory isn't a git repository")
+
+        if "repo_url" in project:
+            url = project["repo_url"]
+            normalized = self.normalize_repo_url(url)
+            if normalized is None:
+                problem(self.INVALID_REPO_URL, f"The repository URL isn't a repository address: {url}")
+            elif normalized != url:
+                problem(self.INVALID_REPO_URL, f"The repository URL should be {normalized}: {url}", normalized)
+
+        return problems
+
+    @staticmethod
+    def normalize_repo_url(url: str) -> str:
+        """
+        The web address (http(s)://host/owner/repo) of a repository URL, None if it isn't one
+
+        Understands the web address itself, the clone URLs (https://host/owner/repo.git,
+        git@host:owner/repo.git and ssh://git@host/owner/repo.git) and trailing slashes.
+        """
+
+        if not isinstance(url, str):
+            return None
+
+        url = url.strip()
+        scheme = "https"
+
+        if "://" in url:
+            from urllib.parse import urlsplit
+
+            try:
+                parts = urlsplit(url)
+                host = parts.hostname
+                port = parts.port
+            except ValueError:
+                return None
+
+            if parts.scheme in ("http", "https"):
+                scheme = parts.scheme
+                if port is not None:
+                    host = f"{host}:{port}"
+            elif parts.scheme not in ("ssh", "git"):
+                return None
+        elif ":" in url and "@" in url.split(":", 1)[0]:  # scp-like syntax
+            host = url.split(":", 1)[0].split("@", 1)[1]
+        else:
+            return None
+
+        if not host:
+            return None
+
+        full_name = GitRepository.parse_repository_url(url, host, is_nested=host.lower() != "github.com")
+        if full_name is None:
+            return None
+
+        return f"{scheme}://{host.lower()}/{full_name}"
+
+    def repair(self, results: list, prune: bool = False, fix: bool = False) -> tuple:
+        """
+        Prunes and fixes the problems of given check results with one write
+
+        Parameters
+        ----------
+        results : list
+            (project, problems) pairs of check()
+
+        prune : bool
+            Removes the projects whose directory is gone
+
+        fix : bool
+            Rewrites the repository URLs that can be fixed
+
+        Returns
+        -------
+        tuple
+            (pruned, fixed) projects
+        """
+
+        pruned = []
+        fixed = []
+
+        with self.settings_store.transaction():
+            for project, problems in results:
+                if prune and any(problem["fix"] == "prune" for problem in problems):
+                    self.settings_store.remove_project(project["name"], project["group"])
+                    pruned.append(project)
+                    continue
+
+                urls = [problem["fix"] for problem in problems
+                        if problem["kind"] == self.INVALID_REPO_URL and problem["fix"] is not None]
+                if fix and len(urls) != 0:
+                    record = self.settings_store.get_project(project["name"], project["group"])
+                    if record is None:
+                        continue  # Removed by another process
+
+                    record["repo_url"] = urls[0]
+                    self.settings_store.put_project(project["name"], project["group"], record)
+                    fixed.append(project)
+
+        if len(pruned) != 0 or len(fixed) != 0:
+            self.settings_store.save()
+
+        return pruned, fixed
@@ -0,0 +1,418 @@
+import os
+import pickle
+from array import array
+from heapq import nlargest
+
+
+def trigrams(text: str) -> set:
+    """
+    Trigrams of given text (lowercased and padded, so short queries and prefixes have trigrams too)
+    """
+
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex(object):
+    """
+    Trigram and prefix index over project names for fuzzy search
+
+    The index is saved to pm-search-index.pickle together with the signature
+    (mtime and size) of the settings file it describes. It is rebuilt only
+    when that signature doesn't match. The changes that SettingsStore saves are
+    appended to pm-search-index.delta (append_changes) instead of rewriting the
+    index; open() applies the ones that lead from the index's signature to the
+    current one and writes the index again without them.
+
+    Methods
+    -------
+    open(project_manager_home : str, signature : tuple) -> SearchIndex
+        Loads the saved index if it describes given settings file signature
+
+    build(project_manager_home : str, projects : dict, signature : tuple) -> SearchIndex
+        Builds a new index from group -> {name: record}
+
+    add(name : str, group : str)
+        Adds a project
+
+    remove(name : str, group : str)
+        Removes a project
+
+    search(query : str, group : str = None, limit : int = 10) -> list
+        Ranked (score, name, group) matches of given query
+
+    save(signature : tuple)
+        Writes the index
+
+    append_changes(project_manager_home : str, old_signature : tuple, signature : tuple, changes : list)
+        Records the changes of a save for the saved index
+
+    delete(project_manager_home : str)
+        Removes the saved index and its recorded changes
+    """
+
+    INDEX_FILE = "pm-search-index.pickle"
+    DELTA_FILE = "pm-search-index.delta"
+    DELTA_LIMIT = 1024 * 1024  # Past this size the index is removed and rebuilt by the next search
+    VERSION = 1
+
+    # Trigrams that appear in more names than this ratio don't produce candidates
+    # by themselves; they are only counted for the best candidates of the rarer ones.
+    COMMON_TRIGRAM_RATIO = 0.03
+    CANDIDATES_PER_RESULT = 50
+    MIN_SCORE = 0.3
+
+    _SAVED_ATTRIBUTES = ("names", "keys", "trigram_counts", "name_groups", "postings", "sorted_ids")
+
+    def __init__(self, project_manager_home: str, signature: tuple = None):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        signature : tuple
+            (mtime_ns, size) of the settings file that this index describes
+        """
+
+        self.project_manager_home = project_manager_home
+        self.signature = signature
+
+        self.names = []  # Name id -> name (removed names stay as tombstones)
+        self.keys = []  # Name id -> padded lowercase name
+        self.trigram_counts = array("H")  # Name id -> number of trigrams in the name
+        self.name_groups = dict()  # Name -> groups that have a project with this name
+        self.postings = dict()  # Trigram -> name ids
+        self.sorted_ids = array("l")  # Name ids sorted by key, for prefix search
+        self._name_ids = None  # Name -> name id, built when the index is changed
+
+    @classmethod
+    def path_of(cls, project_manager_home: str) -> str:
+        return f"{project_manager_home}/{cls.INDEX_FILE}"
+
+    @classmethod
+    def delta_path_of(cls, project_manager_home: str) -> str:
+        return f"{project_manager_home}/{cls.DELTA_FILE}"
+
+    @classmethod
+    def open(cls, project_manager_home: str, signature: tuple) -> "SearchIndex":
+        """
+        Loads the saved index, or returns None if it's missing or doesn't describe given signature
+
+        The recorded changes are applied first; if there are any, the index is saved with them.
+
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        signature : tuple
+            (mtime_ns, size) of the current settings file
+        """
+
+        try:
+            with open(cls.path_of(project_manager_home), "rb") as file:
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+
+        if data.get("version") != cls.VERSION:
+            return None
+
+        current = tuple(data.get("signature") or ())
+        deltas = []
+        if current != tuple(signature):
+            for delta in cls._read_deltas(project_manager_home):
+                if tuple(delta["old"]) == current:
+                    deltas.append(delta)
+                    current = tuple(delta["new"])
+            if current != tuple(signature):
+                return None
+
+        index = cls(project_manager_home, signature)
+        for attribute in cls._SAVED_ATTRIBUTES:
+            setattr(index, attribute, data[attribute])
+
+        for delta in deltas:
+            for name, group, is_added in delta["changes"]:
+                if is_added:
+                    index.add(name, group)
+                else:
+                    index.remove(name, group)
+
+        if len(deltas) != 0:
+            index.save()  # Replaces the delta file
+        return index
+
+    @classmethod
+    def _read_deltas(cls, project_manager_home: str) -> list:
+        from json import loads
+
+        try:
+            with open(cls.delta_path_of(project_manager_home), "r") as file:
+                lines = file.readlines()
+        except OSError:
+            return []
+
+        deltas = []
+        for line in lines:
+            try:
+                deltas.append(loads(line))
+            except ValueError:
+                continue  # Left by an interrupted append
+
+        return deltas
+
+    @classmethod
+    def append_changes(cls, project_manager_home: str, old_signature: tuple, signature: tuple, changes: list):
+        """
+        Records the changes of a save, so the saved index can be brought up to date by open()
+
+        Appending costs as much as the changes, not as much as the index. Nothing is recorded
+        if there isn't a saved index.
+
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        old_signature : tuple
+            Signature of the registry before the save
+
+        signature : tuple
+            Signature of the registry after the save
+
+        changes : list
+            (name, group, is_added) of the projects added or removed by the save
+        """
+
+        from json import dumps
+
+        if not os.path.exists(cls.path_of(project_manager_home)):
+            return
+
+        path = cls.delta_path_of(project_manager_home)
+        line = dumps(dict(old=list(old_signature), new=list(signature), changes=changes)) + "\n"
+        try:
+            with open(path, "a") as file:
+                file.write(line)
+                size = file.tell()
+        except OSError:
+            return
+
+        if size > cls.DELTA_LIMIT:
+            cls.delete(project_manager_home)  # Rebuilding is cheaper than replaying this many changes
+
+    @classmethod
+    def delete(cls, project_manager_home: str):
+        """
+        Removes the saved index and its recorded changes
+        """
+
+        for path in (cls.path_of(project_manager_home), cls.delta_path_of(project_manager_home)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @classmethod
+    def build(cls, project_manager_home: str, projects: dict, signature: tuple = None) -> "SearchIndex":
+        """
+        Builds a new index
+
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        projects : dict
+            Group -> {project name: record}
+
+        signature : tuple
+            (mtime_ns, size) of the settings file that projects come from
+        """
+
+        index = cls(project_manager_home, signature)
+        index._name_ids = dict()
+        for group, group_projects in projects.items():
+            for name in group_projects:
+                index._add(name, group, keep_sorted=False)
+
+        index.sorted_ids = array("l", sorted(range(len(index.keys)), key=index.keys.__getitem__))
+        return index
+
+    @property
+    def name_ids(self) -> dict:
+        if self._name_ids is None:
+            self._name_ids = {name: name_id for name_id, name in enumerate(self.names)}
+
+        return self._name_ids
+
+    def add(self, name: str, group: str):
+        """
+        Adds a project
+
+        Parameters
+        ----------
+        name : str
+            Project name
+
+        group : str
+            Project group
+        """
+
+        self._add(name, group, keep_sorted=True)
+
+    def _add(self, name: str, group: str, keep_sorted: bool):
+        groups = self.name_groups.get(name)
+        if groups is not None:
+            if group not in groups:
+                groups.append(group)
+            return
+
+        self.name_groups[name] = [group]
+
+        if name in self.name_ids:  # Brought back from a tombstone
+            return
+
+        name_id = len(self.names)
+        key = f"  {name.lower()} "
+        name_trigrams = trigrams(name)
+
+        self.names.append(name)
+        self.keys.append(key)
+        self.trigram_counts.append(len(name_trigrams))
+        self.name_ids[name] = name_id
+
+        for trigram in name_trigrams:
+            if trigram not in self.postings:
+                self.postings[trigram] = array("l")
+            self.postings[trigram].append(name_id)
+
+        if keep_sorted:
+            self.sorted_ids.insert(self._sorted_position(key), name_id)
+
+    def _sorted_position(self, key: str) -> int:
+        low, high = 0, len(self.sorted_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.keys[self.sorted_ids[middle]] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def remove(self, name: str, group: str):
+        """
+        Removes a project
+
+        Parameters
+        ----------
+        name : str
+            Project name
+
+        group : str
+            Project group
+        """
+
+        groups = self.name_groups.get(name)
+        if groups is None or group not in groups:
+            return
+
+        groups.remove(group)
+        if len(groups) == 0:
+            del self.name_groups[name]  # The name id stays in postings as a tombstone
+
+    def search(self, query: str, group: str = None, limit: int = 10) -> list:
+        """
+        Ranked matches of given query as (score, name, group), best first
+
+        Exact and prefix matches are ranked above fuzzy (trigram) matches.
+
+        Parameters
+        ----------
+        query : str
+            Project name or a part of it (typos are tolerated)
+
+        group : str
+            Only return projects in this group (optional)
+
+        limit : int
+            Maximum number of results
+        """
+
+        query_lower = query.lower()
+        query_trigrams = trigrams(query)
+        scores = dict()  # Name -> score
+
+        # Prefix matches
+        prefix = f"  {query_lower}"
+        position = self._sorted_position(prefix)
+        for name_id in self.sorted_ids[position:position + limit * 4]:
+            if not self.keys[name_id].startswith(prefix):
+                break
+            scores[self.names[name_id]] = 1.0 + len(query_lower) / (len(self.keys[name_id]) - 3)
+
+        # Trigram matches: rare trigrams find the candidates, common ones only refine the best of them
+        max_posting_size = max(1, int(len(self.names) * self.COMMON_TRIGRAM_RATIO))
+        postings = sorted(((trigram, self.postings.get(trigram, ())) for trigram in query_trigrams),
+                          key=lambda item: len(item[1]))
+
+        rare = [item for item in postings if len(item[1]) <= max_posting_size] or postings[:1]
+        common = postings[len(rare):]
+
+        overlaps = dict()  # Name id -> number of shared trigrams
+        for _, posting in rare:
+            for name_id in posting:
+                overlaps[name_id] = overlaps.get(name_id, 0) + 1
+
+        candidates = nlargest(max(limit * self.CANDIDATES_PER_RESULT, 100), overlaps.items(), key=lambda item: item[1])
+
+        for name_id, overlap in candidates:
+            name = self.names[name_id]
+            if name not in self.name_groups:
+                continue
+
+            key = self.keys[name_id]
+            overlap += sum(1 for trigram, _ in common if trigram in key)
+
+            score = 2 * overlap / (len(query_trigrams) + self.trigram_counts[name_id])
+            if query_lower in key:
+                score += 0.5
+            if score >= self.MIN_SCORE and score > scores.get(name, 0):
+                scores[name] = score
+
+        results = []
+        for name, score in scores.items():
+            for name_group in self.name_groups.get(name, ()):
+                if group is None or name_group == group:
+                    results.append((score, name, name_group))
+
+        return nlargest(limit, results, key=lambda result: result[0])
+
+    def save(self, signature: tuple = None):
+        """
+        Writes the index (errors are ignored, the index can always be rebuilt)
+
+        Parameters
+        ----------
+        signature : tuple
+            (mtime_ns, size) of the settings file that this index describes
+        """
+
+        if signature is not None:
+            self.signature = signature
+
+        data = {attribute: getattr(self, attribute) for attribute in self._SAVED_ATTRIBUTES}
+        data.update(version=self.VERSION, signature=self.signature)
+
+        path = self.path_of(self.project_manager_home)
+        temporary_path = f"{path}.{os.getpid()}.tmp"  # Another process may be writing it too
+        try:
+            with open(temporary_path, "wb") as file:
+                pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+            os.remove(self.delta_path_of(self.project_manager_home))  # Included in the index now
+        except OSError:
+            pass
@@ -0,0 +1,211 @@
+import os
+import mmap
+import marshal
+from struct import Struct
+from zlib import crc32
+
+
+class SettingsCache(object):
+    """
+    Compiled binary copy of pm-settings.json
+
+    pm-settings.json stays the source of truth; this cache is used only when the
+    mtime and size of the JSON file match the ones it was compiled from. The file
+    is memory-mapped and decoded lazily, so the cost of opening it doesn't depend
+    on the number of projects:
+
+    * a small header with the top-level settings and the offset of every group,
+    * one marshal blob per group (decoded when the group is accessed),
+    * an open-addressing hash table of project name -> groups.
+
+    Methods
+    -------
+    open(project_manager_home : str, signature : tuple) -> SettingsCache
+        Opens the cache if it was compiled from given settings file signature
+
+    write(project_manager_home : str, settings : dict, signature : tuple)
+        Compiles the cache from settings
+
+    remove(project_manager_home : str)
+        Removes the cache
+
+    group_projects(group : str) -> dict
+        Decodes the projects of a group
+
+    group_count(group : str) -> int
+        Number of projects in a group
+
+    find_name(name : str) -> list
+        Groups that have a project with given name
+    """
+
+    CACHE_FILE = "pm-settings.cache"
+    MAGIC = b"PMC1"
+
+    _PREFIX = Struct("<4sI")  # Magic, header length
+    _SLOT = Struct("<III")  # Name hash, entry offset, entry length (0 for empty slots)
+
+    def __init__(self, buffer, header_length: int, header: dict):
+        self._buffer = buffer
+        self._body = self._PREFIX.size + header_length  # Offsets in the header are relative to this
+        self.signature = tuple(header["signature"])
+        self.settings = header["settings"]
+        self._groups = header["groups"]  # Group -> (offset, length, project count)
+        self._index_offset, self._slot_count = header["index"]
+
+    @classmethod
+    def path_of(cls, project_manager_home: str) -> str:
+        return f"{project_manager_home}/{cls.CACHE_FILE}"
+
+    @classmethod
+    def open(cls, project_manager_home: str, signature: tuple) -> "SettingsCache":
+        """
+        Opens the cache, or returns None if it's missing, unreadable or compiled from another file
+
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        signature : tuple
+            (mtime_ns, size) of the current settings file
+        """
+
+        try:
+            with open(cls.path_of(project_manager_home), "rb") as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, header_length = cls._PREFIX.unpack_from(buffer, 0)
+            if magic != cls.MAGIC:
+                return None
+
+            header = marshal.loads(buffer[cls._PREFIX.size:cls._PREFIX.size + header_length])
+            if tuple(header["signature"]) != tuple(signature):
+                return None
+        except Exception:  # Any kind of corruption means the cache has to be compiled again
+            return None
+
+        return cls(buffer, header_length, header)
+
+    @classmethod
+    def write(cls, project_manager_home: str, settings: dict, signature: tuple):
+        """
+        Compiles the cache from settings (errors are ignored, the cache is only an optimization)
+
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        settings : dict
+            All of the settings with the projects
+
+        signature : tuple
+            (mtime_ns, size) of the settings file that settings were read from or written to
+        """
+
+        projects = settings["projects"]
+        top_level = {key: value for key, value in settings.items() if key != "projects"}
+
+        blobs = []
+        groups = dict()
+        name_groups = dict()
+        offset = 0
+
+        for group, group_projects in projects.items():
+            blob = marshal.dumps(group_projects)
+            groups[group] = (offset, len(blob), len(group_projects))
+            blobs.append(blob)
+            offset += len(blob)
+
+            for name in group_projects:
+                name_groups.setdefault(name, []).append(group)
+
+        # Hash table of names (at most half full, linear probing)
+        slot_count = max(8, len(name_groups) * 2)
+        slots = [(0, 0, 0)] * slot_count
+        index_offset = offset
+
+        offset += slot_count * cls._SLOT.size
+        entries = []
+        for name, name_group_list in name_groups.items():
+            entry = marshal.dumps((name, name_group_list))
+            name_hash = crc32(name.encode())
+
+            slot = name_hash % slot_count
+            while slots[slot][2] != 0:
+                slot = (slot + 1) % slot_count
+            slots[slot] = (name_hash, offset, len(entry))
+
+            entries.append(entry)
+            offset += len(entry)
+
+        # Offsets are relative to the end of the header
+        header = marshal.dumps(dict(signature=tuple(signature), settings=top_level,
+                                    groups=groups, index=(index_offset, slot_count)))
+
+        path = cls.path_of(project_manager_home)
+        temporary_path = f"{path}.{os.getpid()}.tmp"  # Another process may be writing it too
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(cls._PREFIX.pack(cls.MAGIC, len(header)))
+                file.write(header)
+                for blob in blobs:
+                    file.write(blob)
+                file.write(b"".join(cls._SLOT.pack(*slot) for slot in slots))
+                for entry in entries:
+                    file.write(entry)
+            os.replace(temporary_path, path)
+        except OSError:
+            pass
+
+    @classmethod
+    def remove(cls, project_manager_home: str):
+        """
+        Removes the cache
+        """
+
+        try:
+            os.remove(cls.path_of(project_manager_home))
+        except OSError:
+            pass
+
+    @property
+    def groups(self) -> list:
+        return list(self._groups)
+
+    def group_projects(self, group: str) -> dict:
+        """
+        Decodes the projects of a group (name -> record)
+        """
+
+        offset, length, _ = self._groups[group]
+        offset += self._body
+        return marshal.loads(self._buffer[offset:offset + length])
+
+    def group_count(self, group: str) -> int:
+        return self._groups[group][2]
+
+    def find_name(self, name: str) -> list:
+        """
+        Groups that have a project with given name (in group order)
+        """
+
+        name_hash = crc32(name.encode())
+        slot = name_hash % self._slot_count
+
+        while True:
+            slot_hash, offset, length = self._SLOT.unpack_from(self._buffer, self._body + self._index_offset + slot * self._SLOT.size)
+            if length == 0:
+                return []
+
+            offset += self._body
+            if slot_hash == name_hash:
+                entry_name, groups = marshal.loads(self._buffer[offset:offset + length])
+                if entry_name == name:
+                    return groups
+
+            slot = (slot + 1) % self._slot_count
@@ -0,0 +1,154 @@
+import os
+from json import dumps, loads
+
+
+class SettingsJournal(object):
+    """
+    Append-only journal of the changes made to pm-settings.json
+
+    Every save appends its changes as one JSON object per line instead of
+    rewriting the whole settings file. The journal is replayed on top of the
+    settings file when it's loaded, and compacted back into it by SettingsStore
+    once it grows past a size limit. Replaying is idempotent, so a crash
+    between compacting and removing the journal doesn't lose or break anything.
+
+    Operations
+    ----------
+    {"op": "set", "key": key, "value": value}
+        Sets a top-level setting
+
+    {"op": "group", "group": group}
+        Adds a group
+
+    {"op": "put", "group": group, "name": name, "record": record}
+        Adds or replaces a project
+
+    {"op": "remove", "group": group, "name": name}
+        Removes a project
+
+    Methods
+    -------
+    read() -> list
+        Operations in the journal
+
+    append(operations : list)
+        Appends operations
+
+    size() -> int
+        Size of the journal in bytes
+
+    remove()
+        Removes the journal
+
+    merge(current : dict, base : dict, record : dict) -> dict
+        The record of a put applied on top of a record that another process has changed
+    """
+
+    JOURNAL_FILE = "pm-settings.journal"
+
+    def __init__(self, project_manager_home: str):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+        """
+
+        self.path = f"{project_manager_home}/{self.JOURNAL_FILE}"
+
+    def signature(self) -> tuple:
+        """
+        (mtime_ns, size) of the journal, or an empty tuple if there isn't one
+        """
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return ()
+
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read(self) -> list:
+        """
+        Operations in the journal (torn lines from interrupted appends are skipped)
+        """
+
+        try:
+            with open(self.path, "r") as file:
+                lines = file.readlines()
+        except OSError:
+            return []
+
+        operations = []
+        for line in lines:
+            try:
+                operations.append(loads(line))
+            except ValueError:
+                continue  # Left by an interrupted append
+
+        return operations
+
+    def append(self, operations: list):
+        """
+        Appends operations with a single write
+
+        Parameters
+        ----------
+        operations : list
+            Operations as dicts (see the class documentation)
+        """
+
+        data = "".join(dumps(operation) + "\n" for operation in operations)
+        with open(self.path, "a+b") as file:
+            if file.tell() != 0:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":  # Don't glue the new line onto a torn one
+                    data = "\n" + data
+            file.write(data.encode())
+
+    @staticmethod
+    def merge(current: dict, base: dict, record: dict) -> dict:
+        """
+        The record of a put applied on top of the current record
+
+        base is the record that the put was made from. If another process has changed
+        the record since (current isn't base), only the keys that differ from base are
+        taken from record, so the other process' changes to the other keys are kept.
+
+        Parameters
+        ----------
+        current : dict
+            The record as it is now (None if the project doesn't exist)
+
+        base : dict
+            The record that record was made from (None for a new project or an unconditional put)
+
+        record : dict
+            New record
+        """
+
+        if base is None or current is None or current == base:
+            return record
+
+        merged = dict(current)
+        for key in base.keys() | record.keys():
+            if record.get(key) == base.get(key) and (key in base) == (key in record):
+                continue  # Not changed by this put
+            if key in record:
+                merged[key] = record[key]
+            else:
+                merged.pop(key, None)
+
+        return merged
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -1,9 +1,11 @@
-from json import dump, load  # For saving settings to a json file
-from termcolor import colored  # For colored output
+from src.console import colored  # For colored output
 import os
 from sys import exit
+from time import time
 from src.input_controller import InputController
+from src.directory_scanner import DirectoryScanner
 from src.project_manager import ProjectManager
+from src.settings_store import SettingsStore
 
 
 class SettingsManager(object):
@@ -14,14 +16,20 @@ class SettingsManager(object):
     ----------
     project_manager_home : str
         The home directory of Project Manager
-    input_controller : InputController
-        The InputController instance for controlling inputs
+    settings_store : SettingsStore
+        The shared settings of Project Manager
 
     Methods
     -------
-    setup()
+    setup(max_workers : int = None, quiet : bool = False, progress : bool = False)
         Runs the setup script that initializes the pm-settings.json file
     
+    scan_projects(max_workers : int = None, quiet : bool = False, progress : bool = False, groups : list = None) -> tuple
+        Adds the new projects in the projects folder and removes the deleted ones
+
+    watch_projects(max_workers : int = None, quiet : bool = False)
+        Keeps the projects up to date with the projects folder until interrupted
+
     set_value(key : str, value : str)
         Sets given key to given value in settings
     
@@ -29,26 +37,34 @@ class SettingsManager(object):
         Configures given project by prompting the user or changing given key to given value
     """
 
-    def __init__(self, project_manager_home: str):
+    def __init__(self, project_manager_home: str, settings_store: SettingsStore = None):
         """
         Parameters
         ----------
         project_manager_home : str
             The home directory of Project Manager
-        input_controller : InputController
-            The InputController instance for controlling inputs
+        settings_store : SettingsStore
+            The shared settings (the process-wide store of project_manager_home is used if not given)
         """
 
         super().__init__()
         self.project_manager_home = project_manager_home
+        self.settings_store = settings_store if settings_store is not None else SettingsStore.get(project_manager_home)
 
-        if os.path.exists(f"{project_manager_home}/pm-settings.json"):
-            with open(f"{project_manager_home}/pm-settings.json", "r") as file:
-                self.settings = load(file)
-
-    def setup(self):
+    def setup(self, max_workers: int = None, quiet: bool = False, progress: bool = False):
         """
         Runs the setup script that initializes the pm-settings.json file
+
+        Parameters
+        ----------
+        max_workers : int
+            Number of group directories scanned at the same time (optional)
+
+        quiet : bool
+            Doesn't print the scanned projects if True
+
+        progress : bool
+            Prints a progress bar instead of the scanned projects if True
         """
 
         input_controller = InputController()
@@ -88,26 +104,182 @@ class SettingsManager(object):
                 print(
                     colored("Scan has been started, please wait a minute...", "yellow"))
 
-                for directory in os.listdir(projects_folder):
-                    if os.path.isfile(f"{projects_folder}/{directory}") or directory[0] == ".":
-                        continue
-                    settings["projects"][directory] = dict()
-                    print(f"\n* {directory}")
-                    for project in os.listdir(f"{projects_folder}/{directory}"):
-                        if os.path.isfile(f"{projects_folder}/{directory}/{project}") or project[0] == ".":
-                            continue
-                        settings["projects"][directory][project] = dict(
-                            dir=f"{projects_folder}/{directory}/{project}")
-                        print(f"|-> {project}")
-
-            with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-                dump(settings, file, indent=4)
+                scanner = DirectoryScanner(max_workers, quiet, progress)
+                settings["projects"] = scanner.scan(projects_folder)
+
+            self.settings_store.initialize(settings)
+            self.settings_store.save()
             print(colored("Settings saved successfully.", "green"))
 
         else:
             print("Settings are not saved.")
             exit()
 
+    def scan_projects(self, max_workers: int = None, quiet: bool = False, progress: bool = False,
+                      groups: list = None) -> tuple:
+        """
+        Adds the new projects in the projects folder and removes the deleted ones
+
+        The mtime and inode of every group directory are stored in settings["scan_state"],
+        and only the groups whose directory has changed since the last scan are listed
+        again. The existing projects keep their records (repo_url etc.); projects outside
+        of their group's directory are never removed.
+
+        Parameters
+        ----------
+        max_workers : int
+            Number of group directories scanned at the same time (optional)
+
+        quiet : bool
+            Doesn't print the summary if True
+
+        progress : bool
+            Prints a progress bar while the groups are scanned if True
+
+        groups : list
+            Checks only these group directories, which are known to have changed (optional)
+
+        Returns
+        -------
+        tuple
+            (number of added projects, number of removed projects)
+        """
+
+        projects_folder = self.settings_store["projects_folder"]
+        state = self.settings_store["scan_state"] if "scan_state" in self.settings_store else dict()
+        if state.get("projects_folder") != projects_folder:
+            state = dict()  # The previous scan was of another folder
+
+        scan_started = time()
+
+        def signature_of(stat) -> list:
+            # A directory changed in the same second as the scan may change again unnoticed, so it's scanned next time too
+            if stat.st_mtime >= scan_started - 1:
+                return None
+            return [stat.st_mtime_ns, stat.st_ino]
+
+        old_signatures = state.get("groups", dict())
+        deleted_groups = []
+
+        if groups is not None:
+            # The other groups haven't changed, so their state is kept as it is
+            is_folder_changed = False
+            folder_signature = state.get("folder")
+            new_signatures = dict(old_signatures)
+        else:
+            try:
+                folder_stat = os.stat(projects_folder)
+                folder_signature = signature_of(folder_stat)
+                is_folder_changed = state.get("folder") is None or state["folder"] != folder_signature
+                if is_folder_changed:
+                    groups = DirectoryScanner.list_directories(projects_folder)
+                else:
+                    groups = list(old_signatures)  # No group was added or removed
+            except OSError as e:
+                print(colored(f"Cannot scan the projects folder {projects_folder}: {e.strerror}", "red"))
+                exit(1)
+
+            new_signatures = dict()
+
+        changed_groups = []
+
+        for group in groups:
+            try:
+                signature = signature_of(os.stat(f"{projects_folder}/{group}"))
+            except OSError:
+                new_signatures.pop(group, None)
+                if not is_folder_changed and self.settings_store.has_group(group):
+                    deleted_groups.append(group)
+                continue  # Removed since the folder was listed
+
+            new_signatures[group] = signature
+            if signature is None or old_signatures.get(group) != signature:
+                changed_groups.append(group)
+
+        scanner = DirectoryScanner(max_workers, quiet, progress)
+        listed = scanner.scan_groups(projects_folder, changed_groups)
+        for group in changed_groups:
+            if group not in listed:
+                new_signatures[group] = None  # Couldn't be listed, try again next time
+
+        # Groups whose directory is gone lose their scanned projects as well
+        if is_folder_changed:
+            deleted_groups = [group for group in self.settings_store.groups() if group not in new_signatures]
+        for group in deleted_groups:
+            listed[group] = []
+
+        added = 0
+        removed = 0
+
+        with self.settings_store.transaction():
+            for group, names in listed.items():
+                group_folder = f"{projects_folder}/{group}"
+                group_folders = {os.path.normpath(group_folder), os.path.realpath(group_folder)}
+                existing = self.settings_store.group_projects(group) if self.settings_store.has_group(group) else dict()
+                names = set(names)
+
+                for name, record in list(existing.items()):
+                    if name not in names and os.path.dirname(os.path.normpath(record["dir"])) in group_folders:
+                        self.settings_store.remove_project(name, group)
+                        removed += 1
+
+                for name in sorted(names - existing.keys()):
+                    self.settings_store.put_project(name, group, dict(dir=f"{group_folder}/{name}"))
+                    added += 1
+
+            self.settings_store.set_value("scan_state", dict(projects_folder=projects_folder,
+                                                             folder=folder_signature,
+                                                             groups=new_signatures))
+        self.settings_store.save()
+
+        if not quiet:
+            print(f"Scanned {len(listed) - len(deleted_groups)} of {len(groups)} group(s): "
+                  f"{added} project(s) added, {removed} project(s) removed.")
+
+        return added, removed
+
+    def watch_projects(self, max_workers: int = None, quiet: bool = False):
+        """
+        Keeps the projects up to date with the projects folder until interrupted
+
+        The folder is scanned once, then the group directories are watched (with
+        inotify, or by polling their mtimes where it isn't available). Changes are
+        collected until the folder is quiet for a moment and written in one batch.
+
+        Parameters
+        ----------
+        max_workers : int
+            Number of group directories scanned at the same time (optional)
+
+        quiet : bool
+            Doesn't print the applied changes if True
+        """
+
+        from datetime import datetime
+        from src.directory_watcher import DirectoryWatcher
+
+        projects_folder = self.settings_store["projects_folder"]
+
+        def apply_changes(groups: list):
+            self.settings_store.refresh()  # Other pm processes may have changed the projects meanwhile
+            added, removed = self.scan_projects(max_workers, quiet=True, groups=groups)
+            if not quiet and added + removed != 0:
+                print(f"[{datetime.now():%H:%M:%S}] {added} project(s) added, {removed} project(s) removed.")
+
+        watcher = DirectoryWatcher(projects_folder, apply_changes)
+        watcher.start()  # Watching starts before the first scan, so nothing is missed in between
+        self.scan_projects(max_workers, quiet)
+
+        if not quiet:
+            print(f"Watching {projects_folder} ({watcher.backend}), press Ctrl+C to stop.")
+
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
     def set_value(self, key: str, value: str):
         """
         Sets given key to given value in settings
@@ -120,9 +292,8 @@ class SettingsManager(object):
         value : str
             The value that will be assigned to key in settings
         """
-        self.settings[key] = value
-        with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-            dump(self.settings, file, indent=4)
+        self.settings_store.set_value(key, value)
+        self.settings_store.save()
     
     def configure_project(self, name:str, group:str = None, key:str = None, value:str = None):
         """
@@ -142,8 +313,9 @@ class SettingsManager(object):
         value : str
             The value that will be assigned to key in project's settings (optional)
         """
-        project_manager = ProjectManager(self.project_manager_home)
+        project_manager = ProjectManager(self.project_manager_home, self.settings_store)
         project = project_manager.find_project(name, group)
+        name = project["name"] # The typed name may be a misspelling that find_project has resolved
 
         project_keys = ["repo_url"] # A key set that can be changed in project's settings
 
@@ -152,9 +324,9 @@ class SettingsManager(object):
                 print(colored(f"Invalid key: {key}", "yellow"))
                 exit(1)
             
-            self.settings["projects"][project["name"]][project["group"]][key] = value
-            with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-                dump(self.settings, file, indent=4)
+            project[key] = value
+            self.settings_store.put_project(project["name"], project["group"], project)
+            self.settings_store.save()
             
             print(f"{project['name']}'s key {key} is now set to {value}")
             exit()
@@ -183,10 +355,10 @@ class SettingsManager(object):
         
         if selected == 1: # Change repostory URL
             new_url = input_controller.get_str("New repository URL: ")
-            self.settings["projects"][project["group"]][project["name"]]["repo_url"] = new_url
-            with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-                dump(self.settings, file, indent=4)
-                print("Done!")
+            project["repo_url"] = new_url
+            self.settings_store.put_project(project["name"], project["group"], project)
+            self.settings_store.save()
+            print("Done!")
         
         elif selected == 2: # Change project's name
             new_name = input_controller.get_str("New name (don't use spaces): ")
@@ -194,7 +366,6 @@ class SettingsManager(object):
             rename_folder = input_controller.get_bool("Do you want to rename your project folder as well? (y/n): ")
 
             project_group = project["group"]
-            del self.settings["projects"][project["group"]][name]
             del project["name"]
             del project["group"]
             
@@ -205,11 +376,11 @@ class SettingsManager(object):
                 os.chdir(new_name) # We go into renamed directory for taking the new path
                 project["dir"] = os.getcwd() # Lastly we asssign our dir key with the current directory's path
             
-            self.settings["projects"][project_group][new_name] = project # Assign new path to old dir key
-
-            with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-                dump(self.settings, file, indent=4)
-                print("Done!")
+            with self.settings_store.transaction(): # Both changes are applied or none of them
+                self.settings_store.remove_project(name, project_group)
+                self.settings_store.put_project(new_name, project_group, project) # Assign new path to old dir key
+            self.settings_store.save()
+            print("Done!")
         
         elif selected == 3: # Change project's group
             new_group = input_controller.get_str("New group (don't use spaces): ")
@@ -217,23 +388,19 @@ class SettingsManager(object):
 
             old_group = project["group"]
 
-            del self.settings["projects"][old_group][name]
             del project["name"]
             del project["group"]
             
-            if new_group not in self.settings["projects"]:
-                self.settings["projects"][new_group] = dict()
-            
-            self.settings["projects"][new_group][name] = project
-
-            with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-                dump(self.settings, file, indent=4)
-                print("Done!")
+            with self.settings_store.transaction(): # Both changes are applied or none of them
+                self.settings_store.remove_project(name, old_group)
+                self.settings_store.put_project(name, new_group, project) # The group is created if it doesn't exist
+            self.settings_store.save()
+            print("Done!")
         
         elif selected == 4: # Set project's path
             new_path = input_controller.get_path("New path: ")
-            self.settings["projects"][project["group"]][name]["dir"] = new_path
-
-            with open(f"{self.project_manager_home}/pm-settings.json", "w") as file:
-                dump(self.settings, file, indent=4)
-                print("Done!")
+            project["dir"] = new_path
+            with self.settings_store.transaction():
+                self.settings_store.put_project(name, project["group"], project)
+            self.settings_store.save()
+            print("Done!")
@@ -0,0 +1,927 @@
+import os
+from json import dump, load
+from contextlib import contextmanager
+from src.search_index import SearchIndex
+from src.settings_cache import SettingsCache
+from src.settings_journal import SettingsJournal
+from src.file_lock import FileLock
+from src.shell_integration import ShellIntegration
+from src.tracing import traced
+
+
+class SettingsStore(object):
+    """
+    Shared store of pm-settings.json
+
+    The settings file is parsed once per process (see SettingsStore.get) and every
+    manager works on the same data. Changes are tracked by part (the "settings" part
+    for top-level keys, one part per group for the projects), so save() only writes
+    when something has changed.
+
+    Unless the settings_cache setting is "off", a compiled copy of the file
+    (SettingsCache) is used when it matches the file, and groups are decoded
+    from it only when they are accessed.
+
+    When the registry_backend setting is "sqlite", the projects are kept in an
+    SQLite database (SqliteRegistry) instead of settings["projects"]; when it's
+    "sharded", they are kept in one file per group (ShardedRegistry), read as
+    the groups are accessed.
+
+    save() appends the changes to a journal (SettingsJournal) instead of
+    rewriting the file. The journal is replayed on load and compacted back
+    into the file (written to a temporary file and renamed) once it grows
+    past JOURNAL_LIMIT bytes.
+
+    Other pm processes can change the settings at the same time. Loading
+    doesn't lock anything; save() takes an exclusive lock (pm-settings.lock)
+    only while it writes, and if the file or the journal has changed since
+    they were loaded, it reloads them and applies this process' changes on
+    top (merging the keys of projects that both processes have changed).
+
+    Attributes
+    ----------
+    project_manager_home : str
+        The home directory of Project Manager
+
+    Methods
+    -------
+    get(project_manager_home : str) -> SettingsStore
+        Returns the process-wide store of given home directory
+
+    load()
+        Reads the settings file
+
+    refresh() -> bool
+        Reloads the settings if another process has saved them
+
+    initialize(settings : dict)
+        Replaces all of the settings (used by setup)
+
+    set_value(key : str, value : str)
+        Sets a top-level setting
+
+    groups() -> list
+        Names of all of the groups
+
+    group_projects(group : str) -> dict
+        Projects of given group
+
+    all_projects() -> dict
+        All of the groups with their projects
+
+    get_project(name : str, group : str) -> dict
+        A copy of given project's record
+
+    find_projects(name : str) -> list
+        Copies of the records of all projects with given name
+
+    search_projects(query : str, group : str = None, limit : int = 10) -> list
+        Copies of the records of the best fuzzy matches of given query
+
+    put_project(name : str, group : str, record : dict)
+        Adds or replaces a project
+
+    remove_project(name : str, group : str)
+        Removes a project
+
+    transaction()
+        Context manager for the changes that must be applied together
+
+    save() -> bool
+        Writes the changes to the journal if something has changed
+
+    compact()
+        Writes everything to the settings file and removes the journal
+    """
+
+    SETTINGS_FILE = "pm-settings.json"
+    LOCK_FILE = "pm-settings.lock"
+    SETTINGS_PART = "settings"  # The dirty part of top-level keys
+
+    # Optional settings and their values when they are not in the file
+    DEFAULTS = dict(settings_cache="on", registry_backend="json", github_api_url="https://api.github.com",
+                    git_default_branch="", git_template_dir="")
+    REGISTRY_BACKENDS = ["json", "sqlite", "sharded"]
+    INTERNAL_KEYS = ["projects", "scan_state"]  # Not listed as settings
+
+    JOURNAL_LIMIT = 1024 * 1024  # The journal is compacted into the settings file past this size
+
+    _instances = dict()
+
+    @classmethod
+    def get(cls, project_manager_home: str) -> "SettingsStore":
+        """
+        Returns the process-wide store of given home directory
+
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+        """
+
+        key = os.path.abspath(project_manager_home)
+        if key not in cls._instances:
+            cls._instances[key] = cls(project_manager_home)
+
+        return cls._instances[key]
+
+    def __init__(self, project_manager_home: str):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+        """
+
+        self.project_manager_home = project_manager_home
+        self._settings = None  # Groups that aren't decoded from the cache yet have None as their projects
+        self._cache = None
+        self._registry = None  # SqliteRegistry or ShardedRegistry if registry_backend isn't "json"
+        self._journal = SettingsJournal(project_manager_home)
+        self._lock = FileLock(f"{project_manager_home}/{self.LOCK_FILE}")
+        self._loaded_signature = None  # Signature of the file and the journal when they were read or written
+        self._replaces_file = False  # Set by initialize, the file on disk doesn't matter then
+        self._dirty = set()
+        self._pending = []  # Journal operations that aren't saved yet
+        self._needs_compaction = False  # Set when the changes can't be journaled
+        self._name_index = None  # project name -> groups that have it, built on first lookup
+        self._search_index = None  # Fuzzy search index, loaded on first search
+        self._changes = []  # (name, group, is_added) of the projects added or removed since the last save
+        self._name_changes = []  # The same, since the cache was compiled (for its name index)
+        self._table_rows = []  # (name, group, dir) of the shell table rows changed since the last save
+        self._index_signature = None  # Registry signature that the saved search index should describe
+        self._read_records = dict()  # (group, name) -> record as it was returned from a registry backend
+
+    @property
+    def path(self) -> str:
+        return f"{self.project_manager_home}/{self.SETTINGS_FILE}"
+
+    def exists(self) -> bool:
+        return self._settings is not None or os.path.exists(self.path)
+
+    @property
+    def settings(self) -> dict:
+        """
+        All of the settings, loaded on first access
+        """
+
+        if self._settings is None:
+            self.load()
+
+        return self._settings
+
+    def signature(self) -> tuple:
+        """
+        (mtime_ns, size) of the settings file, or None if it doesn't exist
+        """
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _file_signature(self) -> tuple:
+        """
+        Signature of the settings file and the journal (changes when another process saves)
+        """
+
+        signature = self.signature()
+        return signature + self._journal.signature() if signature is not None else None
+
+    def registry_signature(self) -> tuple:
+        """
+        Signature of everything the projects are read from (the settings file, the journal and the registry backend)
+        """
+
+        signature = self.signature()
+        if signature is not None:
+            signature = signature + self._journal.signature()
+        if self._registry is not None and signature is not None:
+            signature = signature + self._registry.signature()
+
+        return signature
+
+    @property
+    def is_dirty(self) -> bool:
+        return len(self._dirty) != 0
+
+    def load(self):
+        """
+        Reads the settings file and replays the journal on it
+
+        Raises OSError if the file cannot be read and ValueError if it isn't valid JSON.
+        """
+
+        self._loaded_signature = self._file_signature()
+        signature = self._loaded_signature[:2] if self._loaded_signature is not None else None
+        self._cache = SettingsCache.open(self.project_manager_home, signature) if signature is not None else None
+
+        if self._cache is not None:
+            self._settings = dict(self._cache.settings)
+            self._settings["projects"] = dict.fromkeys(self._cache.groups)
+        else:
+            with open(self.path, "r") as file:
+                self._settings = load(file)
+
+            if signature is not None and self.is_cache_enabled:
+                SettingsCache.write(self.project_manager_home, self._settings, signature)
+
+        self._dirty.clear()
+        self._pending = []
+        self._needs_compaction = False
+        self._replaces_file = False
+        self._name_index = None
+        self._search_index = None
+        self._changes = []
+        self._name_changes = []
+        self._table_rows = []
+        self._read_records = dict()
+
+        for operation in self._journal.read():
+            change = self._apply(operation)
+            if change is not None:
+                self._name_changes.append(change)
+
+        self._open_backend()
+        self._index_signature = self.registry_signature()
+
+    def refresh(self) -> bool:
+        """
+        Reloads the settings if another process has saved them since they were read
+
+        Unsaved changes are kept and applied on top of the reloaded settings.
+        Returns True if the settings (or the registry backend) were reloaded.
+        """
+
+        if not self._is_stale():
+            if self._registry is not None:
+                self._registry.refresh()
+
+            # The SQLite database changes under the store without a reload, so the search index
+            # is checked against the registry itself
+            signature = self.registry_signature()
+            if signature == self._index_signature:
+                return False
+
+            self._search_index = None  # Opened again (or rebuilt) for the changed registry
+            self._index_signature = signature
+            return True
+
+        if self.is_dirty:
+            self._rebase()
+        else:
+            self.load()
+        return True
+
+    def _apply(self, operation: dict) -> tuple:
+        """
+        Applies a journal operation to the loaded settings (without recording it)
+
+        A put with a "base" record (the record it was made from) is merged: only the
+        keys that differ from the base overwrite the current record, so changes made
+        to other keys by another process are kept.
+
+        Returns (name, group, is_added) if a project is added or removed.
+        """
+
+        kind = operation["op"]
+
+        if kind == "set":
+            self._settings[operation["key"]] = operation["value"]
+        elif kind == "group":
+            self._projects.setdefault(operation["group"], dict())
+        elif kind == "put":
+            projects = self._projects.setdefault(operation["group"], dict())
+            if projects is None:
+                projects = self._group(operation["group"])
+
+            name = operation["name"]
+            current = projects.get(name)
+            operation["record"] = SettingsJournal.merge(current, operation.get("base"), operation["record"])
+
+            projects[name] = operation["record"]
+            if current is None:
+                return (name, operation["group"], True)
+        elif kind == "remove":
+            projects = self._group(operation["group"])
+            if projects is not None and operation["name"] in projects:
+                del projects[operation["name"]]
+                return (operation["name"], operation["group"], False)
+
+        return None
+
+    def _rebase(self):
+        """
+        Reloads the settings changed by another process and applies the unsaved changes on top
+        """
+
+        pending = self._pending
+        dirty = self._dirty
+        needs_compaction = self._needs_compaction
+        read_records = self._read_records
+        table_rows = self._table_rows
+
+        self.load()
+        self._read_records = read_records
+        self._table_rows = table_rows
+
+        if self._registry is not None and any(operation["op"] != "set" for operation in pending):
+            # Another process has moved the projects to a registry backend, so the changes made
+            # to settings["projects"] go there (settings["projects"] isn't read anymore)
+            self._replay_in_registry(pending)
+            pending = [operation for operation in pending if operation["op"] == "set"]
+
+        for operation in pending:
+            change = self._apply(operation)
+            if change is not None:
+                self._changes.append(change)
+                self._name_changes.append(change)
+
+        self._pending = pending
+        self._dirty = dirty
+        self._needs_compaction = needs_compaction
+
+    def _replay_in_registry(self, operations: list):
+        """
+        Applies the registry operations of the journal to the registry backend, in one transaction
+        """
+
+        with self._registry.transaction():
+            for operation in operations:
+                if operation["op"] == "group":
+                    self.add_group(operation["group"])
+                elif operation["op"] == "put":
+                    if operation.get("base") is not None:
+                        self._read_records[(operation["group"], operation["name"])] = operation["base"]
+                    self.put_project(operation["name"], operation["group"], operation["record"])
+                elif operation["op"] == "remove":
+                    self.remove_project(operation["name"], operation["group"])
+
+    def _is_stale(self) -> bool:
+        return not self._replaces_file and self._settings is not None and self._file_signature() != self._loaded_signature
+
+    def _open_backend(self):
+        """
+        Opens the selected registry backend (importing settings["projects"] into it the first time)
+        """
+
+        if self._registry is not None:
+            self._registry.close()
+            self._registry = None
+
+        if self["registry_backend"] == "json":
+            return
+
+        projects = self.all_projects()  # Read before the registry is switched to the backend
+        self._registry = self._backend_class(self["registry_backend"])(self.project_manager_home)
+
+        if self._registry.is_empty() and len(projects) != 0:
+            with self._lock:
+                self._registry.migrate(projects)
+                self._settings["projects"] = dict()
+                self._dirty.add(self.SETTINGS_PART)
+                self._needs_compaction = True
+                self.save()
+
+    def _switch_backend(self, backend: str):
+        """
+        Moves the projects to the given backend
+        """
+
+        projects = self.all_projects()
+        if self._registry is not None:
+            self._registry.close()
+            self._registry = None
+
+        self._settings["registry_backend"] = backend
+        self._settings["projects"] = dict()
+        self._cache = None
+        self._dirty.add(self.SETTINGS_PART)
+        self._needs_compaction = True
+
+        if backend != "json":
+            self._registry = self._backend_class(backend)(self.project_manager_home)
+            self._registry.clear()
+            self._registry.migrate(projects)
+        else:
+            self._settings["projects"] = projects
+            self._dirty.update(projects.keys())
+
+    @staticmethod
+    def _backend_class(backend: str):
+        if backend == "sharded":
+            from src.sharded_registry import ShardedRegistry
+
+            return ShardedRegistry
+
+        from src.sqlite_registry import SqliteRegistry
+
+        return SqliteRegistry
+
+    def initialize(self, settings: dict):
+        """
+        Replaces all of the settings (used by setup)
+
+        Parameters
+        ----------
+        settings : dict
+            New settings with the projects in it
+        """
+
+        self._settings = settings
+        self._cache = None
+        if self._registry is not None:
+            self._registry.close()
+            self._registry = None
+        self._dirty = {self.SETTINGS_PART, *settings["projects"].keys()}
+        self._pending = []
+        self._needs_compaction = True
+        self._replaces_file = True
+        self._name_index = None
+        self._search_index = None
+        self._changes = []
+        self._name_changes = []
+        self._table_rows = []
+        self._remove_search_index()
+
+    @property
+    def is_cache_enabled(self) -> bool:
+        return self["settings_cache"] != "off"
+
+    def __getitem__(self, key: str):
+        if key not in self.settings and key in self.DEFAULTS:
+            return self.DEFAULTS[key]
+
+        return self.settings[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.settings or key in self.DEFAULTS
+
+    def keys(self) -> list:
+        """
+        Top-level setting keys (without the internal ones, with the optional ones)
+        """
+
+        keys = [key for key in self.settings if key not in self.INTERNAL_KEYS]
+        return keys + [key for key in self.DEFAULTS if key not in keys]
+
+    def set_value(self, key: str, value: str):
+        """
+        Sets a top-level setting
+
+        Parameters
+        ----------
+        key : str
+            Setting key
+
+        value : str
+            New value of the setting
+        """
+
+        if key in self and self[key] == value:
+            return
+
+        if key == "registry_backend":
+            # Moving the registry can't be merged later, so it's done and saved under the lock
+            with self._lock:
+                if self._is_stale():
+                    self._rebase()
+                self._switch_backend(value)
+                self.save()
+        else:
+            if key == "settings_cache":
+                # The cache is opened before the journal is replayed, so the value must be in the file
+                self._needs_compaction = True
+                if value == "off":
+                    SettingsCache.remove(self.project_manager_home)
+
+            self.settings[key] = value
+            self._dirty.add(self.SETTINGS_PART)
+            self._pending.append(dict(op="set", key=key, value=value))
+
+    @property
+    def _loaded_registry(self):
+        """
+        The registry backend (None with the JSON backend), after loading the settings that select it
+        """
+
+        self.settings
+        return self._registry
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups the registry changes that must be applied together
+
+        With the SQLite backend they are committed in one database transaction and
+        with the sharded backend the changed groups are written together; the JSON
+        backend writes all of the changes on save() anyway.
+        """
+
+        if self._loaded_registry is None:
+            yield
+            return
+
+        with self._registry.transaction():
+            yield
+
+    # ANCHOR: Projects registry
+
+    @property
+    def _projects(self) -> dict:
+        return self.settings["projects"]
+
+    def _group(self, group: str) -> dict:
+        """
+        Projects of given group, decoded from the cache if needed (None if the group doesn't exist)
+        """
+
+        projects = self._projects.get(group)
+        if projects is None and group in self._projects:
+            projects = self._projects[group] = self._cache.group_projects(group)
+
+        return projects
+
+    def all_projects(self) -> dict:
+        """
+        All of the groups with their projects (decodes the groups that aren't decoded yet)
+
+        Like group_projects, the returned dicts must not be modified.
+        """
+
+        if self._loaded_registry is not None:
+            return self._registry.all_projects()
+
+        for group in self._projects:
+            self._group(group)
+
+        return self._projects
+
+    def groups(self) -> list:
+        """
+        Names of all of the groups
+        """
+
+        if self._loaded_registry is not None:
+            return self._registry.groups()
+
+        return list(self._projects)
+
+    def has_group(self, group: str) -> bool:
+        if self._loaded_registry is not None:
+            return self._registry.has_group(group)
+
+        return group in self._projects
+
+    def group_projects(self, group: str) -> dict:
+        """
+        Projects of given group as name -> record (don't modify the records)
+
+        Parameters
+        ----------
+        group : str
+            Group name
+        """
+
+        if self._loaded_registry is not None:
+            return self._registry.group_projects(group)
+
+        projects = self._group(group)
+        return projects if projects is not None else dict()
+
+    def project_count(self, group: str = None) -> int:
+        """
+        Number of projects in given group, or in all of the groups if group is None
+        """
+
+        if self._loaded_registry is not None:
+            return self._registry.project_count(group)
+
+        if group is not None:
+            if self._projects.get(group) is None and group in self._projects:
+                return self._cache.group_count(group)  # Doesn't decode the group
+            return len(self.group_projects(group))
+
+        return sum(self.project_count(group) for group in self._projects)
+
+    def add_group(self, group: str):
+        if self._loaded_registry is not None:
+            self._registry.add_group(group)
+            return
+
+        if group not in self._projects:
+            self._projects[group] = dict()
+            self._dirty.add(group)
+            self._pending.append(dict(op="group", group=group))
+
+    def get_project(self, name: str, group: str) -> dict:
+        """
+        A copy of given project's record with its name and group, or None if it doesn't exist
+
+        Parameters
+        ----------
+        name : str
+            Project name
+
+        group : str
+            Project group
+        """
+
+        if self._loaded_registry is not None:
+            record = self._registry.get_project(name, group)
+            if record is not None:
+                self._read_records[(group, name)] = record
+        else:
+            record = self.group_projects(group).get(name)
+
+        if record is None:
+            return None
+
+        return dict(record, name=name, group=group)
+
+    def find_projects(self, name: str) -> list:
+        """
+        Copies of the records of all projects with given name (in group order)
+
+        Uses the name index, so the cost doesn't depend on the number of groups.
+
+        Parameters
+        ----------
+        name : str
+            Project name
+        """
+
+        if self._loaded_registry is not None:
+            projects = self._registry.find_projects(name)
+            self._read_records.update(((group, name), record) for group, record in projects)
+            return [dict(record, name=name, group=group) for group, record in projects]
+
+        if self._name_index is None and self._cache is not None:
+            # The cache has an on-disk name index; only the changes since loading are applied to it
+            groups = self._cache.find_name(name)
+            for changed_name, group, is_added in self._name_changes:
+                if changed_name == name:
+                    groups = [g for g in groups if g != group] + ([group] if is_added else [])
+
+            projects = [self.get_project(name, group) for group in groups]
+            return [project for project in projects if project is not None]
+
+        if self._name_index is None:
+            self._build_name_index()
+
+        return [self.get_project(name, group) for group in self._name_index.get(name, [])]
+
+    def _build_name_index(self):
+        name_index = dict()
+        for group, projects in self.all_projects().items():
+            for name in projects:
+                name_index.setdefault(name, []).append(group)
+
+        self._name_index = name_index
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """
+        Fuzzy search index of the projects
+
+        The saved index is used if it matches the settings file, otherwise it's rebuilt
+        (and saved if there aren't unsaved changes).
+        """
+
+        if self._search_index is None:
+            self.settings
+            signature = self.registry_signature()
+
+            if not self.is_dirty and signature is not None and signature == self._index_signature:
+                self._search_index = SearchIndex.open(self.project_manager_home, signature)
+
+            if self._search_index is None:
+                self._search_index = SearchIndex.build(self.project_manager_home, self.all_projects(), signature)
+                if not self.is_dirty:
+                    self._search_index.save()
+
+        return self._search_index
+
+    def search_projects(self, query: str, group: str = None, limit: int = 10) -> list:
+        """
+        Copies of the records of the best matches of given query, best first
+
+        Parameters
+        ----------
+        query : str
+            Project name, a prefix of it or a misspelled name
+
+        group : str
+            Only search in this group (optional)
+
+        limit : int
+            Maximum number of results
+        """
+
+        projects = []
+        for _, name, name_group in self.search_index.search(query, group, limit):
+            project = self.get_project(name, name_group)
+            if project is not None:
+                projects.append(project)
+
+        return projects
+
+    def _remove_search_index(self):
+        SearchIndex.delete(self.project_manager_home)
+
+    def put_project(self, name: str, group: str, record: dict):
+        """
+        Adds or replaces a project
+
+        Parameters
+        ----------
+        name : str
+            Project name
+
+        group : str
+            Project group (created if it doesn't exist)
+
+        record : dict
+            Project's settings (name and group keys are not stored)
+        """
+
+        record = {key: value for key, value in record.items() if key not in ("name", "group")}
+
+        if self._loaded_registry is not None:
+            # The record read by this process is the base, so the keys that another process has
+            # changed since (the backend's current record) are kept
+            base = self._read_records.pop((group, name), None)
+            is_new = self._registry.get_project(name, group) is None
+            self._registry.put_project(name, group, record, base)
+        else:
+            self.add_group(group)
+            base = self._group(group).get(name)
+            is_new = base is None
+            self._group(group)[name] = record
+            self._pending.append(dict(op="put", group=group, name=name, record=record, base=base))
+
+        if is_new:
+            if self._name_index is not None:
+                self._name_index.setdefault(name, []).append(group)
+            if self._search_index is not None:
+                self._search_index.add(name, group)
+            self._changes.append((name, group, True))
+            self._name_changes.append((name, group, True))
+        if base is None or base.get("dir") != record.get("dir"):
+            self._table_rows.append((name, group, record.get("dir", "")))
+
+        self._dirty.add(group)
+
+    def remove_project(self, name: str, group: str):
+        """
+        Removes a project (its group is kept)
+
+        Parameters
+        ----------
+        name : str
+            Project name
+
+        group : str
+            Project group
+        """
+
+        if self.get_project(name, group) is None:
+            return
+
+        if self._loaded_registry is not None:
+            self._registry.remove_project(name, group)
+        else:
+            del self._group(group)[name]
+            self._pending.append(dict(op="remove", group=group, name=name))
+        self._dirty.add(group)
+
+        if self._name_index is not None:
+            self._name_index[name].remove(group)
+            if len(self._name_index[name]) == 0:
+                del self._name_index[name]
+        if self._search_index is not None:
+            self._search_index.remove(name, group)
+        self._changes.append((name, group, False))
+        self._name_changes.append((name, group, False))
+        self._table_rows.append((name, group, ""))
+
+    @traced("settings.save")
+    def save(self) -> bool:
+        """
+        Writes the changes to the journal if something has changed
+
+        The settings file is rewritten (compacted) instead if it doesn't exist yet,
+        if the changes can't be journaled (setup, switching the registry backend)
+        or if the journal has grown past JOURNAL_LIMIT.
+
+        Returns True if something has changed.
+        """
+
+        if not self.is_dirty:
+            return False
+
+        with self._lock:
+            if self._is_stale():
+                self._rebase()
+
+            replaces_projects = self._needs_compaction  # Setup and switching the backend aren't tracked by rows
+
+            if self._needs_compaction or not os.path.exists(self.path):
+                self._compact()
+            elif len(self._pending) != 0:
+                self._journal.append([{key: value for key, value in operation.items() if key != "base"}
+                                      for operation in self._pending])
+                if self._journal.size() > self.JOURNAL_LIMIT:
+                    self._compact()
+
+            self._pending = []
+            self._dirty.clear()
+            self._replaces_file = False
+            self._loaded_signature = self._file_signature()
+            self._update_search_index()
+
+            self._update_shell_table(replaces_projects)
+
+        return True
+
+    @traced("settings.compact")
+    def compact(self):
+        """
+        Writes everything to the settings file and removes the journal
+
+        The file is written to a temporary file first and then renamed, so an
+        interrupted write never leaves a broken settings file behind.
+        """
+
+        with self._lock:
+            if self._is_stale():
+                self._rebase()
+
+            self._compact()
+            self._dirty.clear()
+            self._replaces_file = False
+            self._loaded_signature = self._file_signature()
+            self._update_search_index()
+
+    def _compact(self):
+        if self._registry is None:
+            self.all_projects()
+
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as file:
+            dump(self.settings, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+        self._journal.remove()
+        self._pending = []
+        self._needs_compaction = False
+
+        if self.is_cache_enabled:
+            SettingsCache.write(self.project_manager_home, self._settings, self.signature())
+        else:
+            SettingsCache.remove(self.project_manager_home)
+        self._cache = None  # Everything is decoded now
+        self._name_changes = []
+
+    def _update_shell_table(self, replaces_projects: bool):
+        """
+        Brings the project table of the shell integration up to date, if it's installed (pm shell-init)
+
+        Only the changed rows are appended; the whole table is written again if all of the
+        projects may have changed or if the appended rows have grown too large.
+        """
+
+        rows = self._table_rows
+        self._table_rows = []
+        if (len(rows) == 0 and not replaces_projects) or not ShellIntegration.is_installed(self.project_manager_home):
+            return
+
+        shell_integration = ShellIntegration(self.project_manager_home)
+        try:
+            if replaces_projects or shell_integration.append_rows(rows):
+                shell_integration.write_table(self.all_projects())
+        except OSError:
+            pass  # Only an optimization for the shell, the settings are saved anyway
+
+    def _update_search_index(self):
+        """
+        Records the changes since the last save for the saved search index
+
+        The index isn't loaded or rewritten here (that would make every save as slow as
+        the whole registry); the changes are appended to its delta file and applied by
+        the next search that opens it (see SearchIndex.append_changes).
+        """
+
+        old_signature = self._index_signature
+        self._index_signature = self.registry_signature()
+
+        if self._search_index is not None:
+            self._search_index.signature = self._index_signature  # Has the changes already
+        if old_signature is not None and self._index_signature is not None:
+            SearchIndex.append_changes(self.project_manager_home, old_signature, self._index_signature,
+                                       self._changes)
+        self._changes = []
@@ -0,0 +1,403 @@
+import os
+import threading
+from json import dumps, load
+from contextlib import contextmanager
+from src.file_lock import FileLock
+from src.settings_journal import SettingsJournal
+
+
+class ShardedRegistry(object):
+    """
+    Projects registry stored in one file per group (pm-registry/)
+
+    Used instead of settings["projects"] when the registry_backend setting is
+    "sharded". pm-registry/groups.json is a small manifest of the groups (in
+    order, with the file, the project count and the generation of each one),
+    and every group's projects are in a file of their own that is read on first
+    access. A command about one group reads and writes only that group's file
+    and the manifest, so its cost doesn't grow with the rest of the registry.
+
+    Changes are written when the outermost transaction ends (or at once outside
+    of a transaction): the changed groups' files are written to temporary files
+    and renamed, then the manifest is written with a new generation. Other pm
+    processes can change the registry at the same time. The writes take
+    pm-registry/lock, and a group that another process has written since it was
+    read is read again and this process' changes are applied on top (merging
+    the keys of projects that both processes have changed). Like the settings
+    file, the registry is read as it was when it was opened; refresh() notices
+    the writes of other processes through the manifest and forgets only the
+    groups whose generation has changed.
+
+    Looking a name up in every group (find_projects) still reads every group.
+
+    Methods
+    -------
+    refresh() -> bool
+        Notices the changes that other processes have written
+
+    transaction()
+        Context manager that writes the changes in it at once
+
+    migrate(projects : dict)
+        Imports a group -> {name: record} dict
+
+    groups() -> list
+        Names of all of the groups
+
+    group_projects(group : str) -> dict
+        Projects of given group
+
+    find_projects(name : str) -> list
+        (group, record) of all projects with given name
+
+    put_project(name : str, group : str, record : dict, base : dict = None)
+        Adds or replaces a project (merged into the current record if base is given)
+
+    remove_project(name : str, group : str)
+        Removes a project
+    """
+
+    REGISTRY_DIR = "pm-registry"
+    MANIFEST_FILE = "groups.json"
+    LOCK_FILE = "lock"
+    MANIFEST_VERSION = 1
+    MAX_FILE_NAME = 100  # Characters of a group's file name taken from the group name
+
+    def __init__(self, project_manager_home: str):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+        """
+
+        self.project_manager_home = project_manager_home
+        self.path = self.path_of(project_manager_home)
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = FileLock(f"{self.path}/{self.LOCK_FILE}")
+        self._thread_lock = threading.RLock()  # Groups may be read from many threads (pm create --from)
+        self._manifest = dict()  # group -> [file, count, generation], in group order
+        self._generation = 0
+        self._manifest_signature = None
+        self._shards = dict()  # group -> {name: record} of the groups that have been read
+        self._shard_generations = dict()  # group -> generation of its file when it was read
+        self._pending = dict()  # group -> operations that aren't written yet, in group order
+        self._transaction_depth = 0
+
+        self._read_manifest()
+
+    @classmethod
+    def path_of(cls, project_manager_home: str) -> str:
+        return f"{project_manager_home}/{cls.REGISTRY_DIR}"
+
+    @property
+    def manifest_path(self) -> str:
+        return f"{self.path}/{self.MANIFEST_FILE}"
+
+    def signature(self) -> tuple:
+        """
+        (mtime_ns, size, generation) of the manifest when it was read or written (changes on every write)
+        """
+
+        return (*(self._manifest_signature or ()), self._generation)
+
+    # ANCHOR: Reading
+
+    def _read_manifest(self):
+        try:
+            stat = os.stat(self.manifest_path)
+            with open(self.manifest_path, "r") as file:
+                manifest = load(file)
+        except FileNotFoundError:
+            self._manifest = dict()
+            self._generation = 0
+            self._manifest_signature = None
+            return
+
+        if manifest.get("version") != self.MANIFEST_VERSION:
+            raise ValueError(f"Unknown registry version in {self.manifest_path}: {manifest.get('version')}")
+
+        self._manifest = {group: [file_name, count, generation] for group, file_name, count, generation in manifest["groups"]}
+        self._generation = manifest["generation"]
+        self._manifest_signature = (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self) -> bool:
+        """
+        Reads the manifest again if another process has written the registry, forgetting the changed groups
+
+        Returns True if the registry has changed.
+        """
+
+        with self._thread_lock:
+            if self._transaction_depth != 0 or len(self._pending) != 0:
+                return False  # The changes are applied on top of the other process' when they are written
+
+            try:
+                stat = os.stat(self.manifest_path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature = None
+
+            if signature == self._manifest_signature:
+                return False
+
+            self._read_manifest()
+            for group in list(self._shards):
+                if group not in self._manifest or self._manifest[group][2] != self._shard_generations[group]:
+                    del self._shards[group]
+                    del self._shard_generations[group]
+
+            return True
+
+    def _read_shard(self, group: str) -> dict:
+        try:
+            with open(f"{self.path}/{self._manifest[group][0]}", "r") as file:
+                return load(file)
+        except FileNotFoundError:
+            return dict()  # A group without projects yet
+
+    def _shard(self, group: str) -> dict:
+        """
+        Projects of given group, read on first access (None if the group doesn't exist)
+        """
+
+        with self._thread_lock:
+            projects = self._shards.get(group)
+            if projects is None and group in self._manifest:
+                projects = self._shards[group] = self._read_shard(group)
+                self._shard_generations[group] = self._manifest[group][2]
+
+            return projects
+
+    def is_empty(self) -> bool:
+        return len(self._manifest) == 0
+
+    def groups(self) -> list:
+        return list(self._manifest)
+
+    def has_group(self, group: str) -> bool:
+        return group in self._manifest
+
+    def group_projects(self, group: str) -> dict:
+        projects = self._shard(group)
+        return projects if projects is not None else dict()
+
+    def all_projects(self) -> dict:
+        """
+        Group -> {project name: record} of the whole registry (reads every group)
+        """
+
+        return {group: self._shard(group) for group in list(self._manifest)}
+
+    def project_count(self, group: str = None) -> int:
+        if group is None:
+            return sum(self.project_count(group) for group in self._manifest)
+
+        if group in self._shards:
+            return len(self._shards[group])
+        return self._manifest[group][1] if group in self._manifest else 0  # Doesn't read the group
+
+    def get_project(self, name: str, group: str) -> dict:
+        return self.group_projects(group).get(name)
+
+    def find_projects(self, name: str) -> list:
+        projects = []
+        for group in self.groups():
+            record = self._shard(group).get(name)
+            if record is not None:
+                projects.append((group, record))
+
+        return projects
+
+    # ANCHOR: Writing
+
+    @contextmanager
+    def transaction(self):
+        """
+        Writes the changes made in the block at once, or none of them if it raises
+        """
+
+        with self._thread_lock:
+            self._transaction_depth += 1
+            try:
+                yield
+            except BaseException:
+                if self._transaction_depth == 1:
+                    self._discard()
+                raise
+            else:
+                if self._transaction_depth == 1:
+                    self._write()
+            finally:
+                self._transaction_depth -= 1
+
+    def add_group(self, group: str):
+        with self.transaction():
+            if group not in self._manifest:
+                self._manifest[group] = [None, 0, None]  # The file is named when it's written
+                self._shards[group] = dict()
+                self._shard_generations[group] = None
+                self._pending.setdefault(group, [])
+
+    def put_project(self, name: str, group: str, record: dict, base: dict = None):
+        with self.transaction():
+            self.add_group(group)
+            projects = self._shard(group)
+            current = projects.get(name)
+            if base is not None:
+                record = SettingsJournal.merge(current, base, record)
+
+            projects[name] = record
+            self._pending.setdefault(group, []).append(dict(op="put", name=name, record=record, base=current))
+
+    def remove_project(self, name: str, group: str):
+        with self.transaction():
+            projects = self._shard(group)
+            if projects is not None and name in projects:
+                del projects[name]
+                self._pending.setdefault(group, []).append(dict(op="remove", name=name))
+
+    def migrate(self, projects: dict):
+        """
+        Imports the projects in one transaction
+
+        Parameters
+        ----------
+        projects : dict
+            Group -> {project name: record}, as in settings["projects"]
+        """
+
+        with self.transaction():
+            for group, group_projects in projects.items():
+                self.add_group(group)
+                for name, record in group_projects.items():
+                    self.put_project(name, group, record)
+
+    def clear(self):
+        """
+        Removes every group
+        """
+
+        with self._lock:
+            self._discard()
+            for file_name in os.listdir(self.path):
+                if file_name != self.LOCK_FILE:
+                    os.remove(f"{self.path}/{file_name}")
+
+            self._manifest = dict()
+            self._generation = 0
+            self._manifest_signature = None
+
+    def close(self):
+        self._shards = dict()
+        self._shard_generations = dict()
+
+    def _discard(self):
+        """
+        Forgets the changes that aren't written (the groups are read again from their files)
+        """
+
+        self._pending = dict()
+        self._shards = dict()
+        self._shard_generations = dict()
+        self._read_manifest()
+
+    def _write(self):
+        """
+        Writes the changed groups and the manifest under the lock
+        """
+
+        if len(self._pending) == 0:
+            return
+
+        with self._lock:
+            try:
+                self._write_pending()
+            except BaseException:
+                self._discard()  # Nothing that wasn't written is kept
+                raise
+
+    def _write_pending(self):
+        pending = self._pending
+        self._pending = dict()
+
+        local_manifest = self._manifest
+        self._read_manifest()  # Includes the groups written by other processes since it was read
+        generation = self._generation + 1
+
+        for group, operations in pending.items():
+            entry = self._manifest.get(group)
+            if entry is None:  # Added by this process
+                entry = self._manifest[group] = [self._file_name(group), 0, generation]
+                projects = dict()
+                for operation in operations:
+                    self._apply(projects, operation)
+            elif entry[2] != self._shard_generations.get(group):
+                projects = self._read_shard(group)  # Written by another process, apply the changes on top
+                for operation in operations:
+                    self._apply(projects, operation)
+            else:
+                projects = self._shards[group]
+
+            self._write_json(f"{self.path}/{entry[0]}", projects)
+            entry[1] = len(projects)
+            entry[2] = generation
+            self._shards[group] = projects
+            self._shard_generations[group] = generation
+
+        for group in local_manifest.keys() - self._manifest.keys():
+            self._shards.pop(group, None)  # Group that another process has replaced
+            self._shard_generations.pop(group, None)
+
+        self._generation = generation
+        self._write_json(self.manifest_path, dict(
+            version=self.MANIFEST_VERSION, generation=generation,
+            groups=[[group, *entry] for group, entry in self._manifest.items()]))
+
+        stat = os.stat(self.manifest_path)
+        self._manifest_signature = (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _apply(projects: dict, operation: dict):
+        """
+        Applies an operation to a group's projects, merging a put into a record that another process has changed
+        """
+
+        name = operation["name"]
+        if operation["op"] == "remove":
+            projects.pop(name, None)
+            return
+
+        projects[name] = SettingsJournal.merge(projects.get(name), operation["base"], operation["record"])
+
+    def _file_name(self, group: str) -> str:
+        """
+        Name of a new group's file (the group name, escaped, unique even on case-insensitive file systems)
+        """
+
+        from urllib.parse import quote
+
+        stem = quote(group, safe=" -_.")[:self.MAX_FILE_NAME]
+        if stem.startswith("."):
+            stem = "%2E" + stem[1:]
+
+        taken = {entry[0].lower() for entry in self._manifest.values() if entry[0] is not None}
+        taken.update(name.lower() for name in (self.MANIFEST_FILE, self.LOCK_FILE))
+
+        file_name = f"{stem}.json"
+        number = 1
+        while file_name.lower() in taken:
+            number += 1
+            file_name = f"{stem}-{number}.json"
+
+        return file_name
+
+    @staticmethod
+    def _write_json(path: str, data):
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(dumps(data))  # In one piece by the C encoder (json.dump and indent use the Python one)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
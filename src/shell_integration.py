@@ -0,0 +1,227 @@
+import os
+
+
+class ShellIntegration(object):
+    """
+    Shell integration for bash and zsh that works without starting Project Manager
+
+    pm shell-init writes two files to the home directory of Project Manager:
+
+    * pm-shell.sh, which defines pcd (cd into a project) and the tab completion
+      of pm and pcd, and is sourced from ~/.bashrc or ~/.zshrc,
+    * pm-projects.tsv, a table of the projects (name, group and directory per
+      line) that the shell functions read with awk.
+
+    As long as the table exists (so only after pm shell-init), SettingsStore
+    appends the rows that a save changes to pm-projects.changes.tsv instead of
+    writing the whole table again. The shell functions read both files and the
+    last row of a project wins; a row without a directory removes the project.
+    The table is written again (and the changes file removed) when the changes
+    file grows past CHANGES_LIMIT, or when all of the projects are replaced.
+
+    Attributes
+    ----------
+    project_manager_home : str
+        The home directory of Project Manager
+
+    Methods
+    -------
+    is_installed(project_manager_home : str) -> bool
+        Checks if pm shell-init has been run
+
+    write_table(projects : dict)
+        Writes the table of the projects
+
+    append_rows(rows : list) -> bool
+        Appends changed rows, returns True if the table should be written again
+
+    write_script(actions : list)
+        Writes the shell functions
+    """
+
+    SCRIPT_FILE = "pm-shell.sh"
+    TABLE_FILE = "pm-projects.tsv"
+    CHANGES_FILE = "pm-projects.changes.tsv"
+    CHANGES_LIMIT = 1024 * 1024
+
+    SCRIPT = r"""# Generated by Project Manager (pm shell-init), don't edit it by hand.
+# Load it from ~/.bashrc or ~/.zshrc with: source {script_path}
+
+_PM_TABLE={table_path}
+_PM_CHANGES={changes_path}
+_PM_ACTIONS={actions}
+
+# The rows of the table followed by the changed rows (the last row of a project wins)
+_pm_rows() {{
+    cat "$_PM_TABLE" "$_PM_CHANGES" 2>/dev/null
+}}
+
+# cd into a project: pcd <project> [group]
+pcd() {{
+    if [ $# -eq 0 ]; then
+        echo "usage: pcd <project> [group]" >&2
+        return 1
+    fi
+
+    local dir
+    dir=$(_pm_rows | awk -F '\t' -v name="$1" -v group="$2" '
+        $1 == name && (group == "" || $2 == group) {{ if ($3 == "") delete dirs[$2]; else dirs[$2] = $3 }}
+        END {{
+            for (g in dirs) {{ count++; dir = dirs[g]; groups = groups " " g }}
+            if (count == 1) print dir
+            else if (count > 1) {{ print "pcd: " name " is in more than one group:" groups > "/dev/stderr"; exit 2 }}
+            else {{ print "pcd: there isn'\''t a project called " name > "/dev/stderr"; exit 1 }}
+        }}') || return $?
+
+    cd "$dir"
+}}
+
+# Prints the names (column 1) or the groups (column 2) that start with $2
+_pm_table_words() {{
+    _pm_rows | awk -F '\t' -v column="$1" -v prefix="$2" '
+        {{ if ($3 == "") delete words[$1 FS $2]; else words[$1 FS $2] = $column }}
+        END {{ for (key in words) if (index(words[key], prefix) == 1 && !seen[words[key]]++) print words[key] }}'
+}}
+
+_pm_complete() {{
+    local current="${{COMP_WORDS[COMP_CWORD]}}"
+    local previous="${{COMP_WORDS[COMP_CWORD-1]}}"
+    local IFS=$'\n'
+
+    case "$previous" in
+        -n|--name) COMPREPLY=($(_pm_table_words 1 "$current")) ;;
+        -g|--group) COMPREPLY=($(_pm_table_words 2 "$current")) ;;
+        *)
+            if [ "$COMP_CWORD" -eq 1 ]; then
+                COMPREPLY=($(IFS=" "; compgen -W "$_PM_ACTIONS" -- "$current"))
+            else
+                COMPREPLY=()
+            fi
+            ;;
+    esac
+}}
+
+_pcd_complete() {{
+    local IFS=$'\n'
+
+    if [ "$COMP_CWORD" -eq 1 ]; then
+        COMPREPLY=($(_pm_table_words 1 "${{COMP_WORDS[1]}}"))
+    elif [ "$COMP_CWORD" -eq 2 ]; then
+        COMPREPLY=($(_pm_rows | awk -F '\t' -v name="${{COMP_WORDS[1]}}" -v prefix="${{COMP_WORDS[2]}}" '
+            $1 == name {{ if ($3 == "") delete groups[$2]; else groups[$2] = 1 }}
+            END {{ for (group in groups) if (index(group, prefix) == 1) print group }}'))
+    else
+        COMPREPLY=()
+    fi
+}}
+
+if [ -n "$ZSH_VERSION" ]; then
+    autoload -U +X bashcompinit && bashcompinit
+fi
+
+complete -F _pm_complete pm
+complete -F _pcd_complete pcd
+"""
+
+    def __init__(self, project_manager_home: str):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+        """
+
+        self.project_manager_home = project_manager_home
+
+    @property
+    def script_path(self) -> str:
+        return f"{self.project_manager_home}/{self.SCRIPT_FILE}"
+
+    @property
+    def table_path(self) -> str:
+        return f"{self.project_manager_home}/{self.TABLE_FILE}"
+
+    @property
+    def changes_path(self) -> str:
+        return f"{self.project_manager_home}/{self.CHANGES_FILE}"
+
+    @classmethod
+    def is_installed(cls, project_manager_home: str) -> bool:
+        return os.path.exists(f"{project_manager_home}/{cls.TABLE_FILE}")
+
+    def write_table(self, projects: dict):
+        """
+        Writes the table of the projects (to a temporary file that is renamed, so a
+        shell never reads a half-written table) and removes the changed rows
+
+        Projects without a directory are left out.
+
+        Parameters
+        ----------
+        projects : dict
+            Group -> {project name: record}, as in settings["projects"]
+        """
+
+        lines = []
+        for group, group_projects in projects.items():
+            for name, record in group_projects.items():
+                row = (name, group, record.get("dir", ""))
+                if row[2] == "" or any("\t" in value or "\n" in value for value in row):
+                    continue  # Cannot be represented in the table
+                lines.append("\t".join(row) + "\n")
+
+        temporary_path = f"{self.table_path}.{os.getpid()}.tmp"  # pm shell-init doesn't take the settings lock
+        with open(temporary_path, "w") as file:
+            file.write("".join(lines))
+        os.replace(temporary_path, self.table_path)
+
+        try:
+            os.remove(self.changes_path)  # Included in the table now
+        except FileNotFoundError:
+            pass
+
+    def append_rows(self, rows: list) -> bool:
+        """
+        Appends changed rows of the table, so a save writes as much as it has changed
+
+        Parameters
+        ----------
+        rows : list
+            (name, group, directory) of the changed projects, with "" as the directory of removed ones
+
+        Returns
+        -------
+        bool
+            True if the changes have grown past CHANGES_LIMIT and the table should be written again
+        """
+
+        lines = []
+        for name, group, directory in rows:
+            if any("\t" in value or "\n" in value for value in (name, group)):
+                continue  # Never in the table
+            if "\t" in directory or "\n" in directory:
+                directory = ""  # Left out of the table, like write_table does
+            lines.append(f"{name}\t{group}\t{directory}\n")
+
+        with open(self.changes_path, "a") as file:
+            file.write("".join(lines))
+            size = file.tell()
+
+        return size > self.CHANGES_LIMIT
+
+    def write_script(self, actions: list):
+        """
+        Writes the shell functions
+
+        Parameters
+        ----------
+        actions : list
+            Actions of pm (completed as its first argument)
+        """
+
+        from shlex import quote
+
+        script = self.SCRIPT.format(script_path=quote(self.script_path), table_path=quote(self.table_path),
+                                    changes_path=quote(self.changes_path), actions=quote(" ".join(actions)))
+        with open(self.script_path, "w") as file:
+            file.write(script)
@@ -0,0 +1,202 @@
+import os
+import sqlite3
+from json import dumps, loads
+from contextlib import contextmanager
+from src.settings_journal import SettingsJournal
+
+
+class SqliteRegistry(object):
+    """
+    Projects registry stored in an SQLite database (pm-registry.sqlite3)
+
+    Used instead of settings["projects"] when the registry_backend setting is
+    "sqlite". Every change touches only its own rows, and lookups by name or
+    group use indexes instead of loading the whole registry.
+
+    Methods
+    -------
+    transaction()
+        Context manager that commits the changes in it at once
+
+    migrate(projects : dict)
+        Imports a group -> {name: record} dict
+
+    groups() -> list
+        Names of all of the groups
+
+    group_projects(group : str) -> dict
+        Projects of given group
+
+    find_projects(name : str) -> list
+        (group, record) of all projects with given name
+
+    put_project(name : str, group : str, record : dict, base : dict = None)
+        Adds or replaces a project (merged into the current record if base is given)
+
+    remove_project(name : str, group : str)
+        Removes a project
+    """
+
+    DATABASE_FILE = "pm-registry.sqlite3"
+    LOCK_TIMEOUT = 30
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS groups (
+        name TEXT PRIMARY KEY,
+        position INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS projects (
+        group_name TEXT NOT NULL REFERENCES groups(name),
+        name TEXT NOT NULL,
+        record TEXT NOT NULL,
+        PRIMARY KEY (group_name, name)
+    );
+    CREATE INDEX IF NOT EXISTS projects_by_name ON projects(name);
+    """
+
+    def __init__(self, project_manager_home: str):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+        """
+
+        self.project_manager_home = project_manager_home
+        self.path = self.path_of(project_manager_home)
+
+        # Autocommit mode; transaction() groups the statements that belong together.
+        # Other pm processes may hold the write lock for a moment, so wait for it.
+        self.connection = sqlite3.connect(self.path, isolation_level=None, timeout=self.LOCK_TIMEOUT)
+        self.connection.executescript(self.SCHEMA)
+        self._transaction_depth = 0
+
+    @classmethod
+    def path_of(cls, project_manager_home: str) -> str:
+        return f"{project_manager_home}/{cls.DATABASE_FILE}"
+
+    def signature(self) -> tuple:
+        """
+        (mtime_ns, size) of the database file
+        """
+
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Commits the changes made in the block at once, or none of them if it raises
+        """
+
+        if self._transaction_depth != 0:  # Joins the outer transaction
+            self._transaction_depth += 1
+            try:
+                yield
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        self._transaction_depth = 1
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        else:
+            self.connection.execute("COMMIT")
+        finally:
+            self._transaction_depth = 0
+
+    def refresh(self) -> bool:
+        """
+        Nothing to do, the queries always see the changes of other processes
+        """
+
+        return False
+
+    def is_empty(self) -> bool:
+        return self.connection.execute("SELECT 1 FROM groups LIMIT 1").fetchone() is None
+
+    def clear(self):
+        with self.transaction():
+            self.connection.execute("DELETE FROM projects")
+            self.connection.execute("DELETE FROM groups")
+
+    def close(self):
+        self.connection.close()
+
+    def migrate(self, projects: dict):
+        """
+        Imports the projects in one transaction
+
+        Parameters
+        ----------
+        projects : dict
+            Group -> {project name: record}, as in settings["projects"]
+        """
+
+        with self.transaction():
+            for group, group_projects in projects.items():
+                self.add_group(group)
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO projects (group_name, name, record) VALUES (?, ?, ?)",
+                    ((group, name, dumps(record)) for name, record in group_projects.items()))
+
+    def groups(self) -> list:
+        return [row[0] for row in self.connection.execute("SELECT name FROM groups ORDER BY position")]
+
+    def has_group(self, group: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM groups WHERE name = ?", (group,)).fetchone() is not None
+
+    def add_group(self, group: str):
+        self.connection.execute(
+            "INSERT OR IGNORE INTO groups (name, position) VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM groups))",
+            (group,))
+
+    def group_projects(self, group: str) -> dict:
+        rows = self.connection.execute(
+            "SELECT name, record FROM projects WHERE group_name = ? ORDER BY rowid", (group,))
+        return {name: loads(record) for name, record in rows}
+
+    def all_projects(self) -> dict:
+        """
+        Group -> {project name: record} of the whole registry
+        """
+
+        projects = {group: dict() for group in self.groups()}
+        for group, name, record in self.connection.execute("SELECT group_name, name, record FROM projects ORDER BY rowid"):
+            projects[group][name] = loads(record)
+
+        return projects
+
+    def project_count(self, group: str = None) -> int:
+        if group is None:
+            return self.connection.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+
+        return self.connection.execute("SELECT COUNT(*) FROM projects WHERE group_name = ?", (group,)).fetchone()[0]
+
+    def get_project(self, name: str, group: str) -> dict:
+        row = self.connection.execute(
+            "SELECT record FROM projects WHERE group_name = ? AND name = ?", (group, name)).fetchone()
+        return loads(row[0]) if row is not None else None
+
+    def find_projects(self, name: str) -> list:
+        rows = self.connection.execute(
+            "SELECT projects.group_name, projects.record FROM projects JOIN groups ON groups.name = projects.group_name "
+            "WHERE projects.name = ? ORDER BY groups.position", (name,))
+        return [(group, loads(record)) for group, record in rows]
+
+    def put_project(self, name: str, group: str, record: dict, base: dict = None):
+        with self.transaction():  # The current record cannot change before it's written
+            self.add_group(group)
+            if base is not None:
+                record = SettingsJournal.merge(self.get_project(name, group), base, record)
+            self.connection.execute(
+                "INSERT INTO projects (group_name, name, record) VALUES (?, ?, ?) "
+                "ON CONFLICT (group_name, name) DO UPDATE SET record = excluded.record",
+                (group, name, dumps(record)))
+
+    def remove_project(self, name: str, group: str):
+        self.connection.execute("DELETE FROM projects WHERE group_name = ? AND name = ?", (group, name))
@@ -0,0 +1,258 @@
+import os
+from json import dump, load
+from src.git_repository import GitRepository
+from src import tracing
+
+
+class StatusChecker(object):
+    """
+    Checks the git status of many projects at once (pm status)
+
+    git is run for the projects on a thread pool (the threads only wait for the
+    git processes) and the results are yielded as soon as each one finishes.
+
+    The results are cached in pm-status-cache.json. The cache entry of a project
+    is keyed on the modification times of its .git/index, HEAD, the ref of its
+    branch, the upstream ref, packed-refs and its directory, and on the latest
+    modification time of its tracked files (from the index) and of the
+    directories that contain them, with the number of tracked files that are
+    gone. So an edit, a deletion or a new file next to tracked ones is noticed,
+    and a repeated check only runs git for the repositories that have changed
+    since. The keys are computed on the thread pool too, since they stat every
+    tracked file. check(refresh=True) ignores the cache.
+
+    git is run with GIT_OPTIONAL_LOCKS=0, so checking never rewrites the index
+    (which would invalidate the cache and race with the user's own git commands).
+
+    Attributes
+    ----------
+    project_manager_home : str
+        The home directory of Project Manager
+    max_workers : int
+        Number of git commands run at the same time
+
+    Methods
+    -------
+    check(projects : list, refresh : bool = False, is_complete : bool = True) -> iterator
+        Yields (project, status) of each project as soon as it's known
+
+    format_age(timestamp : int) -> str
+        How long ago a time was, like "3 hours ago"
+    """
+
+    CACHE_FILE = "pm-status-cache.json"
+    DEFAULT_WORKERS = 16
+
+    def __init__(self, project_manager_home: str, max_workers: int = None):
+        """
+        Parameters
+        ----------
+        project_manager_home : str
+            The home directory of Project Manager
+
+        max_workers : int
+            Number of git commands run at the same time (DEFAULT_WORKERS if not given)
+        """
+
+        self.project_manager_home = project_manager_home
+        self.max_workers = max_workers if max_workers is not None else self.DEFAULT_WORKERS
+
+    @property
+    def cache_path(self) -> str:
+        return f"{self.project_manager_home}/{self.CACHE_FILE}"
+
+    def check(self, projects: list, refresh: bool = False, is_complete: bool = True):
+        """
+        Yields (project, status) for each project, in the order they finish
+
+        status is a dict with branch (None if detached), is_dirty, ahead and behind
+        (None without an upstream), last_commit (Unix time, None before the first
+        commit) and error (None if the status is known). The cache is written
+        when every project has been checked.
+
+        Parameters
+        ----------
+        projects : list
+            Projects as dicts with at least name, group and dir
+
+        refresh : bool
+            Runs git for every project, even if its cached status is still valid
+
+        is_complete : bool
+            True if projects are all of the projects (the cache entries of the others are removed)
+        """
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        cache = self._read_cache() if not refresh else dict()
+        new_cache = cache if not is_complete else dict()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._check_project, project["dir"], cache.get(project["dir"])): project
+                       for project in projects}
+
+            for future in as_completed(futures):
+                project = futures[future]
+                key, status = future.result()
+
+                if key is not None and status["error"] is None:
+                    new_cache[project["dir"]] = dict(key=key, status=status)
+                else:
+                    new_cache.pop(project["dir"], None)
+                yield project, status
+
+        self._write_cache(new_cache)
+
+    @staticmethod
+    def format_age(timestamp: int) -> str:
+        """
+        How long ago given Unix time was, like "3 hours ago"
+        """
+
+        from time import time
+
+        seconds = max(0, int(time()) - timestamp)
+        for unit, length in (("year", 365 * 86400), ("month", 30 * 86400), ("day", 86400),
+                             ("hour", 3600), ("minute", 60)):
+            if seconds >= length:
+                count = seconds // length
+                return f"{count} {unit}{'s' if count != 1 else ''} ago"
+
+        return "just now"
+
+    def _check_project(self, project_dir: str, entry: dict) -> tuple:
+        """
+        (cache key, status) of a project, from its cache entry if the key still matches
+        """
+
+        key = self._cache_key(project_dir)
+        if key is not None and entry is not None and entry["key"] == key:
+            return key, entry["status"]
+
+        return key, self._git_status(project_dir)
+
+    def _cache_key(self, project_dir: str) -> list:
+        """
+        Modification times of the files that change with the status, None if it isn't a repository
+
+        None is also returned if the tracked files cannot be read from the index.
+        """
+
+        repository = GitRepository(project_dir)
+        git_dir = repository.git_dir
+        if git_dir is None:
+            return None
+
+        branch_ref = repository.head_ref
+        paths = [f"{git_dir}/index", f"{git_dir}/HEAD", f"{git_dir}/packed-refs", project_dir]
+        for ref in (branch_ref, repository.upstream_ref(branch_ref)):
+            if ref is not None:
+                paths.append(f"{git_dir}/{ref}")
+
+        key = []
+        for path in paths:
+            try:
+                key.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                key.append(None)
+
+        tracked_files = repository.tracked_files()
+        if tracked_files is None:
+            return None
+
+        latest = 0
+        missing = 0
+        directories = set()
+        for name in tracked_files:
+            path = f"{project_dir}/{name}"
+            try:
+                latest = max(latest, os.lstat(path).st_mtime_ns)  # A tracked symbolic link itself
+            except OSError:
+                missing += 1
+            directories.add(os.path.dirname(path))
+
+        for directory in directories:
+            try:
+                latest = max(latest, os.stat(directory).st_mtime_ns)  # Files added to or removed from it
+            except OSError:
+                pass
+
+        return key + [latest, missing]
+
+    def _git_status(self, project_dir: str) -> dict:
+        status = dict(branch=None, is_dirty=False, ahead=None, behind=None, last_commit=None, error=None)
+
+        if not os.path.isdir(project_dir):
+            status["error"] = "The directory doesn't exist"
+            return status
+        if GitRepository(project_dir).git_dir is None:
+            status["error"] = "Not a git repository"
+            return status
+
+        output, error = self._run_git(project_dir, ["status", "--porcelain=v2", "--branch"])
+        if error is not None:
+            status["error"] = error
+            return status
+
+        oid = None
+        for line in output.splitlines():
+            if line.startswith("# branch.oid "):
+                oid = line.split(" ", 2)[2]
+                oid = oid if oid != "(initial)" else None
+            elif line.startswith("# branch.head "):
+                branch = line.split(" ", 2)[2]
+                status["branch"] = branch if branch != "(detached)" else None
+            elif line.startswith("# branch.ab "):
+                ahead, behind = line.split(" ")[2:4]
+                status["ahead"], status["behind"] = int(ahead), -int(behind)
+            elif not line.startswith("#"):
+                status["is_dirty"] = True
+
+        if oid is not None:
+            status["last_commit"] = GitRepository(project_dir).commit_time(oid)
+            if status["last_commit"] is None:  # A packed commit
+                output, error = self._run_git(project_dir, ["log", "-1", "--format=%ct", oid])
+                if error is None and output.strip().isdigit():
+                    status["last_commit"] = int(output.strip())
+
+        return status
+
+    def _run_git(self, project_dir: str, arguments: list) -> tuple:
+        """
+        (output, error) of a git command (without a shell), error is None if it succeeded
+        """
+
+        import subprocess
+
+        environment = dict(os.environ, GIT_OPTIONAL_LOCKS="0", LC_ALL="C")
+
+        try:
+            with tracing.phase("command", " ".join(["git", "-C", project_dir, *arguments])):
+                result = subprocess.run(["git", "-C", project_dir, *arguments], stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, text=True, env=environment)
+        except OSError as e:
+            return None, f"git cannot be run: {e.strerror}"
+
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            return None, lines[-1] if len(lines) != 0 else f"git {arguments[0]} failed"
+        return result.stdout, None
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.cache_path, "r") as file:
+                cache = load(file)
+        except (OSError, ValueError):
+            return dict()
+
+        return cache if isinstance(cache, dict) else dict()
+
+    def _write_cache(self, cache: dict):
+        temporary_path = f"{self.cache_path}.{os.getpid()}.tmp"  # Another process may be writing it too
+
+        try:
+            with open(temporary_path, "w") as file:
+                dump(cache, file)
+            os.replace(temporary_path, self.cache_path)
+        except OSError:
+            pass  # The cache is only an optimization
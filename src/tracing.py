@@ -0,0 +1,224 @@
+import os
+import sys
+from time import perf_counter
+
+
+class Tracer(object):
+    """
+    Records the wall-clock time of the phases of a pm process (pm --profile or PM_TRACE)
+
+    Phases are recorded with tracing.phase() around imports, loading the settings,
+    GitHub requests, scans, project lookups, writes and the commands that pm starts.
+    Phases can be nested and recorded from many threads. The report is written
+    when the process exits:
+
+    * to stderr, one line per phase name with the count, total and longest time,
+    * or to a JSON file with every recorded phase (start and duration in ms
+      since the tracer started, thread, nesting depth and detail).
+
+    A cProfile dump of the whole process can be written as well.
+
+    Attributes
+    ----------
+    output : str
+        Path of the JSON report, None for stderr
+    cprofile_path : str
+        Path of the cProfile dump (optional)
+    """
+
+    def __init__(self, output: str = None, cprofile_path: str = None):
+        """
+        Parameters
+        ----------
+        output : str
+            Path of the JSON report, None for stderr
+
+        cprofile_path : str
+            Path of the cProfile dump (optional)
+        """
+
+        import threading
+
+        self.output = output
+        self.cprofile_path = cprofile_path
+
+        self._started = perf_counter()
+        self._phases = []
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Depth of the nested phases of each thread
+        self._profiler = None
+
+        if cprofile_path is not None:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def phase(self, name: str, detail: str = None) -> "_Phase":
+        return _Phase(self, name, detail)
+
+    def _record(self, name: str, detail: str, start: float, duration: float, depth: int):
+        import threading
+
+        with self._lock:
+            self._phases.append(dict(name=name, detail=detail, start_ms=(start - self._started) * 1000,
+                                     duration_ms=duration * 1000, depth=depth,
+                                     thread=threading.current_thread().name))
+
+    def report(self):
+        """
+        Writes the report (and the cProfile dump)
+        """
+
+        total_ms = (perf_counter() - self._started) * 1000
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            try:
+                self._profiler.dump_stats(self.cprofile_path)
+            except OSError as e:
+                sys.stderr.write(f"pm trace: the profile cannot be written: {e}\n")
+
+        if self.output is not None:
+            from json import dump
+
+            report = dict(argv=sys.argv, pid=os.getpid(), total_ms=total_ms, phases=self._phases)
+            try:
+                with open(self.output, "w") as file:
+                    dump(report, file, indent=4)
+            except OSError as e:
+                sys.stderr.write(f"pm trace: the report cannot be written: {e}\n")
+            return
+
+        summary = dict()  # Name -> [count, total, longest, depth], in the order they started
+        for phase in sorted(self._phases, key=lambda phase: phase["start_ms"]):
+            entry = summary.setdefault(phase["name"], [0, 0.0, 0.0, phase["depth"]])
+            entry[0] += 1
+            entry[1] += phase["duration_ms"]
+            entry[2] = max(entry[2], phase["duration_ms"])
+
+        lines = [f"pm trace: {total_ms:.1f} ms in total"]
+        for name, (count, phase_total, longest, depth) in summary.items():
+            title = ("  " * depth + name).ljust(30)
+            if count == 1:
+                lines.append(f"  {title} {phase_total:9.1f} ms")
+            else:
+                lines.append(f"  {title} {phase_total:9.1f} ms  ({count} times, longest {longest:.1f} ms)")
+
+        sys.stderr.write("\n".join(lines) + "\n")
+
+
+class _Phase(object):
+    def __init__(self, tracer: Tracer, name: str, detail: str):
+        self._tracer = tracer
+        self._name = name
+        self._detail = detail
+
+    def __enter__(self):
+        local = self._tracer._local
+        self._depth = getattr(local, "depth", 0)
+        local.depth = self._depth + 1
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = perf_counter() - self._start
+        self._tracer._local.depth = self._depth
+        self._tracer._record(self._name, self._detail, self._start, duration, self._depth)
+
+
+class _NoPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+_tracer = None
+
+
+def configure(arguments: list) -> list:
+    """
+    Starts tracing if it's requested, returns the arguments without the tracing options
+
+    Tracing is requested with --profile (report to stderr), --profile=FILE.json (report
+    to a JSON file) or the PM_TRACE environment variable (1 for stderr, or a path for
+    JSON). --cprofile=FILE or PM_TRACE_CPROFILE write a cProfile dump as well (with
+    the report to stderr if no JSON file is given).
+
+    Parameters
+    ----------
+    arguments : list
+        Command line arguments (without the program name)
+    """
+
+    global _tracer
+
+    trace = os.environ.get("PM_TRACE") or None
+    cprofile_path = os.environ.get("PM_TRACE_CPROFILE") or None
+
+    remaining = []
+    for argument in arguments:
+        if argument == "--profile":
+            trace = "1"
+        elif argument.startswith("--profile="):
+            trace = argument[len("--profile="):]
+        elif argument.startswith("--cprofile="):
+            cprofile_path = argument[len("--cprofile="):]
+        else:
+            remaining.append(argument)
+
+    if trace in (None, "0") and cprofile_path is None:
+        return remaining
+
+    import atexit
+
+    _tracer = Tracer(trace if trace not in (None, "0", "1", "stderr") else None, cprofile_path)
+    atexit.register(_tracer.report)
+    return remaining
+
+
+def phase(name: str, detail: str = None):
+    """
+    Context manager that records the time of a phase (does nothing unless tracing is on)
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase, like settings.load
+
+    detail : str
+        What exactly was done, like the command that was run (optional)
+    """
+
+    if _tracer is None:
+        return _NO_PHASE
+    return _tracer.phase(name, detail)
+
+
+def traced(name: str):
+    """
+    Decorator that records every call of a function as a phase (see phase)
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase, like settings.save
+    """
+
+    def decorator(function):
+        from functools import wraps
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return function(*args, **kwargs)
+
+            with _tracer.phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
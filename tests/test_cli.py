@@ -0,0 +1,194 @@
+"""
+Tests of pm through its command line and of the settings store it's built on
+
+Every test gets its own PM_HOME (a temporary directory with a pm-settings.json),
+so pm never enters the setup script and no running daemon answers for it.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(REPO_ROOT, "projectmanager.py")
+
+sys.path.insert(0, REPO_ROOT)
+
+
+def write_settings(pm_home, projects: dict, **settings):
+    settings = dict(dict(projects_folder=str(pm_home), editor_command="true", token=""), **settings)
+    settings["projects"] = projects
+    with open(os.path.join(pm_home, "pm-settings.json"), "w") as file:
+        json.dump(settings, file)
+
+
+def run_pm(pm_home, *arguments) -> subprocess.CompletedProcess:
+    """
+    Runs pm without a terminal (stdin is empty, so a prompt fails instead of waiting)
+    """
+
+    return subprocess.run([sys.executable, ENTRY_POINT, *arguments], env=dict(os.environ, PM_HOME=str(pm_home)),
+                          stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60)
+
+
+@pytest.fixture
+def pm_home(tmp_path):
+    project_dir = tmp_path / "projects" / "alpha"
+    project_dir.mkdir(parents=True)
+    write_settings(tmp_path, {"group": {"alpha": {"dir": str(project_dir)}}})
+    return tmp_path
+
+
+# ANCHOR: Missing and misspelled project names
+
+@pytest.mark.parametrize("action", ["open", "path"])
+def test_action_without_name_exits_cleanly(pm_home, action):
+    result = run_pm(pm_home, action)
+
+    assert result.returncode == 1
+    assert "--name" in result.stdout
+    assert "Traceback" not in result.stderr
+
+
+@pytest.mark.parametrize("action", ["open", "path"])
+def test_action_without_name_in_group_exits_cleanly(pm_home, action):
+    result = run_pm(pm_home, action, "-g", "group")
+
+    assert result.returncode == 1
+    assert "Traceback" not in result.stderr
+
+
+def test_path_prints_the_directory(pm_home):
+    result = run_pm(pm_home, "path", "-n", "alpha")
+
+    assert result.returncode == 0
+    assert result.stdout.strip() == str(pm_home / "projects" / "alpha")
+
+
+def test_misspelled_name_is_suggested_without_a_prompt(pm_home):
+    result = run_pm(pm_home, "path", "-n", "alpa")
+
+    assert result.returncode == 1
+    assert "alpha" in result.stderr  # The suggestion isn't captured as the path
+    assert "alpha" not in result.stdout
+    assert "Traceback" not in result.stderr
+
+
+# ANCHOR: Settings cache
+
+def test_settings_cache_can_be_turned_off_and_on(pm_home):
+    from src.settings_cache import SettingsCache
+
+    cache_path = SettingsCache.path_of(str(pm_home))
+
+    assert run_pm(pm_home, "path", "-n", "alpha").returncode == 0
+    assert os.path.exists(cache_path)
+
+    assert run_pm(pm_home, "config", "-o", "set", "--key", "settings_cache", "--value", "off").returncode == 0
+    for _ in range(2):  # The cache must not come back on the following commands
+        assert run_pm(pm_home, "path", "-n", "alpha").returncode == 0
+        assert not os.path.exists(cache_path)
+    assert run_pm(pm_home, "config", "-o", "get", "--key", "settings_cache").stdout.strip().endswith("off")
+
+    assert run_pm(pm_home, "config", "-o", "set", "--key", "settings_cache", "--value", "on").returncode == 0
+    assert run_pm(pm_home, "path", "-n", "alpha").returncode == 0
+    assert os.path.exists(cache_path)
+
+
+# ANCHOR: Registry backends
+
+@pytest.fixture
+def many_projects_home(tmp_path):
+    projects = dict()
+    for group in range(3):
+        projects[f"group-{group}"] = dict()
+        for project in range(5):
+            project_dir = tmp_path / "projects" / f"group-{group}" / f"project-{group}-{project}"
+            project_dir.mkdir(parents=True)
+            projects[f"group-{group}"][f"project-{group}-{project}"] = {"dir": str(project_dir)}
+
+    write_settings(tmp_path, projects)
+    return tmp_path
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_switching_the_registry_backend_keeps_the_projects(many_projects_home, backend):
+    listing = run_pm(many_projects_home, "list", "-o", "p")
+    path = run_pm(many_projects_home, "path", "-n", "project-1-3")
+    assert listing.returncode == 0 and "project-1-3" in listing.stdout
+    assert path.returncode == 0
+
+    for target in (backend, "json", backend):
+        result = run_pm(many_projects_home, "config", "-o", "set", "--key", "registry_backend", "--value", target)
+        assert result.returncode == 0, result.stderr
+
+        assert run_pm(many_projects_home, "config", "-o", "get", "--key", "registry_backend").stdout.strip().endswith(target)
+        assert run_pm(many_projects_home, "list", "-o", "p").stdout == listing.stdout
+        assert run_pm(many_projects_home, "path", "-n", "project-1-3").stdout == path.stdout
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_registry_backend_sees_changes_of_a_fresh_store(many_projects_home, backend):
+    from src.settings_store import SettingsStore
+
+    assert run_pm(many_projects_home, "config", "-o", "set", "--key", "registry_backend", "--value", backend).returncode == 0
+
+    store = SettingsStore(str(many_projects_home))  # Not loaded before the put
+    store.put_project("new", "group-0", {"dir": "/new"})
+    store.save()
+
+    assert SettingsStore(str(many_projects_home)).get_project("new", "group-0")["dir"] == "/new"
+    assert run_pm(many_projects_home, "path", "-n", "new").stdout.strip() == "/new"
+
+
+# ANCHOR: Concurrent changes
+
+WRITER = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from src.settings_store import SettingsStore
+
+store = SettingsStore(sys.argv[2])
+record = store.get_project("alpha", "group")
+time.sleep(0.3)  # Every writer reads the record before any of them saves
+record[f"key{sys.argv[3]}"] = sys.argv[3]
+store.put_project("alpha", "group", record)
+store.save()
+"""
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_concurrent_puts_of_one_project_are_merged(pm_home, backend):
+    from src.settings_store import SettingsStore
+
+    if backend != "json":
+        assert run_pm(pm_home, "config", "-o", "set", "--key", "registry_backend", "--value", backend).returncode == 0
+
+    writers = [subprocess.Popen([sys.executable, "-c", WRITER, REPO_ROOT, str(pm_home), str(i)]) for i in range(8)]
+    assert all(writer.wait(timeout=60) == 0 for writer in writers)
+
+    record = SettingsStore(str(pm_home)).get_project("alpha", "group")
+    assert {key for key in record if key.startswith("key")} == {f"key{i}" for i in range(8)}
+    assert record["dir"] == str(pm_home / "projects" / "alpha")
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_pending_puts_survive_a_backend_switch_by_another_process(pm_home, backend):
+    from src.settings_store import SettingsStore
+
+    store = SettingsStore(str(pm_home))
+    record = store.get_project("alpha", "group")
+    record["changed"] = True
+    store.put_project("alpha", "group", record)
+    store.put_project("new", "other", {"dir": "/new"})
+
+    SettingsStore(str(pm_home)).set_value("registry_backend", backend)  # Another process
+    store.save()
+
+    reloaded = SettingsStore(str(pm_home))
+    assert reloaded["registry_backend"] == backend
+    assert reloaded.get_project("alpha", "group")["changed"] is True
+    assert reloaded.get_project("new", "other")["dir"] == "/new"
+    assert run_pm(pm_home, "path", "-n", "new").stdout.strip() == "/new"